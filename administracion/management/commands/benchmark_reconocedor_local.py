@@ -0,0 +1,49 @@
+import statistics
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from core.reconocedores import IndiceEmbeddings
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la búsqueda top-k del motor de reconocimiento local sobre un índice "
+        "sintético en memoria (no toca la BD ni la red)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rostros", type=int, default=50000, help="Filas del índice")
+        parser.add_argument("--dimension", type=int, default=512, help="Largo de cada vector")
+        parser.add_argument("--consultas", type=int, default=200)
+        parser.add_argument("--k", type=int, default=5)
+
+    def handle(self, *args, **options):
+        n, d = options["rostros"], options["dimension"]
+        rng = np.random.default_rng(0)
+        matriz = rng.standard_normal((n, d), dtype=np.float32)
+        uuids = [f"u{i}" for i in range(n)]
+
+        inicio = time.perf_counter()
+        indice = IndiceEmbeddings(uuids, uuids, [""] * n, matriz)
+        carga = (time.perf_counter() - inicio) * 1000
+
+        ms = []
+        aciertos = 0
+        for _ in range(options["consultas"]):
+            objetivo = int(rng.integers(n))
+            consulta = matriz[objetivo] + 0.3 * rng.standard_normal(d, dtype=np.float32)
+            inicio = time.perf_counter()
+            candidatos = indice.buscar(consulta, k=options["k"])
+            ms.append((time.perf_counter() - inicio) * 1000)
+            aciertos += candidatos[0]["uuid"] == f"u{objetivo}"
+
+        ms.sort()
+        p95 = ms[min(len(ms) - 1, int(round(len(ms) * 0.95)) - 1)]
+        self.stdout.write(
+            f"Índice {n}x{d} float32 ({indice.matriz.nbytes / 2 ** 20:.0f} MB), armado en {carga:.0f} ms"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ top-{options['k']}: p50={statistics.median(ms):.2f} ms  p95={p95:.2f} ms  "
+            f"max={ms[-1]:.2f} ms  aciertos={aciertos}/{len(ms)}"
+        ))
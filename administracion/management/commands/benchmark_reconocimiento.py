@@ -0,0 +1,82 @@
+import statistics
+import time
+from io import BytesIO
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.imagenes import foto_para_luxand, subir_imgbb
+from core.luxand import recognize
+
+
+def _via_imgbb(original: bytes, gallery: str) -> int:
+    """Camino anterior: foto original a ImgBB y Luxand la descarga por URL."""
+    url = subir_imgbb(original, "foto.jpg", "image/jpeg")
+    recognize(url, gallery=gallery)
+    return len(original)
+
+
+def _directo(original: bytes, gallery: str) -> int:
+    """Camino actual: foto reducida en el servidor y multipart directo a Luxand."""
+    foto = foto_para_luxand(BytesIO(original))
+    recognize(foto, gallery=gallery)
+    return len(foto[1])
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la latencia de punta a punta del reconocimiento facial por los dos caminos: "
+        "subiendo la foto a ImgBB y pasando la URL a Luxand, o enviándola reducida directo a Luxand. "
+        "Hace llamadas reales (consume cuota de Luxand e ImgBB)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("imagen", help="Ruta de una foto de prueba (p. ej. sacada con la tablet de la garita)")
+        parser.add_argument("--repeticiones", type=int, default=5, help="Llamadas por camino")
+        parser.add_argument("--pausa", type=float, default=1.0, help="Segundos entre llamadas (cuota de Luxand)")
+        parser.add_argument("--galeria", default=None, help="Galería de Luxand (default: settings.LUXAND_COLLECTION)")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["imagen"], "rb") as f:
+                original = f.read()
+        except OSError as e:
+            raise CommandError(f"No se pudo leer la imagen: {e}")
+        gallery = options["galeria"] if options["galeria"] is not None else getattr(settings, "LUXAND_COLLECTION", "")
+
+        caminos = {"imgbb+url": _via_imgbb, "directo": _directo}
+        tiempos = {nombre: [] for nombre in caminos}
+        enviados = {}
+        errores = {nombre: 0 for nombre in caminos}
+
+        # Intercalados para que ambos caminos vean las mismas condiciones de red
+        for i in range(options["repeticiones"]):
+            for nombre, camino in caminos.items():
+                inicio = time.perf_counter()
+                try:
+                    enviados[nombre] = camino(original, gallery)
+                    tiempos[nombre].append((time.perf_counter() - inicio) * 1000)
+                except Exception as e:
+                    errores[nombre] += 1
+                    self.stderr.write(f"✗ {nombre} #{i + 1}: {e}")
+                time.sleep(options["pausa"])
+
+        inicio = time.perf_counter()
+        foto = foto_para_luxand(BytesIO(original))
+        preparacion = (time.perf_counter() - inicio) * 1000
+        self.stdout.write(
+            f"Foto original: {len(original) / 1024:.1f} KB -> enviada a Luxand: {len(foto[1]) / 1024:.1f} KB "
+            f"(preparación {preparacion:.1f} ms)"
+        )
+        for nombre, ms in tiempos.items():
+            if not ms:
+                self.stdout.write(self.style.WARNING(f"{nombre:>10}: sin mediciones ({errores[nombre]} errores)"))
+                continue
+            ms.sort()
+            p95 = ms[min(len(ms) - 1, int(round(len(ms) * 0.95)) - 1)]
+            self.stdout.write(
+                f"{nombre:>10}: p50={statistics.median(ms):.0f} ms  p95={p95:.0f} ms  "
+                f"min={ms[0]:.0f} ms  subidos={enviados.get(nombre, 0) / 1024:.1f} KB  errores={errores[nombre]}"
+            )
+        if tiempos["imgbb+url"] and tiempos["directo"]:
+            mejora = statistics.median(tiempos["imgbb+url"]) / statistics.median(tiempos["directo"])
+            self.stdout.write(self.style.SUCCESS(f"✓ directo es {mejora:.1f}x más rápido (mediana)"))
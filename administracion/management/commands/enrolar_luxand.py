@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from core.enrolamiento import enrolar_pendientes
+
+
+class Command(BaseCommand):
+    help = "Enrola en Luxand a las personas y empleados con foto que aún no tienen luxand_uuid."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tasa", type=float, default=None, help="Tope extra de llamadas por segundo (siempre rige settings.LUXAND_TASA)")
+        parser.add_argument("--rafaga", type=int, default=None, help="Ráfaga del tope extra (default: settings.LUXAND_RAFAGA)")
+        parser.add_argument("--hilos", type=int, default=4, help="Llamadas simultáneas")
+        parser.add_argument("--lote", type=int, default=100, help="Registros por bulk_update")
+        parser.add_argument("--limite", type=int, default=None, help="Enrolar como máximo esta cantidad")
+
+    def handle(self, *args, **options):
+        stats = enrolar_pendientes(
+            tasa=options["tasa"],
+            rafaga=options["rafaga"],
+            hilos=options["hilos"],
+            lote=options["lote"],
+            limite=options["limite"],
+            progreso=lambda hechos, total: self.stdout.write(f"  {hechos}/{total} procesados"),
+        )
+        for clave, error in sorted(stats["errores"].items()):
+            self.stderr.write(f"✗ {clave}: {error}")
+        estilo = self.style.WARNING if stats["errores"] else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f"✓ {stats['enrolados']} enrolados, {len(stats['errores'])} fallidos, "
+            f"{stats['omitidos']} en proceso por el worker de {stats['total']} "
+            f"en {stats['segundos']:.2f}s ({stats['por_segundo']} enrolamientos/s)"
+        ))
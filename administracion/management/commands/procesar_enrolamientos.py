@@ -0,0 +1,28 @@
+import time
+from django.core.management.base import BaseCommand
+
+from core.enrolamiento import procesar_enrolamientos
+
+
+class Command(BaseCommand):
+    help = "Enrola en Luxand a las personas y empleados pendientes (luxand_estado='P'), con reintentos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=50, help="Registros tomados por iteración (por tabla)")
+        parser.add_argument("--hilos", type=int, default=4, help="Llamadas simultáneas a Luxand")
+        parser.add_argument("--loop", action="store_true", help="Seguir corriendo y revisar la cola periódicamente")
+        parser.add_argument("--intervalo", type=float, default=5.0, help="Segundos de espera cuando la cola está vacía")
+
+    def handle(self, *args, **options):
+        while True:
+            stats = procesar_enrolamientos(lote=options["lote"], hilos=options["hilos"])
+            procesados = sum(stats.values())
+            if procesados:
+                self.stdout.write(
+                    f"✓ enrolados={stats['enrolados']} reintentos={stats['reintentos']} fallidos={stats['fallidos']}"
+                )
+            if not options["loop"]:
+                break
+            # Si el lote vino lleno puede haber más pendientes: seguir sin esperar
+            if procesados < options["lote"]:
+                time.sleep(options["intervalo"])
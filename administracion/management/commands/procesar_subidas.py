@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+
+from core.subidas import procesar_subidas
+
+
+class Command(BaseCommand):
+    help = "Sube a ImgBB las imágenes encoladas por el CRUD y completa la URL en cada objeto."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=50, help="Subidas tomadas por iteración")
+        parser.add_argument("--loop", action="store_true", help="Seguir corriendo y revisar la cola periódicamente")
+        parser.add_argument("--intervalo", type=float, default=5.0, help="Segundos de espera cuando la cola está vacía")
+
+    def handle(self, *args, **options):
+        while True:
+            stats = procesar_subidas(lote=options["lote"])
+            procesadas = stats['subidas'] + stats['reintentos'] + stats['fallidas']
+            if procesadas:
+                self.stdout.write(
+                    f"✓ subidas={stats['subidas']} (reutilizadas={stats['reutilizadas']}) reintentos={stats['reintentos']} fallidas={stats['fallidas']}"
+                )
+            if not options["loop"]:
+                break
+            # Si el lote vino lleno puede haber más pendientes: seguir sin esperar
+            if procesadas < options["lote"]:
+                time.sleep(options["intervalo"])
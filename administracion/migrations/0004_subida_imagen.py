@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:24
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0003_empleado_user_persona_user'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubidaImagen',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('object_id', models.PositiveIntegerField(verbose_name='ID del objeto')),
+                ('campo', models.CharField(default='imagen', max_length=50, verbose_name='Campo')),
+                ('contenido', models.BinaryField(verbose_name='Imagen procesada')),
+                ('extension', models.CharField(default='webp', max_length=10)),
+                ('mime', models.CharField(default='image/webp', max_length=50)),
+                ('luxand_coleccion', models.CharField(blank=True, max_length=100, null=True)),
+                ('url', models.URLField(blank=True, null=True)),
+                ('estado', models.CharField(choices=[('P', 'Pendiente'), ('S', 'Subida'), ('F', 'Fallida'), ('D', 'Descartada')], default='P', max_length=1, verbose_name='Estado')),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('error', models.TextField(blank=True, default='')),
+                ('fecha_registro', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Registro')),
+                ('fecha_subida', models.DateTimeField(blank=True, null=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='Modelo')),
+            ],
+            options={
+                'verbose_name': 'Subida de Imagen',
+                'verbose_name_plural': 'Subidas de Imágenes',
+                'db_table': 'subida_imagen',
+                'indexes': [models.Index(fields=['estado', 'proximo_intento'], name='subida_estado_proximo_idx'), models.Index(fields=['content_type', 'object_id', 'estado'], name='subida_objeto_idx')],
+            },
+        ),
+    ]
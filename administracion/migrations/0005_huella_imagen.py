@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0004_subida_imagen'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HuellaImagen',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='SHA-256')),
+                ('url', models.URLField(verbose_name='URL')),
+                ('mime', models.CharField(default='image/webp', max_length=50)),
+                ('tamano', models.PositiveIntegerField(default=0, verbose_name='Tamaño (bytes)')),
+                ('usos', models.PositiveIntegerField(default=1, verbose_name='Usos')),
+                ('fecha_registro', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Registro')),
+            ],
+            options={
+                'verbose_name': 'Huella de Imagen',
+                'verbose_name_plural': 'Huellas de Imágenes',
+                'db_table': 'huella_imagen',
+            },
+        ),
+    ]
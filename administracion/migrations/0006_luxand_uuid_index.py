@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0005_huella_imagen'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='empleado',
+            name='luxand_uuid',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='persona',
+            name='luxand_uuid',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+    ]
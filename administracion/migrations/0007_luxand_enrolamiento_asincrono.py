@@ -0,0 +1,71 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def marcar_enrolados(apps, schema_editor):
+    # Los que ya tienen UUID quedan como enrolados
+    for nombre in ('Persona', 'Empleado'):
+        modelo = apps.get_model('administracion', nombre)
+        modelo.objects.filter(luxand_uuid__isnull=False).exclude(luxand_uuid='').update(luxand_estado='E')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0006_luxand_uuid_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='empleado',
+            name='luxand_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='empleado',
+            name='luxand_estado',
+            field=models.CharField(choices=[('N', 'No enrolado'), ('P', 'Pendiente'), ('R', 'En proceso'), ('E', 'Enrolado'), ('F', 'Fallido')], default='N', max_length=1, verbose_name='Estado en Luxand'),
+        ),
+        migrations.AddField(
+            model_name='empleado',
+            name='luxand_intentos',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='empleado',
+            name='luxand_proximo_intento',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='persona',
+            name='luxand_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='persona',
+            name='luxand_estado',
+            field=models.CharField(choices=[('N', 'No enrolado'), ('P', 'Pendiente'), ('R', 'En proceso'), ('E', 'Enrolado'), ('F', 'Fallido')], default='N', max_length=1, verbose_name='Estado en Luxand'),
+        ),
+        migrations.AddField(
+            model_name='persona',
+            name='luxand_intentos',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='persona',
+            name='luxand_proximo_intento',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='empleado',
+            index=models.Index(fields=['luxand_estado', 'luxand_proximo_intento'], name='empleado_luxand_cola_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='persona',
+            index=models.Index(fields=['luxand_estado', 'luxand_proximo_intento'], name='persona_luxand_cola_idx'),
+        ),
+        migrations.RunPython(marcar_enrolados, migrations.RunPython.noop),
+    ]
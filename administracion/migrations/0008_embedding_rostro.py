@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0007_luxand_enrolamiento_asincrono'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmbeddingRostro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.CharField(db_index=True, max_length=100, verbose_name='UUID')),
+                ('nombre', models.CharField(blank=True, default='', max_length=200)),
+                ('coleccion', models.CharField(blank=True, default='', max_length=100, verbose_name='Colección')),
+                ('extractor', models.CharField(max_length=100)),
+                ('vector', models.BinaryField(verbose_name='Vector (float32)')),
+                ('fecha_registro', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Registro')),
+            ],
+            options={
+                'verbose_name': 'Embedding de Rostro',
+                'verbose_name_plural': 'Embeddings de Rostros',
+                'db_table': 'embedding_rostro',
+                'indexes': [models.Index(fields=['extractor', 'coleccion'], name='embedding_rostro_indice_idx')],
+            },
+        ),
+    ]
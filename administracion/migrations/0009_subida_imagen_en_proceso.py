@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0008_embedding_rostro'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='subidaimagen',
+            name='estado',
+            field=models.CharField(choices=[('P', 'Pendiente'), ('R', 'En proceso'), ('S', 'Subida'), ('F', 'Fallida'), ('D', 'Descartada')], default='P', max_length=1, verbose_name='Estado'),
+        ),
+    ]
@@ -22,6 +22,14 @@ class Persona(models.Model):
         ('S', 'Suspendido'),
     ]
     
+    LUXAND_ESTADO_CHOICES = [
+        ('N', 'No enrolado'),
+        ('P', 'Pendiente'),
+        ('R', 'En proceso'),
+        ('E', 'Enrolado'),
+        ('F', 'Fallido'),
+    ]
+    
     TIPO_CHOICES = [
         ('P', 'Propietario'),
         ('I', 'Inquilino'),
@@ -40,7 +48,12 @@ class Persona(models.Model):
     fecha_registro = models.DateTimeField(default=timezone.now, verbose_name="Fecha de Registro")
     CI = models.CharField(max_length=20, unique=True, verbose_name="Cédula de Identidad")
     fecha_nacimiento = models.DateField(verbose_name="Fecha de Nacimiento")
-    luxand_uuid = models.CharField(max_length=64, blank=True, null=True)
+    luxand_uuid = models.CharField(max_length=64, blank=True, null=True, db_index=True)
+    # Enrolamiento asíncrono (core/enrolamiento.py, `manage.py procesar_enrolamientos`)
+    luxand_estado = models.CharField(max_length=1, choices=LUXAND_ESTADO_CHOICES, default='N', verbose_name="Estado en Luxand")
+    luxand_intentos = models.PositiveSmallIntegerField(default=0)
+    luxand_proximo_intento = models.DateTimeField(blank=True, null=True)
+    luxand_error = models.TextField(blank=True, default="")
     user = models.OneToOneField(
         User, 
         on_delete=models.CASCADE, 
@@ -54,6 +67,9 @@ class Persona(models.Model):
         verbose_name = "Persona"
         verbose_name_plural = "Personas"
         ordering = ['apellido', 'nombre']
+        indexes = [
+            models.Index(fields=['luxand_estado', 'luxand_proximo_intento'], name='persona_luxand_cola_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nombre} {self.apellido} - {self.CI}"
@@ -97,6 +113,14 @@ class Empleado(models.Model):
         ('S', 'Suspendido'),
     ]
     
+    LUXAND_ESTADO_CHOICES = [
+        ('N', 'No enrolado'),
+        ('P', 'Pendiente'),
+        ('R', 'En proceso'),
+        ('E', 'Enrolado'),
+        ('F', 'Fallido'),
+    ]
+    
     id = models.AutoField(primary_key=True)
     nombre = models.CharField(max_length=100, verbose_name="Nombre")
     apellido = models.CharField(max_length=100, verbose_name="Apellido")
@@ -109,7 +133,12 @@ class Empleado(models.Model):
     sueldo = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Sueldo")
     imagen = models.URLField(blank=True, null=True, verbose_name='Imagen')
     fecha_registro = models.DateTimeField(default=timezone.now, verbose_name="Fecha de Registro")
-    luxand_uuid = models.CharField(max_length=64, blank=True, null=True)
+    luxand_uuid = models.CharField(max_length=64, blank=True, null=True, db_index=True)
+    # Enrolamiento asíncrono (core/enrolamiento.py, `manage.py procesar_enrolamientos`)
+    luxand_estado = models.CharField(max_length=1, choices=LUXAND_ESTADO_CHOICES, default='N', verbose_name="Estado en Luxand")
+    luxand_intentos = models.PositiveSmallIntegerField(default=0)
+    luxand_proximo_intento = models.DateTimeField(blank=True, null=True)
+    luxand_error = models.TextField(blank=True, default="")
     user = models.OneToOneField(
         User, 
         on_delete=models.CASCADE, 
@@ -130,6 +159,9 @@ class Empleado(models.Model):
         verbose_name = "Empleado"
         verbose_name_plural = "Empleados"
         ordering = ['apellido', 'nombre']
+        indexes = [
+            models.Index(fields=['luxand_estado', 'luxand_proximo_intento'], name='empleado_luxand_cola_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nombre} {self.apellido} - {self.cargo.nombre}"
@@ -138,3 +170,92 @@ class Empleado(models.Model):
     def nombre_completo(self):
         return f"{self.nombre} {self.apellido}"
 
+
+class SubidaImagen(models.Model):
+    """
+    Cola de subidas de imágenes a ImgBB. El CRUD guarda el registro sin esperar
+    a ImgBB y `python manage.py procesar_subidas` sube la imagen (ya reducida)
+    y completa el campo `campo` del objeto.
+    """
+    ESTADO_CHOICES = [
+        ('P', 'Pendiente'),
+        ('R', 'En proceso'),  # tomada por un worker hasta `proximo_intento`
+        ('S', 'Subida'),
+        ('F', 'Fallida'),
+        ('D', 'Descartada'),  # reemplazada por una subida más nueva del mismo objeto
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.CASCADE, verbose_name="Modelo")
+    object_id = models.PositiveIntegerField(verbose_name="ID del objeto")
+    campo = models.CharField(max_length=50, default='imagen', verbose_name="Campo")
+    contenido = models.BinaryField(verbose_name="Imagen procesada")
+    extension = models.CharField(max_length=10, default='webp')
+    mime = models.CharField(max_length=50, default='image/webp')
+    # Si no es null, al terminar se enrola el objeto en esta colección de Luxand
+    luxand_coleccion = models.CharField(max_length=100, blank=True, null=True)
+    url = models.URLField(blank=True, null=True)
+    estado = models.CharField(max_length=1, choices=ESTADO_CHOICES, default='P', verbose_name="Estado")
+    intentos = models.PositiveSmallIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    error = models.TextField(blank=True, default="")
+    fecha_registro = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Registro")
+    fecha_subida = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'subida_imagen'
+        verbose_name = "Subida de Imagen"
+        verbose_name_plural = "Subidas de Imágenes"
+        indexes = [
+            models.Index(fields=['estado', 'proximo_intento'], name='subida_estado_proximo_idx'),
+            models.Index(fields=['content_type', 'object_id', 'estado'], name='subida_objeto_idx'),
+        ]
+
+    def __str__(self):
+        return f"Subida {self.id} - {self.content_type_id}:{self.object_id}.{self.campo} ({self.get_estado_display()})"
+
+
+class HuellaImagen(models.Model):
+    """
+    Índice por contenido de las imágenes ya subidas a ImgBB: SHA-256 de los
+    bytes normalizados (salida de `preparar_imagen`) -> URL. Una foto idéntica
+    reutiliza la URL existente en lugar de volver a subirse.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True, verbose_name="SHA-256")
+    url = models.URLField(verbose_name="URL")
+    mime = models.CharField(max_length=50, default='image/webp')
+    tamano = models.PositiveIntegerField(default=0, verbose_name="Tamaño (bytes)")
+    usos = models.PositiveIntegerField(default=1, verbose_name="Usos")
+    fecha_registro = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Registro")
+
+    class Meta:
+        db_table = 'huella_imagen'
+        verbose_name = "Huella de Imagen"
+        verbose_name_plural = "Huellas de Imágenes"
+
+    def __str__(self):
+        return f"{self.sha256[:12]} -> {self.url}"
+
+
+class EmbeddingRostro(models.Model):
+    """
+    Vector de características de una foto enrolada en el motor de
+    reconocimiento local (core.reconocedores). Una persona puede tener varios
+    (add_face); `uuid` es el mismo valor que se guarda en luxand_uuid.
+    """
+    uuid = models.CharField(max_length=100, db_index=True, verbose_name="UUID")
+    nombre = models.CharField(max_length=200, blank=True, default="")
+    coleccion = models.CharField(max_length=100, blank=True, default="", verbose_name="Colección")
+    # Vectores de extractores distintos no son comparables entre sí
+    extractor = models.CharField(max_length=100)
+    vector = models.BinaryField(verbose_name="Vector (float32)")
+    fecha_registro = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Registro")
+
+    class Meta:
+        db_table = 'embedding_rostro'
+        verbose_name = "Embedding de Rostro"
+        verbose_name_plural = "Embeddings de Rostros"
+        indexes = [models.Index(fields=['extractor', 'coleccion'], name='embedding_rostro_indice_idx')]
+
+    def __str__(self):
+        return f"{self.uuid} ({self.extractor})"
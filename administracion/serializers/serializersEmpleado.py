@@ -42,15 +42,16 @@ class EmpleadoSerializer(serializers.ModelSerializer):
     cargo_nombre = serializers.CharField(source='cargo.nombre', read_only=True)
     nombre_completo = serializers.ReadOnlyField()
     luxand_uuid = serializers.ReadOnlyField()
+    luxand_estado = serializers.ReadOnlyField()
     
     class Meta:
         model = Empleado
         fields = [
             'id', 'nombre', 'apellido', 'telefono', 'direccion', 'sexo', 'CI', 
             'fecha_nacimiento', 'estado', 'sueldo', 'imagen', 'fecha_registro', 'cargo', 'cargo_nombre', 
-            'nombre_completo', 'luxand_uuid'
+            'nombre_completo', 'luxand_uuid', 'luxand_estado'
         ]
-        read_only_fields = ['id', 'fecha_registro', 'luxand_uuid']
+        read_only_fields = ['id', 'fecha_registro', 'luxand_uuid', 'luxand_estado']
     def validate_CI(self, value):
         """
         Validar que la cédula sea única
@@ -87,11 +88,12 @@ class EmpleadoListSerializer(serializers.ModelSerializer):
     cargo_nombre = serializers.CharField(source='cargo.nombre', read_only=True)
     nombre_completo = serializers.ReadOnlyField()
     luxand_uuid = serializers.ReadOnlyField()
+    luxand_estado = serializers.ReadOnlyField()
     class Meta:
         model = Empleado
         fields = [
             'id', 'nombre', 'apellido', 'nombre_completo', 'telefono', 'direccion', 
             'sexo', 'CI', 'fecha_nacimiento', 'estado', 'sueldo', 'imagen', 'fecha_registro',
-            'cargo', 'cargo_nombre', 'luxand_uuid'
+            'cargo', 'cargo_nombre', 'luxand_uuid', 'luxand_estado'
         ]
-        read_only_fields = ['id', 'fecha_registro', 'luxand_uuid']
\ No newline at end of file
+        read_only_fields = ['id', 'fecha_registro', 'luxand_uuid', 'luxand_estado']
\ No newline at end of file
@@ -12,6 +12,7 @@ class PersonaSerializer(serializers.ModelSerializer):
     """
     nombre_completo = serializers.ReadOnlyField()
     luxand_uuid = serializers.ReadOnlyField()
+    luxand_estado = serializers.ReadOnlyField()
     user = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(),
         allow_null=True,
@@ -22,9 +23,9 @@ class PersonaSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'nombre', 'apellido', 'telefono', 'imagen', 'estado', 
             'sexo', 'tipo', 'fecha_registro', 'CI', 'fecha_nacimiento', 
-            'nombre_completo', 'luxand_uuid', 'user'
+            'nombre_completo', 'luxand_uuid', 'luxand_estado', 'user'
         ]
-        read_only_fields = ['id', 'fecha_registro', 'luxand_uuid']
+        read_only_fields = ['id', 'fecha_registro', 'luxand_uuid', 'luxand_estado']
     
     def validate_CI(self, value):
         """
@@ -53,6 +54,7 @@ class PersonaSinTipoSerializer(serializers.ModelSerializer):
     """
     nombre_completo = serializers.ReadOnlyField()
     luxand_uuid = serializers.ReadOnlyField()
+    luxand_estado = serializers.ReadOnlyField()
     user = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(),
         allow_null=True,
@@ -63,9 +65,9 @@ class PersonaSinTipoSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'nombre', 'apellido', 'telefono', 'imagen', 'estado', 
             'sexo', 'fecha_registro', 'CI', 'fecha_nacimiento', 
-            'nombre_completo', 'luxand_uuid', 'user'
+            'nombre_completo', 'luxand_uuid', 'luxand_estado', 'user'
         ]
-        read_only_fields = ['id', 'fecha_registro', 'luxand_uuid']
+        read_only_fields = ['id', 'fecha_registro', 'luxand_uuid', 'luxand_estado']
     
     def validate_CI(self, value):
         """
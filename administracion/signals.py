@@ -0,0 +1,24 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Persona, Empleado, EmbeddingRostro
+from core.identidades import invalidar_identidades
+from core.reconocedores import invalidar_indice_rostros
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidar_indice_identidades(sender, **kwargs):
+    # Sin sender fijo: Inquilino, Familiares y Visitante heredan de Persona
+    if issubclass(sender, (Persona, Empleado)):
+        # Recién al confirmar: antes, otro worker podría recargar el índice viejo
+        # bajo la versión nueva y quedaría así hasta el próximo cambio
+        transaction.on_commit(invalidar_identidades)
+
+
+@receiver(post_delete)
+def borrar_embeddings(sender, instance, **kwargs):
+    # Los vectores del motor local de alguien dado de baja no deben seguir coincidiendo
+    if issubclass(sender, (Persona, Empleado)) and instance.luxand_uuid:
+        if EmbeddingRostro.objects.filter(uuid=instance.luxand_uuid).delete()[0]:
+            transaction.on_commit(invalidar_indice_rostros)
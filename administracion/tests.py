@@ -1,3 +1,230 @@
-from django.test import TestCase
+import datetime
+import time
+from io import BytesIO
+from types import SimpleNamespace
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from core.enrolamiento import enrolar_pendientes, procesar_enrolamientos
+from core.identidades import resolver_uuid, version_identidades
+from core.limitador import TokenBucket
+from core import enrolamiento, luxand
+from core.luxand import LuxandError
+from residencial.models import Inquilino
+from .models import Persona, Empleado, Cargo
+
+
+def crear_persona(**kwargs):
+    datos = dict(nombre="Ana", apellido="Rojas", sexo="F", tipo="P", CI="100",
+                 fecha_nacimiento=datetime.date(1990, 1, 1), luxand_uuid="u-persona")
+    datos.update(kwargs)
+    return Persona.objects.create(**datos)
+
+
+class IdentidadesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.persona = crear_persona()
+        cargo = Cargo.objects.create(nombre="Guardia")
+        self.empleado = Empleado.objects.create(
+            nombre="Luis", apellido="Paz", direccion="-", sexo="M", CI="200",
+            sueldo=100, cargo=cargo, luxand_uuid="u-empleado",
+        )
+
+    def test_resuelve_sin_consultas_en_caliente(self):
+        resolver_uuid("calentar")
+        with self.assertNumQueries(0):
+            persona = resolver_uuid("u-persona")
+            empleado = resolver_uuid("u-empleado")
+            self.assertIsNone(resolver_uuid("u-desconocido"))
+        self.assertEqual(persona, {"tipo": "persona", "id": self.persona.id, "nombre": "Ana Rojas",
+                                   "estado": "A", "detalle": "P"})
+        self.assertEqual((empleado["tipo"], empleado["detalle"]), ("empleado", "Guardia"))
+
+    def test_se_invalida_al_guardar_y_borrar(self):
+        resolver_uuid("u-persona")
+        self.persona.estado = "S"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.persona.save()
+        self.assertEqual(resolver_uuid("u-persona")["estado"], "S")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.empleado.delete()
+        self.assertIsNone(resolver_uuid("u-empleado"))
+
+    def test_version_cambia_recien_al_confirmar(self):
+        version = version_identidades()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.persona.estado = "S"
+            self.persona.save()
+            # Dentro de la transacción nadie debe ver la versión nueva
+            self.assertEqual(version_identidades(), version)
+        self.assertEqual(version_identidades(), version + 1)
+
+    def test_subclases_de_persona_tambien_invalidan(self):
+        resolver_uuid("u-persona")
+        with self.captureOnCommitCallbacks(execute=True):
+            Inquilino.objects.create(
+                nombre="Eva", apellido="Lima", sexo="F", tipo="I", CI="300",
+                fecha_nacimiento=datetime.date(1995, 5, 5), luxand_uuid="u-inquilino",
+                propietario=self.persona,
+            )
+        self.assertEqual(resolver_uuid("u-inquilino")["nombre"], "Eva Lima")
+
+
+class TokenBucketTests(TestCase):
+    def test_respeta_la_tasa_tras_la_rafaga(self):
+        bucket = TokenBucket(tasa=50, capacidad=5)
+        inicio = time.monotonic()
+        for _ in range(10):
+            bucket.tomar()
+        # 5 de ráfaga + 5 a 50/s ≈ 0.1s
+        self.assertGreaterEqual(time.monotonic() - inicio, 0.08)
+        self.assertFalse(bucket.intentar())
+        self.assertFalse(bucket.tomar(espera_max=0))
+
+
+@override_settings(LUXAND_COLLECTION="todos", LUXAND_COLLECTION_EMPLEADOS="staff", LUXAND_TASA=1000, LUXAND_RAFAGA=100)
+class EnrolamientoMasivoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(5):
+            crear_persona(CI=f"p{i}", luxand_uuid=None, imagen=f"https://i.ibb.co/p{i}.jpg")
+        crear_persona(CI="sin-foto", luxand_uuid=None)
+        crear_persona(CI="ya", luxand_uuid="u-ya", imagen="https://i.ibb.co/ya.jpg")
+        Empleado.objects.create(
+            nombre="Luis", apellido="Paz", direccion="-", sexo="M", CI="e1", sueldo=100,
+            cargo=Cargo.objects.create(nombre="Guardia"), imagen="https://i.ibb.co/e1.jpg",
+        )
+
+    def _add_person(self, nombre, imagen, colecciones, **kwargs):
+        if imagen.endswith("p3.jpg"):
+            raise ValueError("Luxand add_person error: cuota")
+        return {"uuid": f"uuid-{imagen.rsplit('/', 1)[1]}"}
+
+    def test_enrola_pendientes_y_reanuda(self):
+        with mock.patch("core.luxand.add_person", side_effect=self._add_person) as add:
+            stats = enrolar_pendientes(hilos=3, lote=2)
+        self.assertEqual((stats["total"], stats["enrolados"]), (6, 5))
+        self.assertEqual(list(stats["errores"]), [f"persona-{Persona.objects.get(CI='p3').id}"])
+        colecciones = {c.args[0]: c.args[2] for c in add.call_args_list}
+        self.assertEqual(colecciones["Luis Paz"], "staff")
+        self.assertEqual(Persona.objects.get(CI="p0").luxand_uuid, "uuid-p0.jpg")
+        # bulk_update no dispara signals, pero el índice se invalida igual
+        self.assertEqual(resolver_uuid("uuid-e1.jpg")["tipo"], "empleado")
+
+        # Segunda corrida: solo queda el que falló
+        with mock.patch("core.luxand.add_person", return_value={"uuid": "uuid-p3"}) as add:
+            call_command("enrolar_luxand", stdout=mock.Mock(), stderr=mock.Mock())
+        self.assertEqual(add.call_count, 1)
+        self.assertEqual(Persona.objects.get(CI="p3").luxand_uuid, "uuid-p3")
+
+    def test_no_enrola_lo_que_tomo_el_worker_y_devuelve_los_fallidos(self):
+        ahora = timezone.now()
+        Persona.objects.filter(CI__in=["p0", "p1"]).update(luxand_estado="P", luxand_proximo_intento=ahora)
+        # El worker reclama p0 y p1 después de que el comando leyó los pendientes
+        reclamar = enrolamiento._reclamar
+
+        def reclamar_tras_el_worker(modelo, ids, ahora):
+            if modelo is Persona:
+                enrolamiento._tomar(Persona, 10, ahora)
+            return reclamar(modelo, ids, ahora)
+
+        with mock.patch("core.enrolamiento._reclamar", side_effect=reclamar_tras_el_worker), \
+                mock.patch("core.luxand.add_person", side_effect=self._add_person) as add:
+            stats = enrolar_pendientes(lote=10)
+        imagenes = {c.args[1] for c in add.call_args_list}
+        self.assertNotIn("https://i.ibb.co/p0.jpg", imagenes)
+        self.assertNotIn("https://i.ibb.co/p1.jpg", imagenes)
+        self.assertEqual((stats["enrolados"], stats["omitidos"]), (3, 2))
+        self.assertEqual(Persona.objects.get(CI="p0").luxand_estado, "R")
+        # El que falló no queda con el lease tomado
+        self.assertEqual(Persona.objects.get(CI="p3").luxand_estado, "N")
+
+
+@override_settings(LUXAND_COLLECTION="todos", LUXAND_TASA=1000, LUXAND_RAFAGA=100)
+class EnrolamientoAsincronoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.datos = {"nombre": "Ana", "apellido": "Rojas", "sexo": "F", "tipo": "P", "CI": "100",
+                      "fecha_nacimiento": "1990-01-01", "imagen": "https://i.ibb.co/ana.jpg"}
+
+    def test_el_crud_no_espera_a_luxand_y_no_duplica(self):
+        with mock.patch("core.luxand.add_person") as add:
+            r = self.client.post("/api/personas/", self.datos, format="json")
+            self.assertEqual(r.status_code, 201, r.data)
+            self.assertEqual(r.data["luxand_estado"], "P")
+            r = self.client.patch(f"/api/personas/{r.data['id']}/", {"nombre": "Ana María"}, format="json")
+            self.assertEqual(r.status_code, 200, r.data)
+        add.assert_not_called()
+
+        with mock.patch("core.luxand.add_person", return_value={"uuid": "u-ana"}) as add:
+            stats = procesar_enrolamientos()
+        self.assertEqual((stats["enrolados"], add.call_count), (1, 1))
+        persona = Persona.objects.get()
+        self.assertEqual((persona.luxand_estado, persona.luxand_uuid), ("E", "u-ana"))
+        self.assertEqual(resolver_uuid("u-ana")["nombre"], "Ana María Rojas")
+
+    def test_cuota_agotada_se_reintenta_despues(self):
+        persona = crear_persona(luxand_uuid=None, imagen="https://i.ibb.co/ana.jpg", luxand_estado="P",
+                                luxand_proximo_intento=timezone.now())
+        with mock.patch("core.luxand.add_person", side_effect=LuxandError("quota", 429)):
+            self.assertEqual(procesar_enrolamientos()["reintentos"], 1)
+            # El backoff lo saca de la cola por ahora
+            self.assertEqual(sum(procesar_enrolamientos().values()), 0)
+        persona.refresh_from_db()
+        self.assertEqual((persona.luxand_estado, persona.luxand_intentos), ("P", 1))
+        self.assertGreater(persona.luxand_proximo_intento, timezone.now())
+        self.assertIn("quota", persona.luxand_error)
+
+    def test_foto_sin_cara_falla_sin_reintentar(self):
+        persona = crear_persona(luxand_uuid=None, imagen="https://i.ibb.co/ana.jpg", luxand_estado="P",
+                                luxand_proximo_intento=timezone.now())
+        respuesta = {"status": "failure", "message": "Can't find faces on the image"}
+        with mock.patch("core.luxand.add_person", return_value=respuesta):
+            self.assertEqual(procesar_enrolamientos()["fallidos"], 1)
+        persona.refresh_from_db()
+        self.assertEqual(persona.luxand_estado, "F")
+        self.assertIn("Can't find faces", persona.luxand_error)
+
+
+@override_settings(LUXAND_COLLECTION="todos", LUXAND_MAX_LADO=800, LUXAND_TASA=1000, LUXAND_RAFAGA=100)
+class ReconocimientoDirectoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        luxand._breaker = None
+        self.persona = crear_persona()
+
+    def test_foto_del_movil_va_directo_a_luxand(self):
+        buf = BytesIO()
+        Image.new("RGB", (3000, 4000), (90, 60, 30)).save(buf, "JPEG")
+        archivo = SimpleUploadedFile("foto.jpg", buf.getvalue(), content_type="image/jpeg")
+        respuesta = SimpleNamespace(status_code=200, text="[]",
+                                    json=lambda: [{"uuid": "u-persona", "probability": 0.93}])
+        with mock.patch("core.http_cliente.post", return_value=respuesta) as post:
+            r = APIClient().post("/api/personas/reconocimiento_facial/", {"image": archivo}, format="multipart")
+        self.assertEqual(r.status_code, 200, r.data)
+        self.assertEqual((r.data["ok"], r.data["persona_id"]), (True, self.persona.id))
+        # Una sola llamada, a Luxand, con la foto reducida en el multipart (sin ImgBB)
+        self.assertEqual(post.call_count, 1)
+        self.assertIn("luxand.cloud", post.call_args.args[0])
+        nombre, contenido, content_type = post.call_args.kwargs["files"]["photo"]
+        self.assertEqual(content_type, "image/jpeg")
+        self.assertEqual(Image.open(BytesIO(contenido)).size, (600, 800))
+
+    def test_alta_similitud_sin_persona_enrolada_no_se_acepta(self):
+        buf = BytesIO()
+        Image.new("RGB", (640, 480), (90, 60, 30)).save(buf, "JPEG")
+        archivo = SimpleUploadedFile("foto.jpg", buf.getvalue(), content_type="image/jpeg")
+        respuesta = SimpleNamespace(status_code=200, text="[]",
+                                    json=lambda: [{"uuid": "u-desconocido", "probability": 0.99}])
+        with mock.patch("core.http_cliente.post", return_value=respuesta):
+            r = APIClient().post("/api/personas/reconocimiento_facial/", {"image": archivo}, format="multipart")
+        self.assertEqual((r.data["ok"], r.data["persona_id"]), (False, None))
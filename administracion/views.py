@@ -17,9 +17,12 @@ from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
 from rest_framework.permissions import AllowAny
 from rest_framework_simplejwt.views import TokenObtainPairView
-import requests
 from django.conf import settings
-from core.luxand import add_person, add_face, recognize
+from core.luxand import LuxandNoDisponible
+from core.enrolamiento import colecciones_luxand, encolar_enrolamiento
+from core.imagenes import ImagenImgBBMixin, ImagenInvalida, parsear_recorte
+from core.identidades import resolver_uuid
+from core.reconocedores import reconocedor
 
 
 # Create your views here.
@@ -69,10 +72,12 @@ class RolViewSet(viewsets.ModelViewSet):
 
 # ==================== VISTAS PARA GESTIONAR PERSONAS ====================
 
-class PersonaViewSet(viewsets.ModelViewSet):
+class PersonaViewSet(ImagenImgBBMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar personas con subida de imágenes a ImgBB
     """
+    # Luxand enrola desde esta URL: se sube en JPEG
+    formato_imagen = "JPEG"
     queryset = Persona.objects.all()
     serializer_class = PersonaSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -90,69 +95,6 @@ class PersonaViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(tipo=tipo)
         return queryset
     
-    def create(self, request, *args, **kwargs):
-        """
-        Crear persona con subida de imagen a ImgBB
-        """
-        return self.handle_image_upload(request, super().create, *args, **kwargs)
-    
-    def update(self, request, *args, **kwargs):
-        """
-        Actualizar persona con subida de imagen a ImgBB
-        """
-        return self.handle_image_upload(request, super().update, *args, **kwargs)
-    
-    def handle_image_upload(self, request, action, *args, **kwargs):
-        """
-        Maneja la subida de imágenes a ImgBB API
-        """
-        imagen_file = request.FILES.get('imagen')
-        
-        if imagen_file:
-            try:
-                # Leer el archivo una sola vez y resetear el puntero
-                imagen_file.seek(0)
-                file_content = imagen_file.read()
-                imagen_file.seek(0)  # Resetear para que el serializer pueda leerlo
-                
-                # Subir imagen a ImgBB
-                url = "https://api.imgbb.com/1/upload"
-                payload = {"key": settings.IMGBB_API_KEY}
-                files = {"image": file_content}
-                
-                response = requests.post(url, payload, files=files)
-                
-                if response.status_code == 200:
-                    # Extraer URL de la imagen subida
-                    image_url = response.json()["data"]["url"]
-                    
-                    # Actualizar los datos de la request con la URL de la imagen
-                    data = request.data.copy()
-                    data["imagen"] = image_url
-                    # Remover el archivo de FILES para evitar problemas de serialización
-                    request._files = {}
-                    request._full_data = data
-                else:
-                    return Response(
-                        {"error": "Error al subir imagen a ImgBB"}, 
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                    )
-            except Exception as e:
-                return Response(
-                    {"error": f"Error al procesar imagen: {str(e)}"}, 
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-        else:
-            # Si no se sube nueva imagen en PUT/PATCH, mantener la existente
-            if request.method in ["PUT", "PATCH"]:
-                instance = self.get_object()
-                data = request.data.copy()
-                if not data.get("imagen"):
-                    data["imagen"] = instance.imagen
-                request._full_data = data
-        
-        return action(request, *args, **kwargs)
-    
     def perform_create(self, serializer):
         instance = serializer.save()
         self._enroll_luxand(instance)
@@ -161,21 +103,13 @@ class PersonaViewSet(viewsets.ModelViewSet):
         instance = serializer.save()
         self._enroll_luxand(instance)
 
+    def coleccion_luxand(self):
+        return colecciones_luxand()[Persona]
+
     def _enroll_luxand(self, persona: Persona):
-        # Solo si hay imagen (URL ImgBB) y aún no fue enrolada
-        if not persona.imagen or persona.luxand_uuid:
-            return
-        try:
-            full_name = f"{persona.nombre} {persona.apellido}".strip() or f"persona-{persona.pk}"
-            col = getattr(settings, "LUXAND_COLLECTION", "")
-            res = add_person(full_name, persona.imagen, col)
-            uuid = res.get("uuid")
-            if uuid:
-                persona.luxand_uuid = uuid
-                persona.save(update_fields=["luxand_uuid"])
-        except Exception as e:
-            # No rompemos el CRUD si falla Luxand (cuota/red/imagen inválida)
-            print(f"[Luxand] No se pudo enrolar Persona {persona.pk}: {e}")
+        # Solo si hay imagen (URL ImgBB) y aún no fue enrolada. No se espera a
+        # Luxand: lo enrola `manage.py procesar_enrolamientos` (luxand_estado)
+        encolar_enrolamiento(persona)
 
     @action(detail=False, methods=["post"])
     def reconocimiento_facial(self, request):
@@ -202,70 +136,23 @@ class PersonaViewSet(viewsets.ModelViewSet):
             # CASO 1: Si viene image_url (WEB) - FUNCIONA EXACTAMENTE IGUAL QUE ANTES
             if image_url and not image_file:
                 print("DEBUG - Modo WEB: Usando image_url directamente")
-                # Llamar a Luxand directamente con la URL
-                luxand_url = "https://api.luxand.cloud/photo/search/v2"
-                luxand_headers = {"token": settings.LUXAND_TOKEN}
-                luxand_data = {
-                    "photo": image_url,
-                    "gallery": gallery
-                }
-                
-                luxand_response = requests.post(luxand_url, headers=luxand_headers, data=luxand_data, timeout=30)
-                
-                if luxand_response.status_code != 200:
-                    return Response({"detail": f"Error en Luxand: {luxand_response.text}"}, status=500)
-                
-                res = luxand_response.json()
+                # Motor configurado (Luxand pasa por el limitador y el circuit breaker)
+                res = reconocedor().reconocer(image_url, gallery=gallery)
             
             # CASO 2: Si viene archivo (MÓVIL) - NUEVA FUNCIONALIDAD
             elif image_file:
-                print("DEBUG - Modo MÓVIL: Subiendo archivo a ImgBB")
-                # Subir imagen a ImgBB
-                url = "https://api.imgbb.com/1/upload"
-                payload = {"key": settings.IMGBB_API_KEY}
-                files = {"image": image_file}
-                
-                response = requests.post(url, payload, files=files)
-                print(f"DEBUG - ImgBB response status: {response.status_code}")
-                
-                if response.status_code == 200:
-                    image_url = response.json()["data"]["url"]
-                    print(f"DEBUG - ImgBB URL obtenida: {image_url}")
-                    
-                    # Llamar a Luxand directamente con la URL
-                    luxand_url = "https://api.luxand.cloud/photo/search/v2"
-                    luxand_headers = {"token": settings.LUXAND_TOKEN}
-                    luxand_data = {
-                        "photo": image_url,
-                        "gallery": gallery
-                    }
-                    
-                    luxand_response = requests.post(luxand_url, headers=luxand_headers, data=luxand_data, timeout=30)
-                    
-                    if luxand_response.status_code != 200:
-                        return Response({"detail": f"Error en Luxand: {luxand_response.text}"}, status=500)
-                    
-                    res = luxand_response.json()
-                else:
-                    print(f"DEBUG - Error ImgBB: {response.text}")
-                    return Response({"detail": "Error al subir imagen a ImgBB"}, status=500)
+                # La foto va directo al motor, orientada, recortada y reducida: sin
+                # pasar por ImgBB (dos saltos menos y sin copia pública de la foto)
+                try:
+                    res = reconocedor().reconocer(image_file, gallery=gallery,
+                                                  recorte=parsear_recorte(request.data.get("rostro")))
+                except ImagenInvalida as e:
+                    return Response({"detail": str(e)}, status=400)
             
             # CASO 3: Si vienen ambos (no debería pasar, pero por seguridad)
             else:
                 print("DEBUG - Ambos parámetros presentes, usando image_url")
-                luxand_url = "https://api.luxand.cloud/photo/search/v2"
-                luxand_headers = {"token": settings.LUXAND_TOKEN}
-                luxand_data = {
-                    "photo": image_url,
-                    "gallery": gallery
-                }
-                
-                luxand_response = requests.post(luxand_url, headers=luxand_headers, data=luxand_data, timeout=30)
-                
-                if luxand_response.status_code != 200:
-                    return Response({"detail": f"Error en Luxand: {luxand_response.text}"}, status=500)
-                
-                res = luxand_response.json()
+                res = reconocedor().reconocer(image_url, gallery=gallery)
             
             # PROCESAR RESPUESTA - MANEJAR TANTO LISTA COMO DICCIONARIO
             print(f"DEBUG - Tipo de respuesta: {type(res)}")
@@ -301,33 +188,35 @@ class PersonaViewSet(viewsets.ModelViewSet):
             print(f"DEBUG - Similarity after normalization: {sim}")
             print(f"DEBUG - Threshold: {umbral}")
             
-            persona = None
-            if uuid:
-                persona = Persona.objects.filter(luxand_uuid=uuid).first()
-                print(f"DEBUG - Persona found: {persona}")
+            # Índice en memoria uuid -> identidad (solo cuentan las personas)
+            persona = resolver_uuid(uuid)
+            if persona and persona["tipo"] != "persona":
+                persona = None
+            print(f"DEBUG - Persona found: {persona}")
             
-            # Lógica más permisiva: si la confianza es muy alta (>= 0.9), ser más flexible
-            if sim >= 0.9:
-                # Con muy alta confianza, aceptar incluso si no encuentra la persona exacta
-                ok = True
-                print(f"DEBUG - Alta confianza detectada ({sim:.3f} >= 0.9), aceptando reconocimiento")
-            else:
-                # Lógica normal para confianza media/baja
-                ok = bool(persona) and sim >= umbral
-                print(f"DEBUG - Confianza normal ({sim:.3f} < 0.9), verificando persona y umbral")
+            # Sin una persona enrolada que corresponda al UUID no se acepta,
+            # por alta que sea la similitud
+            ok = bool(persona) and sim >= umbral
             
             print(f"DEBUG - OK result: {ok} (persona: {bool(persona)}, sim >= umbral: {sim >= umbral})")
             
             return Response({
                 "ok": ok,
-                "persona_id": persona.id if persona else None,
+                "persona_id": persona["id"] if persona else None,
                 "similaridad": round(float(sim), 4),
                 "uuid": uuid,
-                "nombre": persona.nombre_completo if persona else None,
-                "tipo": persona.tipo if persona else None,
+                "nombre": persona["nombre"] if persona else None,
+                "tipo": persona["detalle"] if persona else None,
                 "raw": res
             })
             
+        except LuxandNoDisponible as e:
+            # Circuito abierto o sin cupo: se responde al instante, sin esperar a Luxand
+            return Response(
+                {"detail": str(e), "reintentar_en": e.reintentar_en},
+                status=e.status_code,
+                headers={"Retry-After": str(max(1, round(e.reintentar_en)))},
+            )
         except Exception as e:
             print(f"DEBUG - Error general: {e}")
             return Response({"detail": f"Error en reconocimiento: {e}"}, status=500)
@@ -345,7 +234,7 @@ class PersonaViewSet(viewsets.ModelViewSet):
         if not image_url:
             return Response({"detail": "image_url es requerido"}, status=400)
         try:
-            res = add_face(persona.luxand_uuid, image_url)
+            res = reconocedor().agregar_rostro(persona.luxand_uuid, image_url)
             return Response({"ok": True, "raw": res})
         except Exception as e:
             return Response({"detail": f"Error al agregar foto: {e}"}, status=500)
@@ -365,10 +254,12 @@ class CargoViewSet(viewsets.ModelViewSet):
     ordering = ['nombre']
 
 
-class EmpleadoViewSet(viewsets.ModelViewSet):
+class EmpleadoViewSet(ImagenImgBBMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar empleados con subida de imágenes a ImgBB
     """
+    # Luxand enrola desde esta URL: se sube en JPEG
+    formato_imagen = "JPEG"
     queryset = Empleado.objects.select_related('cargo').all()
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = [
@@ -410,68 +301,6 @@ class EmpleadoViewSet(viewsets.ModelViewSet):
         
         return queryset
     
-    def create(self, request, *args, **kwargs):
-        """
-        Crear empleado con subida de imagen a ImgBB
-        """
-        return self.handle_image_upload(request, super().create, *args, **kwargs)
-    
-    def update(self, request, *args, **kwargs):
-        """
-        Actualizar empleado con subida de imagen a ImgBB
-        """
-        return self.handle_image_upload(request, super().update, *args, **kwargs)
-    
-    def handle_image_upload(self, request, action, *args, **kwargs):
-        """
-        Maneja la subida de imágenes a ImgBB API
-        """
-        imagen_file = request.FILES.get('imagen')
-        
-        if imagen_file:
-            try:
-                # Leer el archivo una sola vez y resetear el puntero
-                imagen_file.seek(0)
-                file_content = imagen_file.read()
-                imagen_file.seek(0)  # Resetear para que el serializer pueda leerlo
-                
-                # Subir imagen a ImgBB
-                url = "https://api.imgbb.com/1/upload"
-                payload = {"key": settings.IMGBB_API_KEY}
-                files = {"image": file_content}
-                
-                response = requests.post(url, payload, files=files)
-                
-                if response.status_code == 200:
-                    # Extraer URL de la imagen subida
-                    image_url = response.json()["data"]["url"]
-                    
-                    # Actualizar los datos de la request con la URL de la imagen
-                    data = request.data.copy()
-                    data["imagen"] = image_url
-                    # Remover el archivo de FILES para evitar problemas de serialización
-                    request._files = {}
-                    request._full_data = data
-                else:
-                    return Response(
-                        {"error": "Error al subir imagen a ImgBB"}, 
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                    )
-            except Exception as e:
-                return Response(
-                    {"error": f"Error al procesar imagen: {str(e)}"}, 
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-        else:
-            # Si no se sube nueva imagen en PUT/PATCH, mantener la existente
-            if request.method in ["PUT", "PATCH"]:
-                instance = self.get_object()
-                data = request.data.copy()
-                if not data.get("imagen"):
-                    data["imagen"] = instance.imagen
-                request._full_data = data
-        
-        return action(request, *args, **kwargs)
     def perform_create(self, serializer):
         instance = serializer.save()
         self._enroll_luxand_empleado(instance)
@@ -480,22 +309,15 @@ class EmpleadoViewSet(viewsets.ModelViewSet):
         instance = serializer.save()
         self._enroll_luxand_empleado(instance)
 
+    def coleccion_luxand(self):
+        # Puedes usar la MISMA colección que Persona (p.ej. settings.LUXAND_COLLECTION)
+        # o una específica para empleados (p.ej. settings.LUXAND_COLLECTION_EMPLEADOS)
+        return colecciones_luxand()[Empleado]
+
     def _enroll_luxand_empleado(self, empleado: Empleado):
-        # Solo si hay imagen (URL ImgBB) y aún no fue enrolado
-        if not empleado.imagen or empleado.luxand_uuid:
-            return
-        try:
-            full_name = f"{empleado.nombre} {empleado.apellido}".strip() or f"empleado-{empleado.pk}"
-            # Puedes usar la MISMA colección que Persona (p.ej. settings.LUXAND_COLLECTION)
-            # o una específica para empleados (p.ej. settings.LUXAND_COLLECTION_EMPLEADOS)
-            col = getattr(settings, "LUXAND_COLLECTION_EMPLEADOS", getattr(settings, "LUXAND_COLLECTION", ""))
-            res = add_person(full_name, empleado.imagen, col)
-            uuid = res.get("uuid")
-            if uuid:
-                empleado.luxand_uuid = uuid
-                empleado.save(update_fields=["luxand_uuid"])
-        except Exception as e:
-            print(f"[Luxand] No se pudo enrolar Empleado {empleado.pk}: {e}")
+        # Solo si hay imagen (URL ImgBB) y aún no fue enrolado; lo enrola el worker
+        encolar_enrolamiento(empleado)
+
     @action(detail=True, methods=["post"])
     def agregar_foto(self, request, pk=None):
         """
@@ -508,7 +330,7 @@ class EmpleadoViewSet(viewsets.ModelViewSet):
         if not image_url:
             return Response({"detail": "image_url es requerido"}, status=400)
         try:
-            res = add_face(empleado.luxand_uuid, image_url)
+            res = reconocedor().agregar_rostro(empleado.luxand_uuid, image_url)
             return Response({"ok": True, "raw": res})
         except Exception as e:
             return Response({"detail": f"Error al agregar foto: {e}"}, status=500)
@@ -123,6 +123,30 @@ FCM_DJANGO_SETTINGS = {
     # Usamos config con un default vacío por si acaso
     "FCM_SERVER_KEY": config("FCM_SERVER_KEY", default=""), 
 }
+# Topic de FCM al que se suscriben todos los dispositivos (difusiones del condominio)
+FCM_TOPIC_CONDOMINIO = config("FCM_TOPIC_CONDOMINIO", default="condominio")
+
+# Cache
+# Sin REDIS_URL se usa memoria local (por proceso); el timeout acota cuánto
+# puede quedar desactualizado un worker que no vio el cambio de versión.
+REDIS_URL = config("REDIS_URL", default="")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+DASHBOARD_CACHE_TIMEOUT = config("DASHBOARD_CACHE_TIMEOUT", default=300, cast=int)
+
+# Procesos que renderizan PDFs de estados de cuenta en el worker (manage.py procesar_estados_cuenta)
+ESTADOS_CUENTA_PROCESOS = config("ESTADOS_CUENTA_PROCESOS", default=2, cast=int)
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -205,9 +229,47 @@ CORS_ALLOW_CREDENTIALS = False
 
 # Configuración de ImgBB API
 IMGBB_API_KEY = config('IMGBB_API_KEY', default='')
+# Las fotos se reducen y recomprimen antes de subirlas (core/imagenes.py)
+IMAGEN_MAX_LADO = config("IMAGEN_MAX_LADO", default=1600, cast=int)
+IMAGEN_FORMATO = config("IMAGEN_FORMATO", default="WEBP")  # WEBP o JPEG
+IMAGEN_CALIDAD = config("IMAGEN_CALIDAD", default=80, cast=int)
+# True: el CRUD guarda sin esperar a ImgBB y la subida la hace `manage.py procesar_subidas`
+IMAGEN_SUBIDA_DIFERIDA = config("IMAGEN_SUBIDA_DIFERIDA", default=True, cast=bool)
 PLATE_TOKEN = config("PLATE_TOKEN")
 PLATE_REGIONS = config("PLATE_REGIONS", default="bo")
 
+# Cliente HTTP compartido para Luxand, ImgBB y PlateRecognizer (core/http_cliente.py)
+HTTP_TIMEOUT = (config("HTTP_TIMEOUT_CONEXION", default=5, cast=float), config("HTTP_TIMEOUT_LECTURA", default=30, cast=float))
+HTTP_REINTENTOS = config("HTTP_REINTENTOS", default=2, cast=int)  # solo para 429/503
+HTTP_BACKOFF_BASE = config("HTTP_BACKOFF_BASE", default=0.5, cast=float)
+HTTP_BACKOFF_MAX = config("HTTP_BACKOFF_MAX", default=4.0, cast=float)
+HTTP_POOL_MAXSIZE = config("HTTP_POOL_MAXSIZE", default=10, cast=int)
+# Segundos entre volcados de las métricas HTTP de cada proceso al cache
+HTTP_METRICAS_INTERVALO = config("HTTP_METRICAS_INTERVALO", default=10.0, cast=float)
+
+# Cache perceptual de reconocimiento facial (core/reconocimiento_cache.py): segundos
+# que se reutiliza el resultado de un mismo rostro (0 = desactivado)
+LUXAND_CACHE_TTL = config("LUXAND_CACHE_TTL", default=2, cast=int)
+# Bits (de 256) en que puede diferir el hash del rostro para reutilizar el resultado;
+# 0 = solo la misma huella exacta
+LUXAND_CACHE_DISTANCIA = config("LUXAND_CACHE_DISTANCIA", default=6, cast=int)
+# Fotos enviadas directo a Luxand: lado mayor y calidad JPEG (sobra para detectar rostros)
+LUXAND_MAX_LADO = config("LUXAND_MAX_LADO", default=800, cast=int)
+LUXAND_CALIDAD = config("LUXAND_CALIDAD", default=85, cast=int)
+# Motor de reconocimiento facial (core/reconocedores.py): "luxand" (nube) o "local"
+# (embeddings en el servidor). "local" exige un extractor de rostros real (ruta a la
+# clase); core.reconocedores.ExtractorDeterminista es solo para los tests
+RECONOCIMIENTO_BACKEND = config("RECONOCIMIENTO_BACKEND", default="luxand")
+RECONOCIMIENTO_EXTRACTOR = config("RECONOCIMIENTO_EXTRACTOR", default="")
+# Límite de llamadas a Luxand según el plan contratado (llamadas/segundo y ráfaga).
+# Es por proceso: con varios workers de gunicorn, dividir la tasa del plan entre ellos
+LUXAND_TASA = config("LUXAND_TASA", default=5.0, cast=float)
+LUXAND_RAFAGA = config("LUXAND_RAFAGA", default=5, cast=int)
+LUXAND_ESPERA_CUPO = config("LUXAND_ESPERA_CUPO", default=1.0, cast=float)  # segundos máx. esperando cupo
+# Circuit breaker: fallas seguidas (5xx/429/red) para abrirlo y segundos hasta la llamada de prueba
+LUXAND_BREAKER_FALLAS = config("LUXAND_BREAKER_FALLAS", default=5, cast=int)
+LUXAND_BREAKER_ESPERA = config("LUXAND_BREAKER_ESPERA", default=30.0, cast=float)
+
 CLOUDINARY_CLOUD_NAME = config("CLOUDINARY_CLOUD_NAME", default="")
 CLOUDINARY_API_KEY = config("CLOUDINARY_API_KEY", default="")
 CLOUDINARY_API_SECRET = config("CLOUDINARY_API_SECRET", default="")
@@ -0,0 +1,246 @@
+# core/enrolamiento.py
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from administracion.models import Persona, Empleado
+from core.identidades import invalidar_identidades
+from core.limitador import TokenBucket
+from core.luxand import LuxandError
+from core.reconocedores import reconocedor
+
+MAX_INTENTOS = 6
+# Un enrolamiento 'R' más viejo que esto se considera abandonado y se retoma
+TIMEOUT_PROCESO = timedelta(minutes=5)
+# En segundo plano sí se puede esperar cupo del limitador de core.luxand
+ESPERA_CUPO_WORKER = 60
+CAMPOS_COLA = ["luxand_uuid", "luxand_estado", "luxand_intentos", "luxand_proximo_intento", "luxand_error"]
+
+
+def colecciones_luxand() -> dict:
+    """Colección de Luxand de cada tipo, igual que al enrolar desde el CRUD."""
+    persona = getattr(settings, "LUXAND_COLLECTION", "")
+    return {
+        Persona: persona,
+        Empleado: getattr(settings, "LUXAND_COLLECTION_EMPLEADOS", persona),
+    }
+
+
+def pendientes_de_enrolar(modelo, ahora=None):
+    # Los que alguien está enrolando en este momento ('R' con lease vigente) no se tocan
+    return (modelo.objects.filter(imagen__isnull=False, luxand_uuid__isnull=True)
+            .exclude(imagen="").exclude(luxand_estado='R', luxand_proximo_intento__gt=ahora or timezone.now())
+            .order_by("id"))
+
+
+def _reclamar(modelo, ids, ahora) -> dict:
+    """
+    Pasa a 'R' los `ids` que siguen pendientes y libres, con el mismo lease
+    que _tomar: así procesar_enrolamientos no los toma a la vez. Devuelve
+    {pk: (estado, proximo_intento)} para devolverlos a la cola si fallan.
+    """
+    with transaction.atomic():
+        reclamados = {
+            pk: (estado, proximo) for pk, estado, proximo in
+            pendientes_de_enrolar(modelo, ahora).select_for_update(skip_locked=True)
+            .filter(pk__in=ids).values_list("pk", "luxand_estado", "luxand_proximo_intento")
+        }
+        modelo.objects.filter(pk__in=reclamados).update(
+            luxand_estado='R', luxand_proximo_intento=ahora + TIMEOUT_PROCESO
+        )
+    return reclamados
+
+
+def _enrolar(obj, coleccion, limitador=None):
+    """Devuelve (obj, uuid, excepción). Corre en los hilos: no toca la BD."""
+    if limitador is not None:
+        limitador.tomar()
+    try:
+        nombre = f"{obj.nombre} {obj.apellido}".strip() or f"{type(obj).__name__.lower()}-{obj.pk}"
+        res = reconocedor().enrolar(nombre, obj.imagen, coleccion, espera_cupo=ESPERA_CUPO_WORKER)
+        uuid = res.get("uuid")
+        if not uuid:
+            # p. ej. {"status": "failure", "message": "Can't find faces"}
+            return obj, None, LuxandError(res.get("message") or "Luxand no devolvió uuid")
+        return obj, uuid, None
+    except Exception as e:
+        return obj, None, e
+
+
+def _reintentable(error) -> bool:
+    """Red caída, cuota agotada o Luxand con problemas: vale la pena reintentar."""
+    if isinstance(error, requests.RequestException):
+        return True
+    codigo = getattr(error, "status_code", None)
+    return codigo is not None and (codigo in (403, 429) or codigo >= 500)
+
+
+def enrolar_pendientes(tasa: float = None, rafaga: int = None, hilos: int = 4, lote: int = 100,
+                       limite: int = None, progreso=None) -> dict:
+    """
+    Enrola en Luxand a todas las personas y empleados con foto y sin
+    luxand_uuid. Las llamadas salen de `hilos` hilos, limitadas por el token
+    bucket de core.luxand y, si se indica `tasa`, además a esa cantidad por
+    segundo. Cada lote se reclama antes de enviarlo (ver _reclamar), así que
+    puede correr junto a procesar_enrolamientos sin enrolar dos veces. Los
+    UUIDs se guardan con bulk_update al cerrar cada lote: si la corrida se
+    corta, al repetirla solo quedan los que faltan.
+    """
+    limitador = TokenBucket(tasa, rafaga or settings.LUXAND_RAFAGA) if tasa else None
+    inicio = time.monotonic()
+    stats = {'enrolados': 0, 'omitidos': 0, 'errores': {}}
+
+    trabajo = []
+    for modelo, coleccion in colecciones_luxand().items():
+        trabajo.extend((obj, coleccion) for obj in pendientes_de_enrolar(modelo)
+                       .only("id", "nombre", "apellido", "imagen", "luxand_uuid", "luxand_estado"))
+    if limite:
+        trabajo = trabajo[:limite]
+    stats['total'] = len(trabajo)
+
+    with ThreadPoolExecutor(max_workers=max(hilos, 1)) as pool:
+        for i in range(0, len(trabajo), lote):
+            tramo = trabajo[i:i + lote]
+            ahora = timezone.now()
+            reclamados = {
+                modelo: _reclamar(modelo, [obj.pk for obj, _ in tramo if type(obj) is modelo], ahora)
+                for modelo in (Persona, Empleado)
+            }
+            # Los que tomó el worker (o se enrolaron) desde la lectura inicial se saltean
+            tramo = [(obj, col) for obj, col in tramo if obj.pk in reclamados[type(obj)]]
+            stats['omitidos'] += len(trabajo[i:i + lote]) - len(tramo)
+            enrolados = {Persona: [], Empleado: []}
+            futuros = [pool.submit(_enrolar, obj, col, limitador) for obj, col in tramo]
+            registrados = set()
+
+            def registrar(f):
+                registrados.add(f)
+                obj, uuid, error = f.result()
+                if error:
+                    stats['errores'][f"{type(obj).__name__.lower()}-{obj.pk}"] = str(error)
+                    return
+                obj.luxand_uuid = uuid
+                obj.luxand_estado = 'E'
+                enrolados[type(obj)].append(obj)
+
+            try:
+                for f in as_completed(futuros):
+                    registrar(f)
+            finally:
+                # Ante Ctrl+C: se cancela lo que no empezó, se esperan las llamadas
+                # en curso y se guarda todo lo ya enrolado en Luxand
+                for f in futuros:
+                    f.cancel()
+                for f in futuros:
+                    if f not in registrados and not f.cancelled():
+                        registrar(f)
+                for modelo, objs in enrolados.items():
+                    modelo.objects.bulk_update(objs, ["luxand_uuid", "luxand_estado"], batch_size=500)
+                    stats['enrolados'] += len(objs)
+                    # Los que fallaron o no llegaron a enviarse vuelven al estado que tenían
+                    hechos = {obj.pk for obj in objs}
+                    liberar = []
+                    for pk, (estado, proximo) in reclamados[modelo].items():
+                        if pk not in hechos:
+                            liberar.append(modelo(pk=pk, luxand_estado=estado, luxand_proximo_intento=proximo))
+                    modelo.objects.bulk_update(liberar, ["luxand_estado", "luxand_proximo_intento"], batch_size=500)
+                if any(enrolados.values()):
+                    # bulk_update no dispara signals
+                    invalidar_identidades()
+            if progreso:
+                progreso(min(i + lote, len(trabajo)), len(trabajo))
+
+    stats['segundos'] = round(time.monotonic() - inicio, 2)
+    stats['por_segundo'] = round(stats['enrolados'] / stats['segundos'], 2) if stats['segundos'] else 0
+    return stats
+
+
+def _modelo_base(obj):
+    # Inquilino, Familiares y Visitante heredan de Persona
+    return Persona if isinstance(obj, Persona) else Empleado
+
+
+def encolar_enrolamiento(obj) -> bool:
+    """
+    Marca a la persona/empleado como pendiente de enrolar (sin llamar a
+    Luxand). Si ya hay un enrolamiento pendiente o en curso no se duplica.
+    Devuelve True si quedó encolado.
+    """
+    if not obj.imagen or obj.luxand_uuid:
+        return False
+    encolados = (
+        _modelo_base(obj).objects
+        .filter(pk=obj.pk, luxand_uuid__isnull=True)
+        .exclude(luxand_estado__in=['P', 'R'])
+        .update(luxand_estado='P', luxand_intentos=0, luxand_proximo_intento=timezone.now(), luxand_error="")
+    )
+    if encolados:
+        obj.luxand_estado = 'P'
+    return bool(encolados)
+
+
+def _tomar(modelo, lote: int, ahora) -> list:
+    """
+    Reclama hasta `lote` pendientes (o 'R' abandonados) pasándolos a 'R' en
+    una transacción corta: la llamada a Luxand ocurre fuera, sin locks.
+    """
+    with transaction.atomic():
+        objs = list(
+            modelo.objects.select_for_update(skip_locked=True)
+            .filter(luxand_estado__in=['P', 'R'], luxand_proximo_intento__lte=ahora, luxand_uuid__isnull=True)
+            .only("id", "nombre", "apellido", "imagen", *CAMPOS_COLA)
+            .order_by("luxand_proximo_intento")[:lote]
+        )
+        modelo.objects.filter(pk__in=[o.pk for o in objs]).update(
+            luxand_estado='R', luxand_proximo_intento=ahora + TIMEOUT_PROCESO
+        )
+    return objs
+
+
+def procesar_enrolamientos(lote: int = 50, hilos: int = 4) -> dict:
+    """
+    Enrola en Luxand los pendientes de la cola. Los errores de red/cuota se
+    reintentan con backoff exponencial; los definitivos (sin cara, imagen
+    inválida) o tras MAX_INTENTOS quedan en 'F' con el error guardado.
+    """
+    ahora = timezone.now()
+    stats = {'enrolados': 0, 'reintentos': 0, 'fallidos': 0}
+    colecciones = colecciones_luxand()
+
+    trabajo = [(obj, colecciones[modelo]) for modelo in (Persona, Empleado) for obj in _tomar(modelo, lote, ahora)]
+    if not trabajo:
+        return stats
+
+    with ThreadPoolExecutor(max_workers=max(hilos, 1)) as pool:
+        resultados = list(pool.map(lambda t: _enrolar(*t), trabajo))
+
+    por_modelo = {Persona: [], Empleado: []}
+    for obj, uuid, error in resultados:
+        obj.luxand_intentos += 1
+        if uuid:
+            obj.luxand_uuid = uuid
+            obj.luxand_estado = 'E'
+            obj.luxand_error = ""
+            stats['enrolados'] += 1
+        elif _reintentable(error) and obj.luxand_intentos < MAX_INTENTOS:
+            obj.luxand_estado = 'P'
+            obj.luxand_error = str(error)[:1000]
+            # Backoff exponencial: 1m, 2m, 4m, 8m...
+            obj.luxand_proximo_intento = ahora + timedelta(minutes=2 ** (obj.luxand_intentos - 1))
+            stats['reintentos'] += 1
+        else:
+            obj.luxand_estado = 'F'
+            obj.luxand_error = str(error)[:1000]
+            stats['fallidos'] += 1
+        por_modelo[type(obj)].append(obj)
+
+    for modelo, objs in por_modelo.items():
+        modelo.objects.bulk_update(objs, CAMPOS_COLA, batch_size=500)
+    if stats['enrolados']:
+        # bulk_update no dispara signals
+        invalidar_identidades()
+    return stats
@@ -0,0 +1,191 @@
+# core/http_cliente.py
+"""
+Cliente HTTP compartido para los servicios externos (Luxand, ImgBB,
+PlateRecognizer). Reutiliza conexiones keep-alive por host, aplica timeouts
+por defecto, reintenta 429/503 con backoff exponencial con jitter y registra
+métricas por upstream (llamadas, status, latencia y bytes).
+
+Las métricas se acumulan en memoria del proceso y se vuelcan al cache en
+lote (cada settings.HTTP_METRICAS_INTERVALO segundos, al consultarlas y al
+salir): una llamada HTTP no paga media docena de round-trips al cache.
+"""
+import atexit
+import random
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.cache import cache
+
+UPSTREAMS = {
+    "api.luxand.cloud": "luxand",
+    "api.imgbb.com": "imgbb",
+    "api.platerecognizer.com": "platerecognizer",
+}
+STATUS_REINTENTABLES = (429, 503)
+METRICAS = (
+    "llamadas", "reintentos", "errores", "ms_total",
+    "bytes_enviados", "bytes_recibidos", "2xx", "3xx", "4xx", "5xx", "429", "503",
+)
+METRICAS_KEY = "http:{upstream}:{metrica}"
+
+_local = threading.local()
+
+
+def _upstream(url: str) -> str:
+    host = urlsplit(url).hostname or ""
+    return UPSTREAMS.get(host, host)
+
+
+def sesion(url: str) -> requests.Session:
+    """
+    Session por hilo y por host: requests.Session no es thread-safe, pero
+    dentro de un mismo hilo las conexiones TCP/TLS se reutilizan.
+    """
+    sesiones = getattr(_local, "sesiones", None)
+    if sesiones is None:
+        sesiones = _local.sesiones = {}
+    partes = urlsplit(url)
+    clave = f"{partes.scheme}://{partes.netloc}"
+    s = sesiones.get(clave)
+    if s is None:
+        s = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=getattr(settings, "HTTP_POOL_MAXSIZE", 10))
+        s.mount(clave, adapter)
+        sesiones[clave] = s
+    return s
+
+
+_pendientes = Counter()
+_pendientes_lock = threading.Lock()
+_ultimo_volcado = time.monotonic()
+
+
+def _sumar(upstream: str, metrica: str, cantidad: int = 1):
+    if not cantidad:
+        return
+    with _pendientes_lock:
+        _pendientes[(upstream, metrica)] += cantidad
+
+
+def volcar_metricas(forzar: bool = False):
+    """
+    Suma al cache los contadores acumulados en este proceso, un incr por
+    métrica con cambios. Sin `forzar` solo vuelca si pasó el intervalo.
+    """
+    global _ultimo_volcado
+    with _pendientes_lock:
+        ahora = time.monotonic()
+        if not forzar and ahora - _ultimo_volcado < getattr(settings, "HTTP_METRICAS_INTERVALO", 10.0):
+            return
+        lote = dict(_pendientes)
+        _pendientes.clear()
+        _ultimo_volcado = ahora
+    for (upstream, metrica), cantidad in lote.items():
+        clave = METRICAS_KEY.format(upstream=upstream, metrica=metrica)
+        try:
+            cache.incr(clave, cantidad)
+        except ValueError:
+            cache.add(clave, 0, timeout=None)
+            cache.incr(clave, cantidad)
+
+
+atexit.register(volcar_metricas, forzar=True)
+
+
+def _tamano_body(body) -> int:
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    if isinstance(body, str):
+        return len(body.encode())
+    return 0
+
+
+def _rebobinar(files):
+    """Vuelve al inicio los archivos del multipart antes de reintentar."""
+    if not files:
+        return
+    for valor in (files.values() if isinstance(files, dict) else files):
+        if isinstance(valor, (tuple, list)):
+            valor = valor[1] if len(valor) > 1 else None
+        if hasattr(valor, "seek"):
+            valor.seek(0)
+
+
+def _espera(intento: int, respuesta) -> float:
+    """Backoff exponencial con jitter completo; respeta Retry-After si viene."""
+    base = getattr(settings, "HTTP_BACKOFF_BASE", 0.5)
+    maximo = getattr(settings, "HTTP_BACKOFF_MAX", 4.0)
+    espera = random.uniform(0, min(maximo, base * 2 ** intento))
+    retry_after = respuesta.headers.get("Retry-After", "") if respuesta is not None else ""
+    if retry_after.isdigit():
+        espera = max(espera, float(retry_after))
+    return min(espera, maximo)
+
+
+def solicitar(metodo: str, url: str, reintentos: int = None, **kwargs) -> requests.Response:
+    """
+    Igual que requests.request, pero con keep-alive, timeout por defecto y
+    reintentos para 429/503. Tras agotar los reintentos devuelve la última
+    respuesta (el llamador decide qué hacer con el status). Los errores de red
+    se propagan como requests.RequestException.
+    """
+    upstream = _upstream(url)
+    reintentos = getattr(settings, "HTTP_REINTENTOS", 2) if reintentos is None else reintentos
+    kwargs.setdefault("timeout", getattr(settings, "HTTP_TIMEOUT", (5, 30)))
+    s = sesion(url)
+
+    intento = 0
+    try:
+        while True:
+            _sumar(upstream, "llamadas")
+            inicio = time.monotonic()
+            try:
+                respuesta = s.request(metodo, url, **kwargs)
+            except requests.RequestException:
+                _sumar(upstream, "errores")
+                _sumar(upstream, "ms_total", int((time.monotonic() - inicio) * 1000))
+                raise
+            _sumar(upstream, "ms_total", int((time.monotonic() - inicio) * 1000))
+            _sumar(upstream, "bytes_enviados", _tamano_body(respuesta.request.body))
+            _sumar(upstream, "bytes_recibidos", len(respuesta.content))
+            _sumar(upstream, f"{respuesta.status_code // 100}xx")
+            if respuesta.status_code in STATUS_REINTENTABLES:
+                _sumar(upstream, str(respuesta.status_code))
+
+            if respuesta.status_code not in STATUS_REINTENTABLES or intento >= reintentos:
+                return respuesta
+            time.sleep(_espera(intento, respuesta))
+            _rebobinar(kwargs.get("files"))
+            _sumar(upstream, "reintentos")
+            intento += 1
+    finally:
+        volcar_metricas()
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return solicitar("POST", url, **kwargs)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return solicitar("GET", url, **kwargs)
+
+
+def metricas() -> dict:
+    """
+    Métricas acumuladas por upstream, con la latencia promedio calculada.
+    Incluye todo lo de este proceso; lo de otros workers puede llegar con
+    hasta HTTP_METRICAS_INTERVALO segundos de retraso.
+    """
+    volcar_metricas(forzar=True)
+    resultado = {}
+    for upstream in sorted(set(UPSTREAMS.values())):
+        claves = {m: METRICAS_KEY.format(upstream=upstream, metrica=m) for m in METRICAS}
+        valores = cache.get_many(list(claves.values()))
+        datos = {m: valores.get(clave, 0) for m, clave in claves.items()}
+        datos["ms_promedio"] = round(datos["ms_total"] / datos["llamadas"], 1) if datos["llamadas"] else 0
+        resultado[upstream] = datos
+    return resultado
@@ -0,0 +1,72 @@
+# core/identidades.py
+"""
+Índice en memoria luxand_uuid -> identidad (persona o empleado) para resolver
+el resultado de Luxand sin consultar la BD en cada reconocimiento. Se carga
+una vez por proceso y se recarga cuando cambia la versión en el cache (cada
+alta/edición/baja de Persona o Empleado la incrementa), así la invalidación
+llega a todos los workers.
+"""
+import threading
+from django.core.cache import cache
+
+from administracion.models import Persona, Empleado
+
+VERSION_KEY = "luxand:identidades:version"
+
+_lock = threading.Lock()
+_indice = None
+_version = None
+
+
+def version_identidades() -> int:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def invalidar_identidades():
+    global _indice
+    _indice = None
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        cache.incr(VERSION_KEY)
+
+
+def _cargar() -> dict:
+    indice = {}
+    # Persona primero: si un UUID estuviera en ambas tablas gana la persona
+    for tipo, modelo, extra in (("persona", Persona, "tipo"), ("empleado", Empleado, "cargo__nombre")):
+        filas = (modelo.objects.filter(luxand_uuid__isnull=False).exclude(luxand_uuid="")
+                 .values_list("luxand_uuid", "id", "nombre", "apellido", "estado", extra))
+        for uuid, id_, nombre, apellido, estado, detalle in filas:
+            indice.setdefault(uuid, {
+                "tipo": tipo,
+                "id": id_,
+                "nombre": f"{nombre} {apellido}".strip(),
+                "estado": estado,
+                "detalle": detalle,  # tipo de persona (P/I/F/V) o cargo del empleado
+            })
+    return indice
+
+
+def indice_identidades() -> dict:
+    global _indice, _version
+    version = version_identidades()
+    indice = _indice
+    if indice is None or _version != version:
+        with _lock:
+            if _indice is None or _version != version:
+                _indice, _version = _cargar(), version
+            indice = _indice
+    return indice
+
+
+def resolver_uuid(uuid):
+    """Identidad enrolada con ese UUID de Luxand, o None."""
+    if not uuid:
+        return None
+    return indice_identidades().get(uuid)
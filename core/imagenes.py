@@ -0,0 +1,311 @@
+# core/imagenes.py
+import hashlib
+from io import BytesIO
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.http import QueryDict
+from PIL import Image, ImageOps, UnidentifiedImageError
+from rest_framework import status
+from rest_framework.response import Response
+
+from core import http_cliente
+from administracion.models import HuellaImagen
+
+IMGBB_URL = "https://api.imgbb.com/1/upload"
+
+
+class ImagenInvalida(ValueError):
+    """El archivo subido no se puede decodificar como imagen."""
+
+
+FORMATOS = {
+    "WEBP": ("webp", "image/webp"),
+    "JPEG": ("jpg", "image/jpeg"),
+}
+
+
+# Margen alrededor del rostro al recortar (fracción del lado del recuadro):
+# Luxand necesita algo de contexto (frente, mentón) para detectar la cara
+MARGEN_ROSTRO = 0.4
+
+
+def parsear_recorte(valor):
+    """
+    Recuadro del rostro enviado por el cliente ("x,y,ancho,alto" o lista de 4
+    números, en píxeles de la foto ya orientada) -> tupla de floats, o None si
+    no viene o no es válido (se usa la foto completa).
+    """
+    if not valor:
+        return None
+    if isinstance(valor, str):
+        valor = valor.strip("[]() ").split(",")
+    try:
+        x, y, ancho, alto = (float(v) for v in valor)
+    except (TypeError, ValueError):
+        return None
+    if ancho <= 0 or alto <= 0 or x < 0 or y < 0:
+        return None
+    return x, y, ancho, alto
+
+
+def _caja_recorte(recorte, tamano_original, tamano_actual):
+    """
+    Recuadro del rostro (en píxeles de la foto original orientada) con margen,
+    escalado a la imagen decodificada y limitado a sus bordes. None si queda vacío.
+    """
+    x, y, ancho, alto = recorte
+    escala_x = tamano_actual[0] / tamano_original[0]
+    escala_y = tamano_actual[1] / tamano_original[1]
+    margen_x, margen_y = ancho * MARGEN_ROSTRO, alto * MARGEN_ROSTRO
+    izq = max(0, int((x - margen_x) * escala_x))
+    arriba = max(0, int((y - margen_y) * escala_y))
+    der = min(tamano_actual[0], int((x + ancho + margen_x) * escala_x + 0.5))
+    abajo = min(tamano_actual[1], int((y + alto + margen_y) * escala_y + 0.5))
+    if der - izq < 2 or abajo - arriba < 2:
+        return None
+    return izq, arriba, der, abajo
+
+
+def abrir_imagen(archivo, max_lado: int, recorte=None, sin_alfa: bool = False):
+    """
+    Decodifica la foto con Pillow, aplica la orientación EXIF (descartando el
+    resto de metadatos), recorta al rostro si se indica `recorte` (x, y, ancho,
+    alto, ver parsear_recorte) y reduce el lado mayor a `max_lado`. Devuelve
+    una imagen RGB (o RGBA si tiene transparencia y no se pide `sin_alfa`).
+    Lanza ImagenInvalida si no es imagen.
+    """
+    if hasattr(archivo, "seek"):
+        archivo.seek(0)
+    try:
+        img = Image.open(archivo)
+        original = img.size
+        rotada = img.getexif().get(0x0112) in (5, 6, 7, 8)  # orientaciones que giran 90°
+        if rotada:
+            original = original[::-1]
+        objetivo = (max_lado, max_lado)
+        if recorte:
+            # El rostro ocupa solo una parte: hay que decodificar con más resolución
+            # para que el recorte conserve hasta max_lado píxeles
+            objetivo = tuple(min(lado, int(max_lado * lado / max(r, 1)) + 1)
+                             for lado, r in zip(original, recorte[2:]))
+            if rotada:
+                objetivo = objetivo[::-1]
+        # En JPEG decodifica directamente a escala reducida (mucho más rápido)
+        img.draft("RGB", objetivo)
+        img = ImageOps.exif_transpose(img)
+        if recorte:
+            caja = _caja_recorte(recorte, original, img.size)
+            if caja:
+                img = img.crop(caja)
+
+        con_alfa = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+        if sin_alfa and con_alfa:
+            rgba = img.convert("RGBA")
+            img = Image.new("RGB", rgba.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba.getchannel("A"))
+        elif img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if con_alfa else "RGB")
+
+        img.thumbnail((max_lado, max_lado), Image.LANCZOS, reducing_gap=3.0)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ImagenInvalida(f"Imagen inválida: {e}")
+    return img
+
+
+def preparar_imagen(archivo, max_lado: int = None, formato: str = None, calidad: int = None, recorte=None):
+    """
+    Foto -> bytes listos para subir: orientada, sin EXIF (GPS, modelo de
+    cámara...), recortada si hay `recorte`, reducida a `max_lado` y
+    recomprimida (ver abrir_imagen).
+    Devuelve (bytes, extensión, content_type). Lanza ImagenInvalida si no es imagen.
+    """
+    max_lado = max_lado or settings.IMAGEN_MAX_LADO
+    formato = (formato or settings.IMAGEN_FORMATO).upper()
+    calidad = calidad or settings.IMAGEN_CALIDAD
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de imagen no soportado: {formato}")
+
+    img = abrir_imagen(archivo, max_lado, recorte, sin_alfa=formato == "JPEG")
+    out = BytesIO()
+    if formato == "WEBP":
+        img.save(out, "WEBP", quality=calidad, method=4)
+    else:
+        img.save(out, "JPEG", quality=calidad, optimize=True, progressive=True)
+    extension, content_type = FORMATOS[formato]
+    return out.getvalue(), extension, content_type
+
+
+def foto_para_luxand(archivo, recorte=None):
+    """
+    Foto de la cámara -> (nombre, bytes, content_type) listo para el multipart
+    de Luxand: orientada, recortada al rostro si se indica `recorte`, reducida
+    a settings.LUXAND_MAX_LADO y en JPEG.
+    """
+    contenido, extension, content_type = preparar_imagen(
+        archivo, max_lado=settings.LUXAND_MAX_LADO, formato="JPEG", calidad=settings.LUXAND_CALIDAD,
+        recorte=recorte,
+    )
+    return f"foto.{extension}", contenido, content_type
+
+
+def subir_imgbb(contenido: bytes, nombre: str = "imagen.jpg", content_type: str = "image/jpeg") -> str:
+    """
+    Sube bytes de imagen a ImgBB y devuelve la URL pública.
+    """
+    response = http_cliente.post(
+        IMGBB_URL,
+        data={"key": settings.IMGBB_API_KEY},
+        files={"image": (nombre, contenido, content_type)},
+        timeout=30,
+    )
+    if response.status_code != 200:
+        raise ValueError(f"Error al subir imagen a ImgBB: {response.text[:300]}")
+    return response.json()["data"]["url"]
+
+
+def huella(contenido: bytes) -> str:
+    return hashlib.sha256(contenido).hexdigest()
+
+
+def url_por_huella(sha: str):
+    """URL ya subida con ese contenido exacto, o None. Cuenta el reuso."""
+    url = HuellaImagen.objects.filter(sha256=sha).values_list("url", flat=True).first()
+    if url:
+        HuellaImagen.objects.filter(sha256=sha).update(usos=F("usos") + 1)
+    return url
+
+
+def registrar_huella(sha: str, url: str, contenido: bytes, content_type: str):
+    HuellaImagen.objects.update_or_create(
+        sha256=sha, defaults={"url": url, "mime": content_type, "tamano": len(contenido)}
+    )
+
+
+def ingerir_imagen(archivo, formato: str = None) -> str:
+    """
+    Foto subida por el cliente -> imagen reducida y sin EXIF en ImgBB -> URL.
+    Si esos mismos bytes ya se subieron antes, devuelve la URL existente.
+    """
+    contenido, extension, content_type = preparar_imagen(archivo, formato=formato)
+    sha = huella(contenido)
+    url = url_por_huella(sha)
+    if url is None:
+        url = subir_imgbb(contenido, f"imagen.{extension}", content_type)
+        registrar_huella(sha, url, contenido, content_type)
+    return url
+
+
+def _datos_sin_archivo(request, campo: str):
+    """
+    Copia de request.data sin el archivo subido (copiar el QueryDict con el
+    archivo dentro lo duplicaría en memoria/disco).
+    """
+    if isinstance(request.data, QueryDict):
+        data = QueryDict(mutable=True)
+        for clave, valores in request.data.lists():
+            if clave != campo:
+                data.setlist(clave, valores)
+        return data
+    return {k: v for k, v in request.data.items() if k != campo}
+
+
+class ImagenImgBBMixin:
+    """
+    Mixin para ViewSets cuyo modelo guarda la URL de una foto en ImgBB.
+    En create/update, si llega un archivo en `campo_imagen` se procesa con
+    `preparar_imagen` y se reemplaza por la URL; si no llega en PUT/PATCH se
+    mantiene la foto actual.
+    Con settings.IMAGEN_SUBIDA_DIFERIDA la subida a ImgBB no bloquea la
+    respuesta: la imagen procesada se encola (core.subidas) y el campo queda
+    vacío hasta que `procesar_subidas` lo completa.
+    """
+    campo_imagen = "imagen"
+    formato_imagen = None  # None = settings.IMAGEN_FORMATO
+
+    def coleccion_luxand(self):
+        """Colección de Luxand donde enrolar tras la subida diferida (None = no enrolar)."""
+        return None
+
+    def create(self, request, *args, **kwargs):
+        return self.handle_image_upload(request, super().create, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        return self.handle_image_upload(request, super().update, *args, **kwargs)
+
+    def handle_image_upload(self, request, action, *args, **kwargs):
+        campo = self.campo_imagen
+        imagen_file = request.FILES.get(campo)
+
+        if imagen_file and getattr(settings, "IMAGEN_SUBIDA_DIFERIDA", False):
+            return self._subida_diferida(request, action, imagen_file, *args, **kwargs)
+
+        if imagen_file:
+            try:
+                image_url = ingerir_imagen(imagen_file, formato=self.formato_imagen)
+            except ImagenInvalida as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            except ValueError:
+                return Response(
+                    {"error": "Error al subir imagen a ImgBB"},
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                )
+            except requests.exceptions.RequestException as e:
+                return Response(
+                    {"error": f"Error de conexión con ImgBB: {e}"},
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                )
+            data = _datos_sin_archivo(request, campo)
+            data[campo] = image_url
+            # Remover el archivo de FILES para evitar problemas de serialización
+            request._files = QueryDict(mutable=True)
+            request._full_data = data
+        elif request.method in ["PUT", "PATCH"]:
+            # Si no se sube nueva imagen en PUT/PATCH, mantener la existente
+            if not request.data.get(campo):
+                instance = self.get_object()
+                data = _datos_sin_archivo(request, campo)
+                data[campo] = getattr(instance, campo)
+                request._full_data = data
+
+        return action(request, *args, **kwargs)
+
+    def _subida_diferida(self, request, action, imagen_file, *args, **kwargs):
+        from core.subidas import descartar_subidas_pendientes, encolar_subida
+
+        campo = self.campo_imagen
+        try:
+            contenido, extension, content_type = preparar_imagen(imagen_file, formato=self.formato_imagen)
+        except ImagenInvalida as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = _datos_sin_archivo(request, campo)
+        url = url_por_huella(huella(contenido))
+        if url:
+            # Foto ya subida: se usa la URL existente y no hace falta encolar,
+            # pero una subida anterior aún pendiente pisaría esta foto al terminar
+            data[campo] = url
+            request._files = QueryDict(mutable=True)
+            request._full_data = data
+            with transaction.atomic():
+                response = action(request, *args, **kwargs)
+                if request.method in ["PUT", "PATCH"] and response.status_code == status.HTTP_200_OK:
+                    descartar_subidas_pendientes(self.get_object(), campo)
+            return response
+        if request.method in ["PUT", "PATCH"]:
+            # Hasta que termine la subida se conserva la foto anterior
+            data[campo] = getattr(self.get_object(), campo)
+        request._files = QueryDict(mutable=True)
+        request._full_data = data
+
+        with transaction.atomic():
+            response = action(request, *args, **kwargs)
+            if response.status_code not in (status.HTTP_200_OK, status.HTTP_201_CREATED):
+                return response
+            pk = response.data.get("id", self.kwargs.get(self.lookup_url_kwarg or self.lookup_field))
+            obj = self.get_queryset().model.objects.get(pk=pk)
+            encolar_subida(obj, campo, contenido, extension, content_type, luxand_coleccion=self.coleccion_luxand())
+
+        response.data[f"{campo}_pendiente"] = True
+        return response
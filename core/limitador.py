@@ -0,0 +1,111 @@
+# core/limitador.py
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Limitador de tasa thread-safe: `tasa` tokens por segundo con ráfagas de
+    hasta `capacidad`. `tomar()` bloquea hasta que hay un token (o hasta
+    `espera_max` segundos, devolviendo False).
+    """
+
+    def __init__(self, tasa: float, capacidad: int = None):
+        self.tasa = float(tasa)
+        self.capacidad = float(capacidad or max(1, int(tasa)))
+        self._tokens = self.capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _recargar(self, ahora: float):
+        self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+        self._ultimo = ahora
+
+    def intentar(self) -> bool:
+        """Toma un token si hay uno disponible, sin esperar."""
+        with self._lock:
+            self._recargar(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def tomar(self, espera_max: float = None) -> bool:
+        limite = None if espera_max is None else time.monotonic() + espera_max
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._recargar(ahora)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                falta = (1 - self._tokens) / self.tasa
+            if limite is not None and ahora + falta > limite:
+                return False
+            time.sleep(falta)
+
+    def disponibles(self) -> float:
+        with self._lock:
+            self._recargar(time.monotonic())
+            return round(self._tokens, 2)
+
+
+class CircuitBreaker:
+    """
+    Corta las llamadas a un upstream caído: tras `umbral` fallas seguidas se
+    abre y rechaza todo durante `espera` segundos; luego deja pasar una sola
+    llamada de prueba (semiabierto) que lo cierra si sale bien o lo vuelve a
+    abrir si falla.
+    """
+    CERRADO = "cerrado"
+    ABIERTO = "abierto"
+    SEMIABIERTO = "semiabierto"
+
+    def __init__(self, umbral: int = 5, espera: float = 30.0):
+        self.umbral = umbral
+        self.espera = espera
+        self.estado = self.CERRADO
+        self.fallas = 0
+        self.aperturas = 0
+        self._abierto_desde = 0.0
+        self._prueba_en_curso = False
+        self._lock = threading.Lock()
+
+    def permitir(self) -> bool:
+        with self._lock:
+            if self.estado == self.CERRADO:
+                return True
+            if self.estado == self.ABIERTO and time.monotonic() - self._abierto_desde >= self.espera:
+                self.estado = self.SEMIABIERTO
+            if self.estado == self.SEMIABIERTO and not self._prueba_en_curso:
+                self._prueba_en_curso = True
+                return True
+            return False
+
+    def exito(self):
+        with self._lock:
+            self.estado = self.CERRADO
+            self.fallas = 0
+            self._prueba_en_curso = False
+
+    def falla(self):
+        with self._lock:
+            self.fallas += 1
+            self._prueba_en_curso = False
+            if self.estado == self.SEMIABIERTO or self.fallas >= self.umbral:
+                if self.estado != self.ABIERTO:
+                    self.aperturas += 1
+                self.estado = self.ABIERTO
+                self._abierto_desde = time.monotonic()
+
+    def cancelar(self):
+        """La llamada permitida no llegó a completarse: no cuenta ni como éxito ni como falla."""
+        with self._lock:
+            self._prueba_en_curso = False
+
+    def reintentar_en(self) -> float:
+        """Segundos hasta la próxima llamada de prueba (0 si no está abierto)."""
+        with self._lock:
+            if self.estado != self.ABIERTO:
+                return 0.0
+            return max(0.0, round(self.espera - (time.monotonic() - self._abierto_desde), 1))
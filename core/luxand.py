@@ -1,6 +1,11 @@
 # core/luxand.py
+import threading
 import requests
 from django.conf import settings
+from django.core.cache import cache
+from core import http_cliente
+from core.imagenes import foto_para_luxand
+from core.limitador import TokenBucket, CircuitBreaker
 
 BASE = "https://api.luxand.cloud"
 TOKEN = settings.LUXAND_TOKEN
@@ -8,56 +13,157 @@ COLLECTION = getattr(settings, "LUXAND_COLLECTION", "")  # opcional
 
 HEADERS = {"token": TOKEN}
 
-def _filefield_for(path_or_url, field_name: str):
+
+class LuxandError(ValueError):
+    """Respuesta de error de Luxand; `status_code` permite decidir si reintentar."""
+
+    def __init__(self, mensaje: str, status_code: int = None):
+        super().__init__(mensaje)
+        self.status_code = status_code
+
+
+class LuxandNoDisponible(LuxandError):
+    """Rechazada localmente: circuito abierto o sin cupo de llamadas. No llegó a Luxand."""
+
+    def __init__(self, mensaje: str, status_code: int = 503, reintentar_en: float = 0):
+        super().__init__(mensaje, status_code)
+        self.reintentar_en = reintentar_en
+
+
+# Protección compartida por todos los hilos del proceso: token bucket con la
+# tasa del plan y circuit breaker que falla rápido si Luxand está caído.
+RECHAZOS_CIRCUITO_KEY = "luxand:rechazos:circuito"
+RECHAZOS_CUPO_KEY = "luxand:rechazos:cupo"
+_proteccion_lock = threading.Lock()
+_limitador = None
+_breaker = None
+
+
+def _proteccion():
+    global _limitador, _breaker
+    if _breaker is None:
+        with _proteccion_lock:
+            if _breaker is None:
+                _limitador = TokenBucket(settings.LUXAND_TASA, settings.LUXAND_RAFAGA)
+                _breaker = CircuitBreaker(settings.LUXAND_BREAKER_FALLAS, settings.LUXAND_BREAKER_ESPERA)
+    return _limitador, _breaker
+
+
+def _contar(clave: str):
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.add(clave, 0, timeout=None)
+        cache.incr(clave)
+
+
+def _post(url: str, espera_cupo: float = None, **kwargs):
+    """
+    POST a Luxand pasando por el limitador y el circuit breaker. 5xx, 429 y
+    errores de red cuentan como falla; cualquier otra respuesta, como éxito.
+    """
+    limitador, breaker = _proteccion()
+    espera_cupo = settings.LUXAND_ESPERA_CUPO if espera_cupo is None else espera_cupo
+    # Primero el circuito: con Luxand caído no se gastan ni se esperan tokens
+    if not breaker.permitir():
+        _contar(RECHAZOS_CIRCUITO_KEY)
+        espera = breaker.reintentar_en()
+        raise LuxandNoDisponible(f"Luxand no disponible (circuito abierto), reintentar en {espera}s", 503, espera)
+    if not limitador.tomar(espera_max=espera_cupo):
+        breaker.cancelar()  # libera la llamada de prueba si el circuito estaba semiabierto
+        _contar(RECHAZOS_CUPO_KEY)
+        raise LuxandNoDisponible("Límite de llamadas a Luxand alcanzado, intente en un momento", 429, 1)
+    try:
+        r = http_cliente.post(url, **kwargs)
+    except requests.RequestException:
+        breaker.falla()
+        raise
+    except Exception:
+        breaker.cancelar()  # no fue culpa de Luxand: solo libera la llamada de prueba
+        raise
+    if r.status_code >= 500 or r.status_code == 429:
+        breaker.falla()
+    else:
+        breaker.exito()
+    return r
+
+
+def estado_luxand() -> dict:
+    """Estado del circuit breaker y del limitador (de este proceso) y rechazos acumulados."""
+    limitador, breaker = _proteccion()
+    return {
+        "circuito": breaker.estado,
+        "fallas_consecutivas": breaker.fallas,
+        "aperturas": breaker.aperturas,
+        "reintentar_en": breaker.reintentar_en(),
+        "cupo_disponible": limitador.disponibles(),
+        "tasa": limitador.tasa,
+        "rechazos_circuito": cache.get(RECHAZOS_CIRCUITO_KEY, 0),
+        "rechazos_cupo": cache.get(RECHAZOS_CUPO_KEY, 0),
+    }
+
+
+def _filefield_for(path_or_url, field_name: str, recorte=None):
+    """
+    Campo del multipart para Luxand. Archivos subidos y rutas locales pasan por
+    foto_para_luxand (orientada, recortada al rostro si hay `recorte`, reducida
+    y en JPEG): se envían decenas de KB en vez de la foto original.
+    """
     # Luxand acepta pasar una URL directamente como valor del campo 'photo'/'photos'
+    # (las de ImgBB ya se subieron procesadas por core.imagenes)
     if isinstance(path_or_url, str):
         if path_or_url.startswith("http://") or path_or_url.startswith("https://"):
             return {field_name: path_or_url}
         # o un archivo local
-        return {field_name: open(path_or_url, "rb")}
-    else:
-        # Es un objeto de archivo de Django (InMemoryUploadedFile, TemporaryUploadedFile, etc.)
+        with open(path_or_url, "rb") as f:
+            return {field_name: foto_para_luxand(f, recorte)}
+    if isinstance(path_or_url, tuple):
+        # Ya preparada: (nombre, bytes, content_type)
         return {field_name: path_or_url}
+    # Es un objeto de archivo de Django (InMemoryUploadedFile, TemporaryUploadedFile, etc.)
+    return {field_name: foto_para_luxand(path_or_url, recorte)}
 
 def create_collection(name: str):
     # opcional: crear colección
     url = f"{BASE}/collection"
-    return requests.post(url, headers=HEADERS, files={"name": (None, name)}, timeout=20).json()
+    return _post(url, headers=HEADERS, files={"name": (None, name)}, timeout=20).json()
 
-def add_person(name: str, image_path_or_url: str, collections: str = ""):
+def add_person(name: str, image_path_or_url: str, collections: str = "", espera_cupo: float = None,
+               recorte=None):
     """
     Enrola una persona en Luxand (devuelve UUID).
     """
     url = f"{BASE}/v2/person"
-    files = _filefield_for(image_path_or_url, "photos")
+    files = _filefield_for(image_path_or_url, "photos", recorte)
     data = {"name": name, "store": "1"}
     if collections:
         data["collections"] = collections
-    r = requests.post(url, headers=HEADERS, files=files, data=data, timeout=30)
+    r = _post(url, espera_cupo, headers=HEADERS, files=files, data=data, timeout=30)
     if r.status_code != 200:
-        raise ValueError(f"Luxand add_person error: {r.text}")
+        raise LuxandError(f"Luxand add_person error: {r.text}", r.status_code)
     return r.json()  # incluye 'uuid'
 
-def add_face(person_uuid: str, image_path_or_url: str):
+def add_face(person_uuid: str, image_path_or_url: str, recorte=None):
     """
     Agrega fotos adicionales a una persona (mejora la precisión).
     Según la documentación oficial, usa 'photo' (singular) no 'photos'.
     """
     url = f"{BASE}/v2/person/{person_uuid}"
-    files = _filefield_for(image_path_or_url, "photo")  # 'photo' según documentación
+    files = _filefield_for(image_path_or_url, "photo", recorte)  # 'photo' según documentación
     data = {"store": "1"}
-    r = requests.post(url, headers=HEADERS, files=files, data=data, timeout=30)
+    # Llamada desde el request: sin reintentos con espera, falla rápido
+    r = _post(url, headers=HEADERS, files=files, data=data, timeout=30, reintentos=0)
     if r.status_code != 200:
-        raise ValueError(f"Luxand add_face error: {r.text}")
+        raise LuxandError(f"Luxand add_face error: {r.text}", r.status_code)
     return r.json()
 
-def recognize(image_path_or_url: str, gallery: str = ""):
+def recognize(image_path_or_url: str, gallery: str = "", recorte=None):
     """
     Reconoce personas en una imagen usando el endpoint correcto de Luxand.
     Usa /photo/search/v2 según la documentación oficial.
     """
     url = f"{BASE}/photo/search/v2"
-    files = _filefield_for(image_path_or_url, "photo")
+    files = _filefield_for(image_path_or_url, "photo", recorte)
     data = {}
     if gallery:
         data["gallery"] = gallery
@@ -65,20 +171,21 @@ def recognize(image_path_or_url: str, gallery: str = ""):
     print(f"🔍 LUXAND RECOGNIZE DEBUG:")
     print(f"   URL: {url}")
     print(f"   Gallery: {gallery}")
-    print(f"   Headers: {HEADERS}")
     print(f"   Data: {data}")
     
     try:
-        r = requests.post(url, headers=HEADERS, files=files, data=data, timeout=30)
+        # En el hilo del request: sin sleeps de reintento; si Luxand está caído
+        # el circuit breaker corta antes de llegar a la red
+        r = _post(url, headers=HEADERS, files=files, data=data, timeout=30, reintentos=0)
         print(f"   Status Code: {r.status_code}")
         print(f"   Response: {r.text[:500]}...")
         
         if r.status_code == 503:
-            raise ValueError(f"Luxand service unavailable (503). This may be due to rate limiting or service issues. Response: {r.text}")
+            raise LuxandError(f"Luxand service unavailable (503). This may be due to rate limiting or service issues. Response: {r.text}", 503)
         elif r.status_code == 429:
-            raise ValueError(f"Luxand rate limit exceeded (429). Please wait before trying again. Response: {r.text}")
+            raise LuxandError(f"Luxand rate limit exceeded (429). Please wait before trying again. Response: {r.text}", 429)
         elif r.status_code != 200:
-            raise ValueError(f"Luxand recognize error ({r.status_code}): {r.text}")
+            raise LuxandError(f"Luxand recognize error ({r.status_code}): {r.text}", r.status_code)
         
         return r.json()
     except requests.exceptions.Timeout:
@@ -0,0 +1,271 @@
+# core/reconocedores.py
+"""
+Motores de reconocimiento facial intercambiables (settings.RECONOCIMIENTO_BACKEND):
+
+- "luxand": la API en la nube (core.luxand), con el cache perceptual.
+- "local": vectores de características calculados en el servidor por un
+  extractor enchufable (settings.RECONOCIMIENTO_EXTRACTOR) y búsqueda por
+  similitud coseno contra una matriz NumPy contigua en memoria: sin WAN ni
+  costo por llamada.
+
+Todos responden con el formato de Luxand (lista de candidatos con uuid, name
+y probability; {"uuid": ...} al enrolar), así las vistas y el worker de
+enrolamiento no dependen del motor. El UUID se guarda en luxand_uuid.
+"""
+import threading
+import uuid as uuidlib
+from io import BytesIO
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from PIL import Image
+
+from administracion.models import EmbeddingRostro
+from core import http_cliente, luxand
+from core.imagenes import abrir_imagen
+from core.reconocimiento_cache import recognize_cacheado
+
+BACKENDS = {
+    "luxand": "core.reconocedores.LuxandReconocedor",
+    "local": "core.reconocedores.LocalReconocedor",
+}
+VERSION_KEY = "rostros:indice:version"
+TOP_K = 5
+SIN_ROSTRO = {"status": "failure", "message": "Can't find faces on the image"}
+
+
+class ReconocedorFacial:
+    """Interfaz común de los motores de reconocimiento."""
+    nombre = ""
+
+    def reconocer(self, fuente, gallery: str = "", recorte=None) -> list:
+        """Candidatos ordenados por similitud: [{"uuid", "name", "probability"}, ...]."""
+        raise NotImplementedError
+
+    def enrolar(self, nombre: str, fuente, coleccion: str = "", recorte=None, espera_cupo: float = None) -> dict:
+        """
+        Registra a una persona y devuelve {"uuid": ...} (o {"status": "failure",
+        "message": ...} si no hay rostro). `espera_cupo`: segundos máximos
+        esperando cupo del proveedor; los motores sin cuota lo ignoran.
+        """
+        raise NotImplementedError
+
+    def agregar_rostro(self, uuid: str, fuente, recorte=None) -> dict:
+        """Suma otra foto de una persona ya enrolada."""
+        raise NotImplementedError
+
+
+class LuxandReconocedor(ReconocedorFacial):
+    nombre = "luxand"
+
+    def reconocer(self, fuente, gallery="", recorte=None):
+        # El mismo rostro reenviado en pocos segundos sale del cache perceptual
+        return recognize_cacheado(fuente, gallery=gallery, recorte=recorte)
+
+    def enrolar(self, nombre, fuente, coleccion="", recorte=None, espera_cupo=None):
+        return luxand.add_person(nombre, fuente, coleccion, espera_cupo=espera_cupo, recorte=recorte)
+
+    def agregar_rostro(self, uuid, fuente, recorte=None):
+        return luxand.add_face(uuid, fuente, recorte=recorte)
+
+
+class ExtractorEmbeddings:
+    """
+    Convierte una foto (PIL RGB, ya orientada y recortada) en un vector.
+    Devuelve None si no encuentra un rostro.
+    """
+    nombre = ""
+    dimension = 0
+    max_lado = 800  # resolución a la que se decodifica la foto antes de extraer
+
+    def extraer(self, img):
+        raise NotImplementedError
+
+
+class ExtractorDeterminista(ExtractorEmbeddings):
+    """
+    Extractor de prueba: la foto en escala de grises a 16x16, centrada. Es
+    determinista (la misma foto da el mismo vector) pero no distingue
+    personas: solo se configura en los tests, nunca por defecto.
+    """
+    nombre = "determinista-16"
+    dimension = 256
+    max_lado = 64
+
+    def extraer(self, img):
+        v = np.asarray(img.convert("L").resize((16, 16), Image.BILINEAR), dtype=np.float32).ravel()
+        return v - v.mean()
+
+
+def _normalizar(matriz):
+    normas = np.linalg.norm(matriz, axis=-1, keepdims=True)
+    return matriz / np.maximum(normas, 1e-12)
+
+
+class IndiceEmbeddings:
+    """
+    Vectores normalizados en una matriz (n, d) float32 contigua, ordenada por
+    colección: cada galería es una vista contigua de la matriz (sin copias)
+    y una búsqueda es un único producto matriz-vector.
+    """
+
+    def __init__(self, uuids: list, nombres: list, colecciones: list, matriz):
+        self.uuids = uuids
+        self.nombres = nombres
+        self.matriz = np.ascontiguousarray(_normalizar(matriz), dtype=np.float32)
+        self.rangos = {}
+        for i, coleccion in enumerate(colecciones):
+            inicio, _ = self.rangos.get(coleccion, (i, i))
+            self.rangos[coleccion] = (inicio, i + 1)
+
+    @classmethod
+    def desde_bd(cls, extractor: ExtractorEmbeddings):
+        filas = (EmbeddingRostro.objects.filter(extractor=extractor.nombre)
+                 .order_by("coleccion", "id").values_list("uuid", "nombre", "coleccion", "vector"))
+        uuids, nombres, colecciones = [], [], []
+        matriz = np.empty((len(filas), extractor.dimension), dtype=np.float32)
+        for i, (uuid, nombre, coleccion, vector) in enumerate(filas):
+            uuids.append(uuid)
+            nombres.append(nombre)
+            colecciones.append(coleccion)
+            matriz[i] = np.frombuffer(vector, dtype=np.float32)
+        return cls(uuids, nombres, colecciones, matriz)
+
+    def __len__(self):
+        return len(self.uuids)
+
+    def buscar(self, vector, k: int = TOP_K, gallery: str = "") -> list:
+        """Top-k personas por similitud coseno (la mejor foto de cada una)."""
+        inicio, fin = self.rangos.get(gallery, (0, 0)) if gallery else (0, len(self))
+        if fin <= inicio:
+            return []
+        consulta = _normalizar(np.asarray(vector, dtype=np.float32))
+        similitudes = self.matriz[inicio:fin] @ consulta
+        # Varias fotos por persona: se toman de más filas y se deduplica por uuid
+        m = min(len(similitudes), k * 4)
+        mejores = np.argpartition(similitudes, -m)[-m:] if m < len(similitudes) else np.arange(m)
+        mejores = mejores[np.argsort(similitudes[mejores])[::-1]]
+        candidatos, vistos = [], set()
+        for i in mejores:
+            uuid = self.uuids[inicio + i]
+            if uuid in vistos:
+                continue
+            vistos.add(uuid)
+            candidatos.append({
+                "uuid": uuid,
+                "name": self.nombres[inicio + i],
+                "probability": round(max(0.0, float(similitudes[i])), 4),
+            })
+            if len(candidatos) == k:
+                break
+        return candidatos
+
+
+def _archivo(fuente):
+    """URL, ruta local, (nombre, bytes, content_type) o archivo subido -> archivo legible."""
+    if isinstance(fuente, tuple):
+        return BytesIO(fuente[1])
+    if isinstance(fuente, str):
+        if fuente.startswith("http://") or fuente.startswith("https://"):
+            r = http_cliente.get(fuente, timeout=20)
+            r.raise_for_status()
+            return BytesIO(r.content)
+        with open(fuente, "rb") as f:
+            return BytesIO(f.read())
+    return fuente
+
+
+def invalidar_indice_rostros():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        cache.incr(VERSION_KEY)
+
+
+class LocalReconocedor(ReconocedorFacial):
+    """
+    Reconocimiento en el servidor. El índice se carga de la BD una vez por
+    proceso y se recarga cuando cambia la versión en el cache (cada enrolamiento
+    la incrementa), igual que core.identidades.
+    """
+    nombre = "local"
+
+    def __init__(self, extractor: ExtractorEmbeddings = None):
+        if extractor is None:
+            ruta = getattr(settings, "RECONOCIMIENTO_EXTRACTOR", "")
+            if not ruta:
+                # Sin un modelo de rostros real cualquiera "coincidiría" con alguien
+                raise ImproperlyConfigured(
+                    "RECONOCIMIENTO_BACKEND='local' requiere RECONOCIMIENTO_EXTRACTOR "
+                    "(ruta a un ExtractorEmbeddings de rostros)"
+                )
+            extractor = import_string(ruta)()
+        self.extractor = extractor
+        self._lock = threading.Lock()
+        self._indice = None
+        self._version = None
+
+    def indice(self) -> IndiceEmbeddings:
+        version = cache.get(VERSION_KEY, 0)
+        indice = self._indice
+        if indice is None or self._version != version:
+            with self._lock:
+                if self._indice is None or self._version != version:
+                    self._indice, self._version = IndiceEmbeddings.desde_bd(self.extractor), version
+                indice = self._indice
+        return indice
+
+    def _vector(self, fuente, recorte=None):
+        img = abrir_imagen(_archivo(fuente), self.extractor.max_lado, recorte, sin_alfa=True)
+        vector = self.extractor.extraer(img)
+        if vector is None:
+            return None
+        return _normalizar(np.asarray(vector, dtype=np.float32))
+
+    def _guardar(self, uuid, nombre, coleccion, vector):
+        EmbeddingRostro.objects.create(uuid=uuid, nombre=nombre, coleccion=coleccion or "",
+                                       extractor=self.extractor.nombre, vector=vector.tobytes())
+        invalidar_indice_rostros()
+
+    def reconocer(self, fuente, gallery="", recorte=None):
+        vector = self._vector(fuente, recorte)
+        if vector is None:
+            return []
+        return self.indice().buscar(vector, TOP_K, gallery)
+
+    def enrolar(self, nombre, fuente, coleccion="", recorte=None, espera_cupo=None):
+        vector = self._vector(fuente, recorte)
+        if vector is None:
+            return dict(SIN_ROSTRO)
+        uuid = str(uuidlib.uuid4())
+        self._guardar(uuid, nombre, coleccion, vector)
+        return {"uuid": uuid, "name": nombre}
+
+    def agregar_rostro(self, uuid, fuente, recorte=None):
+        existente = (EmbeddingRostro.objects.filter(uuid=uuid, extractor=self.extractor.nombre)
+                     .values("nombre", "coleccion").first())
+        if existente is None:
+            raise ValueError(f"{uuid} no está enrolado en el motor local")
+        vector = self._vector(fuente, recorte)
+        if vector is None:
+            return dict(SIN_ROSTRO)
+        self._guardar(uuid, existente["nombre"], existente["coleccion"], vector)
+        return {"uuid": uuid, "status": "success"}
+
+
+_reconocedor_lock = threading.Lock()
+_reconocedor = None
+
+
+def reconocedor() -> ReconocedorFacial:
+    """Motor configurado en settings.RECONOCIMIENTO_BACKEND (uno por proceso)."""
+    global _reconocedor
+    if _reconocedor is None:
+        with _reconocedor_lock:
+            if _reconocedor is None:
+                ruta = settings.RECONOCIMIENTO_BACKEND
+                _reconocedor = import_string(BACKENDS.get(ruta, ruta))()
+    return _reconocedor
@@ -0,0 +1,143 @@
+# core/reconocimiento_cache.py
+"""
+Cache de muy corta duración para los resultados de reconocimiento de Luxand.
+Las tablets de la garita reenvían el mismo rostro varias veces en pocos
+segundos: si el hash perceptual (dHash) de la región del rostro está a una
+distancia de Hamming de a lo sumo LUXAND_CACHE_DISTANCIA bits de uno reciente
+de la misma galería, se reutiliza la respuesta de Luxand sin volver a llamarla.
+
+Un hash del cuadro completo no identifica a nadie (con la cámara fija, dos
+personas distintas frente al mismo fondo se parecen), por eso solo se usa
+el cache cuando el cliente envía el recuadro del rostro.
+
+Cada huella se guarda en su propia clave, más una clave por banda de bits
+que apunta a ella: si dos huellas difieren en a lo sumo `d` bits, alguna de
+las d+1 bandas coincide exacta, así que buscar solo compara las huellas que
+comparten una banda (sin leer-modificar-escribir una lista compartida).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image
+
+from core.imagenes import abrir_imagen
+from core.luxand import recognize
+
+CACHE_KEY = "luxand:reconocimiento:{gallery}:{huella:064x}"
+BANDA_KEY = "luxand:reconocimiento:{gallery}:b{banda}:{valor:x}"
+HITS_KEY = "luxand:reconocimiento:hits"
+MISSES_KEY = "luxand:reconocimiento:misses"
+LADO_HASH = 16  # dHash de 16x16 = 256 bits
+BITS_HASH = LADO_HASH * LADO_HASH
+# Diferencias de brillo menores entre celdas vecinas son ruido del sensor o del
+# JPEG: cuentan como "no más claro" y no hacen variar la huella
+UMBRAL_HASH = 2
+
+
+def dhash(archivo, recorte=None) -> int:
+    """
+    Hash perceptual por diferencia de brillo entre píxeles vecinos sobre la
+    imagen reducida a escala de grises. Con `recorte` se calcula sobre la
+    misma región del rostro que se envía a Luxand (abrir_imagen), así dos
+    rostros distintos del mismo cuadro no comparten huella. Deja el archivo
+    rebobinado.
+    """
+    try:
+        img = abrir_imagen(archivo, LADO_HASH * 4, recorte, sin_alfa=True)
+        img = img.convert("L").resize((LADO_HASH + 1, LADO_HASH), Image.BILINEAR)
+        pixeles = list(img.getdata())
+    finally:
+        archivo.seek(0)
+    valor = 0
+    for fila in range(LADO_HASH):
+        base = fila * (LADO_HASH + 1)
+        for col in range(LADO_HASH):
+            valor = (valor << 1) | (pixeles[base + col] > pixeles[base + col + 1] + UMBRAL_HASH)
+    return valor
+
+
+def huella_o_none(archivo, recorte=None):
+    """dHash del archivo, o None si Pillow no puede leerlo (que Luxand devuelva el error)."""
+    try:
+        return dhash(archivo, recorte)
+    except Exception:
+        return None
+
+
+def _bandas(huella: int, distancia: int) -> list:
+    """Claves de las distancia+1 bandas de bits de la huella."""
+    cortes = [BITS_HASH * i // (distancia + 1) for i in range(distancia + 2)]
+    return [
+        (i, (huella >> inicio) & ((1 << (fin - inicio)) - 1))
+        for i, (inicio, fin) in enumerate(zip(cortes, cortes[1:]))
+    ]
+
+
+def _contar(clave: str):
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.add(clave, 0, timeout=None)
+        cache.incr(clave)
+
+
+def buscar(huella: int, gallery: str = ""):
+    """Resultado reciente del mismo rostro (dentro de la tolerancia) en la galería, o None."""
+    if huella is None or not settings.LUXAND_CACHE_TTL:
+        return None
+    resultado = cache.get(CACHE_KEY.format(gallery=gallery, huella=huella))
+    distancia = settings.LUXAND_CACHE_DISTANCIA
+    if resultado is None and distancia:
+        candidatas = set(cache.get_many([
+            BANDA_KEY.format(gallery=gallery, banda=i, valor=valor) for i, valor in _bandas(huella, distancia)
+        ]).values())
+        cercanas = sorted((h for h in candidatas if (h ^ huella).bit_count() <= distancia),
+                          key=lambda h: (h ^ huella).bit_count())
+        if cercanas:
+            claves = [CACHE_KEY.format(gallery=gallery, huella=h) for h in cercanas]
+            encontrados = cache.get_many(claves)
+            # La más parecida que no haya expirado
+            resultado = next((encontrados[c] for c in claves if c in encontrados), None)
+    _contar(HITS_KEY if resultado is not None else MISSES_KEY)
+    return resultado
+
+
+def guardar(huella: int, gallery: str, resultado):
+    ttl = settings.LUXAND_CACHE_TTL
+    if huella is None or not ttl or (isinstance(resultado, dict) and "error" in resultado):
+        return
+    claves = {CACHE_KEY.format(gallery=gallery, huella=huella): resultado}
+    distancia = settings.LUXAND_CACHE_DISTANCIA
+    if distancia:
+        claves.update({
+            BANDA_KEY.format(gallery=gallery, banda=i, valor=valor): huella
+            for i, valor in _bandas(huella, distancia)
+        })
+    cache.set_many(claves, timeout=ttl)
+
+
+def recognize_cacheado(fuente, gallery: str = "", recorte=None):
+    """
+    Igual que core.luxand.recognize, pero para archivos subidos con el
+    recuadro del rostro consulta primero el cache perceptual. Las URLs y los
+    cuadros sin recorte van directo a Luxand.
+    """
+    if isinstance(fuente, str) or not recorte:
+        return recognize(fuente, gallery=gallery, recorte=recorte)
+    # La huella es la de la región que realmente se envía (rostro recortado)
+    huella = huella_o_none(fuente, recorte)
+    resultado = buscar(huella, gallery)
+    if resultado is None:
+        resultado = recognize(fuente, gallery=gallery, recorte=recorte)
+        guardar(huella, gallery, resultado)
+    return resultado
+
+
+def estadisticas_cache_reconocimiento() -> dict:
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total * 100, 2) if total else 0,
+    }
@@ -0,0 +1,153 @@
+# core/subidas.py
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+
+from administracion.models import SubidaImagen, HuellaImagen
+from core.imagenes import subir_imgbb, huella, registrar_huella
+from core.enrolamiento import encolar_enrolamiento
+
+MAX_INTENTOS = 6
+SUBIDAS_SIMULTANEAS = 4
+# Si el worker muere a mitad de la subida, otro la retoma pasado este tiempo
+TIMEOUT_PROCESO = timedelta(minutes=5)
+
+
+def descartar_subidas_pendientes(obj, campo: str):
+    """
+    Marca como descartadas ('D') las subidas pendientes (o en curso) del objeto
+    y campo, para que al terminar no pisen una foto más nueva.
+    """
+    content_type = ContentType.objects.get_for_model(obj, for_concrete_model=False)
+    SubidaImagen.objects.filter(
+        content_type=content_type, object_id=obj.pk, campo=campo, estado__in=['P', 'R']
+    ).update(estado='D')
+    return content_type
+
+
+def encolar_subida(obj, campo: str, contenido: bytes, extension: str, mime: str, luxand_coleccion=None):
+    """
+    Agrega la imagen ya procesada a la cola. Una subida pendiente anterior del
+    mismo objeto y campo se descarta para que no pise a la nueva.
+    """
+    content_type = descartar_subidas_pendientes(obj, campo)
+    return SubidaImagen.objects.create(
+        content_type=content_type,
+        object_id=obj.pk,
+        campo=campo,
+        contenido=contenido,
+        extension=extension,
+        mime=mime,
+        luxand_coleccion=luxand_coleccion,
+    )
+
+
+def _subir(subida, url_existente=None):
+    if url_existente:
+        return subida.id, url_existente, None
+    try:
+        return subida.id, subir_imgbb(bytes(subida.contenido), f"imagen.{subida.extension}", subida.mime), None
+    except Exception as e:
+        return subida.id, None, e
+
+
+def _reintentar(subida, error, ahora):
+    subida.intentos += 1
+    subida.error = str(error)[:1000]
+    if subida.intentos >= MAX_INTENTOS:
+        subida.estado = 'F'
+    else:
+        # Backoff exponencial: 30s, 1m, 2m, 4m...
+        subida.estado = 'P'
+        subida.proximo_intento = ahora + timedelta(seconds=30 * 2 ** (subida.intentos - 1))
+
+
+def _tomar(lote: int, ahora) -> list:
+    """
+    Reclama hasta `lote` subidas pendientes (o 'R' abandonadas) pasándolas a 'R'
+    en una transacción corta: la subida a ImgBB ocurre fuera, sin locks.
+    """
+    with transaction.atomic():
+        subidas = list(
+            SubidaImagen.objects
+            .select_for_update(skip_locked=True)
+            .filter(estado__in=['P', 'R'], proximo_intento__lte=ahora)
+            .select_related('content_type')
+            .order_by('id')[:lote]
+        )
+        SubidaImagen.objects.filter(pk__in=[s.pk for s in subidas]).update(
+            estado='R', proximo_intento=ahora + TIMEOUT_PROCESO
+        )
+    return subidas
+
+
+def procesar_subidas(lote: int = 50) -> dict:
+    """
+    Toma un lote de subidas pendientes, las sube a ImgBB en paralelo y completa
+    la URL en cada objeto. Las fallidas se reintentan con backoff.
+    """
+    ahora = timezone.now()
+    stats = {'subidas': 0, 'reutilizadas': 0, 'reintentos': 0, 'fallidas': 0}
+    enrolar_despues = []
+
+    pendientes = _tomar(lote, ahora)
+    if not pendientes:
+        return stats
+
+    # Contenido ya subido (por otra subida o por el CRUD): se reutiliza la URL
+    huellas = {sub.id: huella(bytes(sub.contenido)) for sub in pendientes}
+    conocidas = dict(
+        HuellaImagen.objects.filter(sha256__in=set(huellas.values())).values_list('sha256', 'url')
+    )
+    with ThreadPoolExecutor(max_workers=SUBIDAS_SIMULTANEAS) as pool:
+        resultados = {
+            sid: (url, error) for sid, url, error in pool.map(
+                _subir, pendientes, [conocidas.get(huellas[sub.id]) for sub in pendientes]
+            )
+        }
+
+    for subida in pendientes:
+        url, error = resultados[subida.id]
+        if error is None and huellas[subida.id] not in conocidas:
+            registrar_huella(huellas[subida.id], url, bytes(subida.contenido), subida.mime)
+
+    with transaction.atomic():
+        # Solo se escriben las que siguen tomadas: una foto más nueva del mismo
+        # objeto pudo descartarlas ('D') mientras se subían
+        vigentes = set(
+            SubidaImagen.objects.select_for_update()
+            .filter(pk__in=[s.pk for s in pendientes], estado='R')
+            .values_list('pk', flat=True)
+        )
+        pendientes = [s for s in pendientes if s.pk in vigentes]
+        for subida in pendientes:
+            url, error = resultados[subida.id]
+            if error is not None:
+                _reintentar(subida, error, ahora)
+                stats['fallidas' if subida.estado == 'F' else 'reintentos'] += 1
+                continue
+            if huellas[subida.id] in conocidas:
+                stats['reutilizadas'] += 1
+            modelo = subida.content_type.model_class()
+            modelo.objects.filter(pk=subida.object_id).update(**{subida.campo: url})
+            subida.url = url
+            subida.estado = 'S'
+            subida.fecha_subida = timezone.now()
+            subida.contenido = b""  # ya no hace falta guardar la imagen
+            subida.error = ""
+            stats['subidas'] += 1
+            if subida.luxand_coleccion is not None:
+                enrolar_despues.append(subida)
+
+        SubidaImagen.objects.bulk_update(
+            pendientes,
+            ['url', 'estado', 'intentos', 'proximo_intento', 'error', 'fecha_subida', 'contenido'],
+            batch_size=100,
+        )
+
+    # Con la foto ya subida, el enrolamiento en Luxand sigue por su propia cola
+    for subida in enrolar_despues:
+        encolar_enrolamiento(subida.content_type.get_object_for_this_type(pk=subida.object_id))
+    return stats
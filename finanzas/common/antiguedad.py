@@ -0,0 +1,102 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.db.models import Sum, Count, Q, Case, When, Value, DecimalField, OuterRef, Subquery
+from django.utils import timezone
+
+from administracion.models import Persona
+from ..models import expensa, contrato
+
+# (clave, días mínimos vencida, días máximos vencida)
+TRAMOS = [
+    ('d1_30', 1, 30),
+    ('d31_60', 31, 60),
+    ('d61_90', 61, 90),
+    ('d90_mas', 91, None),
+]
+
+AGRUPACIONES = {
+    'bloque': ('unidad__bloque_id', 'unidad__bloque__nombre'),
+    'propietario': ('propietario_id',),
+}
+
+
+def _suma_si(condicion):
+    return Sum(
+        Case(
+            When(condicion, then='monto'),
+            default=Value(Decimal('0')),
+            output_field=DecimalField(max_digits=14, decimal_places=2),
+        )
+    )
+
+
+def columnas_antiguedad(hoy):
+    """
+    Columnas de la antigüedad de saldos como Sum(Case/When) sobre fecha_vencimiento.
+    """
+    columnas = {
+        'corriente': _suma_si(Q(fecha_vencimiento__gte=hoy) | Q(fecha_vencimiento__isnull=True)),
+    }
+    for clave, desde, hasta in TRAMOS:
+        condicion = Q(fecha_vencimiento__lte=hoy - timedelta(days=desde))
+        if hasta is not None:
+            condicion &= Q(fecha_vencimiento__gte=hoy - timedelta(days=hasta))
+        columnas[clave] = _suma_si(condicion)
+    columnas['total'] = Sum('monto')
+    columnas['cantidad'] = Count('id')
+    return columnas
+
+
+def propietario_vigente():
+    """
+    Propietario de un solo contrato activo por unidad (el más antiguo), para
+    que una unidad con varios contratos activos no sume sus expensas dos veces.
+    """
+    return Subquery(
+        contrato.objects.filter(unidad_id=OuterRef('unidad_id'), estado='A')
+        .order_by('id').values('propietario_id')[:1]
+    )
+
+
+def antiguedad_saldos(agrupar: str = 'bloque', hoy=None) -> list:
+    """
+    Antigüedad de las expensas impagas por bloque o por propietario
+    (contrato activo), calculada en una sola consulta agrupada (más una para
+    los nombres de los propietarios).
+    """
+    if agrupar not in AGRUPACIONES:
+        raise ValueError(f"agrupar debe ser uno de: {', '.join(AGRUPACIONES)}")
+    hoy = hoy or timezone.now().date()
+    campos = AGRUPACIONES[agrupar]
+
+    qs = expensa.objects.filter(pagada=False)
+    if agrupar == 'propietario':
+        qs = qs.annotate(propietario_id=propietario_vigente()).filter(propietario_id__isnull=False)
+
+    filas = list(
+        qs.values(*campos)
+        .annotate(**columnas_antiguedad(hoy))
+        .order_by('-total')
+    )
+    nombres = {}
+    if agrupar == 'propietario':
+        nombres = {
+            p['id']: f"{p['nombre']} {p['apellido']}"
+            for p in Persona.objects.filter(id__in=[f['propietario_id'] for f in filas])
+            .values('id', 'nombre', 'apellido')
+        }
+
+    resultado = []
+    for f in filas:
+        if agrupar == 'bloque':
+            grupo = {'bloque_id': f['unidad__bloque_id'], 'nombre': f['unidad__bloque__nombre']}
+        else:
+            grupo = {'propietario_id': f['propietario_id'], 'nombre': nombres.get(f['propietario_id'], '')}
+        grupo.update({
+            'corriente': float(f['corriente'] or 0),
+            **{clave: float(f[clave] or 0) for clave, _, _ in TRAMOS},
+            'total': float(f['total'] or 0),
+            'cantidad': f['cantidad'],
+        })
+        resultado.append(grupo)
+    return resultado
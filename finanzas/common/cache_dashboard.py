@@ -0,0 +1,79 @@
+import hashlib
+import json
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+VERSION_KEY = "finanzas:version"
+
+
+def version_datos() -> int:
+    """
+    Versión actual de los datos financieros. Cambia en cada escritura de
+    expensa/multa/contrato, así que las claves viejas dejan de usarse solas.
+    """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def incrementar_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # La clave no existe (cache vacío o reiniciado)
+        cache.add(VERSION_KEY, 1, timeout=None)
+        cache.incr(VERSION_KEY)
+
+
+def clave_cache(nombre: str, params=None, version=None) -> str:
+    version = version_datos() if version is None else version
+    sufijo = "&".join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+    return f"finanzas:v{version}:{nombre}:{sufijo}"
+
+
+def etag_dashboard(data) -> str:
+    """
+    ETag fuerte calculado sobre el contenido serializado: no depende de la
+    versión del cache, que con LocMemCache es distinta en cada proceso.
+    """
+    contenido = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
+    return '"' + hashlib.sha1(contenido.encode()).hexdigest() + '"'
+
+
+def etag_coincide(etag: str, if_none_match: str) -> bool:
+    """
+    If-None-Match es una lista separada por comas (o `*`); se compara en forma
+    débil, ignorando el prefijo W/ (RFC 9110, 13.1.2).
+    """
+    etags = parse_etags(if_none_match or '')
+    if '*' in etags:
+        return True
+    return etag.removeprefix('W/') in {e.removeprefix('W/') for e in etags}
+
+
+def cache_dashboard(nombre: str):
+    """
+    Decorador para las vistas del dashboard: cachea `response.data` (solo 200)
+    bajo una clave que incluye la versión de datos y los parámetros GET.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            clave = clave_cache(nombre, request.GET.dict())
+            data = cache.get(clave)
+            if data is not None:
+                return Response(data, status=status.HTTP_200_OK)
+
+            response = vista(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(clave, response.data, timeout=settings.DASHBOARD_CACHE_TIMEOUT)
+            return response
+        return envoltura
+    return decorador
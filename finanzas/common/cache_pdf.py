@@ -0,0 +1,69 @@
+import hashlib
+import json
+from functools import lru_cache
+from django.core.cache import cache
+from django.template.loader import get_template
+
+PLANTILLA_CONTRATO = "pdf/contrato.html"
+HITS_KEY = "finanzas:pdf_cache:hits"
+MISSES_KEY = "finanzas:pdf_cache:misses"
+
+
+@lru_cache(maxsize=None)
+def version_plantilla(template_name: str = PLANTILLA_CONTRATO) -> str:
+    """
+    Hash del fuente de la plantilla: al desplegar una plantilla nueva todos
+    los PDFs quedan desactualizados.
+    """
+    fuente = get_template(template_name).template.source
+    return hashlib.sha256(fuente.encode()).hexdigest()
+
+
+def hash_contrato(obj) -> str:
+    """
+    Hash de la versión de la plantilla más los campos del contrato que aparecen
+    en el PDF. Si no cambia, el PDF ya subido sigue siendo válido.
+    """
+    campos = [
+        version_plantilla(),
+        obj.id,
+        str(obj.fecha_contrato),
+        obj.propietario.nombre,
+        obj.propietario.apellido,
+        str(obj.unidad),
+        obj.estado,
+        str(obj.cuota_mensual),
+        str(obj.costo_compra),
+        str(obj.fecha_registro),
+    ]
+    return hashlib.sha256(json.dumps(campos).encode()).hexdigest()
+
+
+def _contar(clave: str):
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.add(clave, 0, timeout=None)
+        cache.incr(clave)
+
+
+def pdf_vigente(obj, contar: bool = True):
+    """
+    URL del PDF ya subido si su hash coincide con el contenido actual, si no None.
+    Registra el acierto/fallo en los contadores del cache.
+    """
+    url = obj.contrato_PDF if obj.contrato_PDF and obj.contrato_PDF_hash == hash_contrato(obj) else None
+    if contar:
+        _contar(HITS_KEY if url else MISSES_KEY)
+    return url
+
+
+def estadisticas_cache_pdf() -> dict:
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total * 100, 2) if total else 0,
+    }
@@ -0,0 +1,321 @@
+from decimal import Decimal
+from django.db.models import Sum, Count, Q, F, Window
+from django.db.models.functions import RowNumber
+
+from ..models import expensa, contrato, resumen_mensual
+from residencial.modelsVehiculo import Unidad
+
+MESES = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun',
+         'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic']
+COLORES_COMPARATIVO = ['#EF4444', '#F59E0B', '#10B981', '#3B82F6']
+
+
+def resumen_expensas() -> dict:
+    """
+    Conteos y montos de expensas pagadas/pendientes en una sola consulta
+    (agregación condicional sobre la tabla expensa).
+    """
+    agg = expensa.objects.aggregate(
+        total=Count('id'),
+        pagadas=Count('id', filter=Q(pagada=True)),
+        pendientes=Count('id', filter=Q(pagada=False)),
+        monto_pagado=Sum('monto', filter=Q(pagada=True)),
+        monto_pendiente=Sum('monto', filter=Q(pagada=False)),
+    )
+    agg['monto_pagado'] = agg['monto_pagado'] or Decimal('0')
+    agg['monto_pendiente'] = agg['monto_pendiente'] or Decimal('0')
+    return agg
+
+
+def resumen_contratos() -> dict:
+    """
+    Conteo de contratos por estado en una sola consulta.
+    """
+    return contrato.objects.aggregate(
+        activos=Count('id', filter=Q(estado='A')),
+    )
+
+
+def resumen_unidades() -> dict:
+    """
+    Unidades ocupadas vs disponibles en una sola consulta.
+    """
+    return Unidad.objects.aggregate(
+        ocupadas=Count('id', filter=Q(estado='O')),
+        disponibles=Count('id', filter=Q(estado='D')),
+    )
+
+
+def porcentaje(parte, total) -> float:
+    return round((parte / total * 100), 2) if total > 0 else 0
+
+
+def resumen_financiero(exp=None) -> dict:
+    """
+    Resumen financiero general: una consulta por tabla (expensa, contrato, unidad).
+    `exp` permite reutilizar un resumen_expensas() ya calculado.
+    """
+    exp = exp or resumen_expensas()
+    con = resumen_contratos()
+    uni = resumen_unidades()
+
+    return {
+        'total_expensas': exp['total'],
+        'expensas_pagadas': exp['pagadas'],
+        'expensas_pendientes': exp['pendientes'],
+        'porcentaje_pagado': porcentaje(exp['pagadas'], exp['total']),
+        'monto_total_recaudado': float(exp['monto_pagado']),
+        'monto_pendiente': float(exp['monto_pendiente']),
+        'contratos_activos': con['activos'],
+        'unidades_ocupadas': uni['ocupadas'],
+        'unidades_disponibles': uni['disponibles'],
+    }
+
+
+def estado_expensas(exp=None) -> dict:
+    """
+    Payload del gráfico de dona (pagadas vs pendientes), reutilizando resumen_expensas.
+    """
+    exp = exp or resumen_expensas()
+    pagadas = exp['pagadas']
+    pendientes = exp['pendientes']
+    monto_pagado = exp['monto_pagado']
+    monto_pendiente = exp['monto_pendiente']
+
+    return {
+        'titulo': 'Estado de Expensas',
+        'tipo': 'donut',
+        'labels': ['Pagadas', 'Pendientes'],
+        'datasets': [
+            {
+                'label': 'Cantidad',
+                'data': [pagadas, pendientes],
+                'backgroundColor': ['#10B981', '#EF4444'],
+                'borderColor': ['#059669', '#DC2626'],
+            }
+        ],
+        'montos': {
+            'pagado': float(monto_pagado),
+            'pendiente': float(monto_pendiente),
+            'total': float(monto_pagado + monto_pendiente)
+        },
+        'porcentajes': {
+            'pagado': porcentaje(pagadas, pagadas + pendientes),
+            'pendiente': porcentaje(pendientes, pagadas + pendientes)
+        }
+    }
+
+
+def morosos_queryset():
+    """
+    Contratos activos con deuda pendiente, agrupados en la base de datos:
+    contrato -> unidad -> expensas (pendientes) + propietario.
+    """
+    return (
+        contrato.objects.filter(estado='A')
+        .values('id', 'propietario_id', 'propietario__nombre', 'propietario__apellido', 'unidad__codigo')
+        .annotate(
+            monto_pendiente=Sum('unidad__expensas_unidad__monto', filter=Q(unidad__expensas_unidad__pagada=False)),
+            cantidad_pendiente=Count('unidad__expensas_unidad', filter=Q(unidad__expensas_unidad__pagada=False)),
+        )
+        .filter(cantidad_pendiente__gt=0)
+    )
+
+
+def ranking_morosos(limite: int = 10, offset: int = 0, after_monto=None, after_id=None) -> dict:
+    """
+    Página del ranking de morosos, ordenado por (monto_pendiente, id) descendente.
+
+    - Con cursor (`after_monto`/`after_id`, tomados de `paginacion.siguiente` de la
+      página anterior): keyset `WHERE (monto, id) < (after_monto, after_id)` con
+      LIMIT; la base no recorre las filas ya vistas.
+    - Sin cursor: por posición (`offset`) sobre el número de fila de la window function.
+    """
+    qs = morosos_queryset()
+    orden = [F('monto_pendiente').desc(), F('id').desc()]
+    stats = dict(total_morosos=Count('id'), deuda_total=Sum('monto_pendiente'))
+
+    if after_monto is not None and after_id is not None:
+        despues = Q(monto_pendiente__lt=after_monto) | Q(monto_pendiente=after_monto, id__lt=after_id)
+        filas = list(qs.filter(despues).order_by(*orden)[:limite])
+        # Las filas anteriores al cursor salen en el mismo aggregate que las estadísticas
+        stats['anteriores'] = Count('id', filter=~despues)
+        stats = qs.aggregate(**stats)
+        inicio = stats['anteriores']
+        for i, f in enumerate(filas, start=1):
+            f['posicion'] = inicio + i
+    else:
+        ranking = qs.annotate(posicion=Window(RowNumber(), order_by=orden))
+        filas = list(
+            ranking.filter(posicion__gt=offset, posicion__lte=offset + limite).order_by('posicion')
+        )
+        stats = qs.aggregate(**stats)
+        inicio = offset
+
+    detalles = [
+        {
+            'posicion': f['posicion'],
+            'propietario_id': f['propietario_id'],
+            'nombre': f"{f['propietario__nombre']} {f['propietario__apellido']}",
+            'unidad': f['unidad__codigo'],
+            'monto_pendiente': float(f['monto_pendiente'] or 0),
+            'cantidad_pendiente': f['cantidad_pendiente'],
+        }
+        for f in filas
+    ]
+    total_morosos = stats['total_morosos'] or 0
+    deuda_total = float(stats['deuda_total'] or 0)
+    siguiente = inicio + len(detalles)
+    hay_mas = bool(filas) and siguiente < total_morosos
+
+    return {
+        'detalles': detalles,
+        'estadisticas': {
+            'total_morosos': total_morosos,
+            'deuda_total': round(deuda_total, 2),
+            'promedio_deuda': round(deuda_total / total_morosos, 2) if total_morosos else 0
+        },
+        'paginacion': {
+            'limite': limite,
+            'offset': inicio,
+            'siguiente_offset': siguiente if hay_mas else None,
+            # Cursor para pedir la página siguiente por keyset
+            'siguiente': {
+                'after_monto': str(filas[-1]['monto_pendiente']),
+                'after_id': filas[-1]['id'],
+            } if hay_mas else None,
+        }
+    }
+
+
+def ingresos_por_mes(años) -> dict:
+    """
+    Ingresos pagados y cantidades por mes para varios años, en una sola consulta
+    sobre resumen_mensual. Devuelve {año: {'montos': [12], 'cantidades': [12]}}.
+    """
+    datos = {año: {'montos': [0] * 12, 'cantidades': [0] * 12} for año in años}
+    filas = resumen_mensual.objects.filter(
+        anio__in=años
+    ).values('anio', 'mes').annotate(
+        total=Sum('monto_pagado'),
+        cantidad=Sum('cantidad_pagadas')
+    ).order_by('anio', 'mes')
+
+    for fila in filas:
+        datos[fila['anio']]['montos'][fila['mes'] - 1] = float(fila['total'])
+        datos[fila['anio']]['cantidades'][fila['mes'] - 1] = fila['cantidad']
+    return datos
+
+
+def años_comparativo(año_actual: int) -> list:
+    return [año_actual - 3, año_actual - 2, año_actual - 1, año_actual]
+
+
+def ingresos_mensuales(año: int, ingresos=None) -> dict:
+    """
+    Payload del gráfico de ingresos mensuales de un año.
+    """
+    ingresos = ingresos if ingresos and año in ingresos else ingresos_por_mes([año])
+    datos_mensuales = ingresos[año]['montos']
+    cantidades = ingresos[año]['cantidades']
+
+    # Total del año
+    total_año = sum(datos_mensuales)
+    promedio_mensual = total_año / 12 if total_año > 0 else 0
+
+    return {
+        'titulo': f'Ingresos Mensuales {año}',
+        'tipo': 'bar',
+        'labels': MESES,
+        'datasets': [
+            {
+                'label': f'Ingresos {año}',
+                'data': datos_mensuales,
+                'backgroundColor': '#3B82F6',
+                'borderColor': '#2563EB',
+                'borderWidth': 1
+            }
+        ],
+        'estadisticas': {
+            'total_año': round(total_año, 2),
+            'promedio_mensual': round(promedio_mensual, 2),
+            'mes_mayor_ingreso': MESES[datos_mensuales.index(max(datos_mensuales))] if max(datos_mensuales) > 0 else 'N/A',
+            'monto_mayor': round(max(datos_mensuales), 2)
+        },
+        'cantidades_por_mes': cantidades
+    }
+
+
+def comparativo_anual(año_actual: int, ingresos=None) -> dict:
+    """
+    Payload del gráfico comparativo de los últimos 4 años.
+    """
+    años = años_comparativo(año_actual)
+    if not ingresos or not all(año in ingresos for año in años):
+        ingresos = ingresos_por_mes(años)
+
+    datasets = []
+    for i, año in enumerate(años):
+        datasets.append({
+            'label': str(año),
+            'data': ingresos[año]['montos'],
+            'borderColor': COLORES_COMPARATIVO[i],
+            'backgroundColor': COLORES_COMPARATIVO[i] + '33',  # 20% opacity
+            'fill': False,
+            'tension': 0.4
+        })
+
+    return {
+        'titulo': 'Comparación de Ingresos por Año',
+        'tipo': 'line',
+        'labels': MESES,
+        'datasets': datasets
+    }
+
+
+def grafico_morosos(limite: int = 10, offset: int = 0, after_monto=None, after_id=None) -> dict:
+    """
+    Payload del gráfico de barras horizontal con el ranking de morosos.
+    """
+    ranking = ranking_morosos(limite=limite, offset=offset, after_monto=after_monto, after_id=after_id)
+    top_morosos = ranking['detalles']
+
+    return {
+        'titulo': f'Top {len(top_morosos)} Propietarios con Deudas Pendientes',
+        'tipo': 'horizontalBar',
+        'labels': [m['nombre'] for m in top_morosos],
+        'datasets': [
+            {
+                'label': 'Monto Pendiente (Bs.)',
+                'data': [m['monto_pendiente'] for m in top_morosos],
+                'backgroundColor': '#F59E0B',
+                'borderColor': '#D97706',
+                'borderWidth': 1
+            }
+        ],
+        'detalles': top_morosos,
+        'estadisticas': ranking['estadisticas'],
+        'paginacion': ranking['paginacion']
+    }
+
+
+def dashboard_completo(año_actual: int, año=None, limite: int = 10, offset: int = 0,
+                       after_monto=None, after_id=None) -> dict:
+    """
+    Los cinco payloads del dashboard con consultas compartidas:
+    resumen y estado usan el mismo aggregate de expensa, e ingresos y
+    comparativo la misma lectura de resumen_mensual.
+    """
+    año = año or año_actual
+    exp = resumen_expensas()
+    años = sorted(set(años_comparativo(año_actual)) | {año})
+    ingresos = ingresos_por_mes(años)
+
+    return {
+        'resumen': {'resumen': resumen_financiero(exp)},
+        'grafico_expensas': estado_expensas(exp),
+        'grafico_ingresos': ingresos_mensuales(año, ingresos),
+        'grafico_morosos': grafico_morosos(limite=limite, offset=offset,
+                                           after_monto=after_monto, after_id=after_id),
+        'grafico_comparativo': comparativo_anual(año_actual, ingresos),
+    }
@@ -0,0 +1,97 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+
+from residencial.modelsVehiculo import Unidad
+from ..models import expensa, contrato
+from .cache_dashboard import incrementar_version
+from .resumen_mensual import celdas_de_expensas, recalcular_celdas
+from .notificaciones import MESES, encolar_expensas
+
+
+def parsear_periodo(texto: str) -> date:
+    """
+    'YYYY-MM' -> primer día del mes.
+    """
+    try:
+        anio, mes = texto.split('-')
+        return date(int(anio), int(mes), 1)
+    except (ValueError, AttributeError):
+        raise ValueError(f"Periodo inválido '{texto}', use el formato YYYY-MM")
+
+
+def monto_expensa(cont) -> Decimal:
+    """
+    Cuota del contrato; si no tiene, el monto base según el área de la unidad.
+    """
+    if cont.cuota_mensual:
+        return cont.cuota_mensual
+    area = float(cont.unidad.area_m2) if cont.unidad.area_m2 else 70.0
+    return Decimal(str(200 + (area * 1.5))).quantize(Decimal('0.01'))
+
+
+def emitir_expensas(periodo: date, chunk: int = 500, notificar: bool = True) -> list:
+    """
+    Genera las expensas del periodo para todos los contratos activos.
+    Los montos se calculan en memoria y se insertan con bulk_create por lotes,
+    cada lote en su propia transacción. La restricción única (unidad, periodo)
+    hace que volver a correr el mismo periodo no duplique nada. Las
+    notificaciones se encolan en el outbox dentro de la transacción de cada lote.
+    Devuelve los ids de las expensas creadas.
+    """
+    ya_emitidas = set(
+        expensa.objects.filter(periodo=periodo).values_list('unidad_id', flat=True)
+    )
+    contratos = (
+        contrato.objects.filter(estado='A')
+        .exclude(unidad_id__in=ya_emitidas)
+        .select_related('unidad')
+        .order_by('unidad_id', 'id')
+    )
+
+    hoy = timezone.now().date()
+    descripcion = f"Expensa mensual - {MESES[periodo.month]} {periodo.year}"
+    nuevas = []
+    unidades = set()
+    for cont in contratos:
+        # Si la unidad tiene más de un contrato activo, se factura una sola vez
+        if cont.unidad_id in unidades:
+            continue
+        unidades.add(cont.unidad_id)
+        nuevas.append(expensa(
+            unidad_id=cont.unidad_id,
+            monto=monto_expensa(cont),
+            fecha_vencimiento=hoy + timedelta(days=30),
+            periodo=periodo,
+            descripcion=descripcion,
+        ))
+
+    ids = []
+    for i in range(0, len(nuevas), chunk):
+        lote = nuevas[i:i + chunk]
+        with transaction.atomic():
+            # Otra corrida del mismo periodo bloquea las mismas unidades y espera a
+            # este commit; así se encolan y cuentan solo las expensas insertadas aquí
+            unidades_lote = list(
+                Unidad.objects.select_for_update().filter(id__in=[e.unidad_id for e in lote])
+                .order_by('id').values_list('id', flat=True)
+            )
+            existentes = set(
+                expensa.objects.filter(periodo=periodo, unidad_id__in=unidades_lote)
+                .values_list('unidad_id', flat=True)
+            )
+            lote = [e for e in lote if e.unidad_id not in existentes]
+            expensa.objects.bulk_create(lote, ignore_conflicts=True)
+            ids_lote = list(
+                expensa.objects.filter(periodo=periodo, unidad_id__in=[e.unidad_id for e in lote])
+                .values_list('id', flat=True)
+            )
+            if notificar:
+                encolar_expensas(ids_lote)
+        ids.extend(ids_lote)
+
+    # bulk_create no dispara signals: actualizar resumen mensual y cache a mano
+    recalcular_celdas(celdas_de_expensas(expensa.objects.filter(id__in=ids)))
+    transaction.on_commit(incrementar_version)
+    return ids
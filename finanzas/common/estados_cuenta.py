@@ -0,0 +1,254 @@
+import secrets
+import tempfile
+import zipfile
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from datetime import timedelta
+from decimal import Decimal
+import cloudinary.uploader
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+
+from residencial.modelsVehiculo import Unidad
+from ..models import expensa, multa, contrato, trabajo_estado_cuenta
+from .notificaciones import MESES
+from .pdf_utils import render_pdf_from_template, inicializar_proceso_django
+
+PLANTILLA_ESTADO_CUENTA = "pdf/estado_cuenta.html"
+
+
+def es_administrador(user) -> bool:
+    return user.is_superuser or user.is_staff or user.groups.filter(name='administrador').exists()
+
+
+def unidades_de_usuario(user):
+    """
+    Ids de las unidades que el usuario puede consultar (las de sus contratos
+    activos, como en ExpensaViewSet), o None si es administrador (todas).
+    """
+    if es_administrador(user):
+        return None
+    return (Unidad.objects.filter(contratos_unidad__propietario__user=user, contratos_unidad__estado='A')
+            .values_list('id', flat=True))
+
+
+def movimientos_periodo(periodo, bloque_id=None, unidad_id=None, unidades=None):
+    """(expensas, multas) del periodo con los filtros de bloque, unidad y unidades visibles."""
+    filtro_expensas = Q(periodo=periodo) | Q(
+        periodo__isnull=True, fecha_emision__year=periodo.year, fecha_emision__month=periodo.month
+    )
+    expensas = expensa.objects.filter(filtro_expensas)
+    multas = multa.objects.filter(fecha_multa__year=periodo.year, fecha_multa__month=periodo.month)
+    if bloque_id:
+        expensas = expensas.filter(unidad__bloque_id=bloque_id)
+        multas = multas.filter(expensa__unidad__bloque_id=bloque_id)
+    if unidad_id:
+        expensas = expensas.filter(unidad_id=unidad_id)
+        multas = multas.filter(expensa__unidad_id=unidad_id)
+    if unidades is not None:
+        expensas = expensas.filter(unidad_id__in=unidades)
+        multas = multas.filter(expensa__unidad_id__in=unidades)
+    return expensas, multas
+
+
+def contextos_estados_cuenta(periodo, bloque_id=None, unidad_id=None, unidades=None) -> list:
+    """
+    Un contexto (dict simple, serializable para los procesos hijos) por cada
+    unidad con expensas o multas en el periodo. Tres consultas en total.
+    `unidades` (ids) limita a las unidades visibles para quien lo pide.
+    """
+    expensas, multas = movimientos_periodo(periodo, bloque_id, unidad_id, unidades)
+
+    por_unidad = defaultdict(lambda: {'expensas': [], 'multas': []})
+    for e in expensas.order_by('fecha_emision', 'id').values(
+        'id', 'unidad_id', 'descripcion', 'fecha_emision', 'fecha_vencimiento', 'pagada', 'monto'
+    ):
+        por_unidad[e['unidad_id']]['expensas'].append(e)
+    for m in multas.order_by('fecha_multa', 'id').values(
+        'id', 'expensa__unidad_id', 'expensa_id', 'expensa__pagada', 'tipo', 'fecha_multa', 'monto'
+    ):
+        m['tipo'] = dict(multa.TIPO_CHOISES).get(m['tipo'], m['tipo'])
+        por_unidad[m['expensa__unidad_id']]['multas'].append(m)
+
+    if not por_unidad:
+        return []
+
+    unidades = Unidad.objects.filter(id__in=por_unidad.keys()).select_related('bloque')
+    propietarios = {}
+    for c in (contrato.objects.filter(estado='A', unidad_id__in=por_unidad.keys())
+              .select_related('propietario').order_by('id')):
+        propietarios.setdefault(c.unidad_id, f"{c.propietario.nombre} {c.propietario.apellido}")
+
+    periodo_texto = f"{MESES[periodo.month]} {periodo.year}"
+    contextos = []
+    for u in unidades.order_by('id'):
+        filas = por_unidad[u.id]
+        pendiente = sum((e['monto'] for e in filas['expensas'] if not e['pagada']), Decimal('0'))
+        pendiente += sum((m['monto'] for m in filas['multas'] if not m['expensa__pagada']), Decimal('0'))
+        contextos.append({
+            'archivo': f"estado-cuenta-{periodo:%Y-%m}-{slugify(str(u))}-{u.id}.pdf",
+            'periodo_texto': periodo_texto,
+            'unidad': str(u),
+            'bloque': u.bloque.nombre if u.bloque_id else "",
+            'propietario': propietarios.get(u.id, ""),
+            'expensas': filas['expensas'],
+            'multas': filas['multas'],
+            'total_expensas': sum((e['monto'] for e in filas['expensas']), Decimal('0')),
+            'total_multas': sum((m['monto'] for m in filas['multas']), Decimal('0')),
+            'total_pendiente': pendiente,
+        })
+    return contextos
+
+
+def _render_estado(ctx):
+    try:
+        return ctx['archivo'], render_pdf_from_template(PLANTILLA_ESTADO_CUENTA, ctx), None
+    except Exception as e:
+        return ctx['archivo'], None, str(e)
+
+
+def _renders(contextos, procesos: int):
+    """
+    Genera (archivo, pdf, error) a medida que se renderizan. Con pool, a lo
+    sumo 2 PDFs por proceso en vuelo: la memoria no crece con la cantidad.
+    """
+    if procesos <= 1:
+        for ctx in contextos:
+            yield _render_estado(ctx)
+        return
+
+    # Los procesos hijos no deben heredar conexiones abiertas a la BD
+    if not connection.in_atomic_block:
+        connections.close_all()
+    with ProcessPoolExecutor(max_workers=procesos, initializer=inicializar_proceso_django) as pool:
+        en_vuelo = set()
+        for ctx in contextos:
+            en_vuelo.add(pool.submit(_render_estado, ctx))
+            if len(en_vuelo) >= procesos * 2:
+                listos, en_vuelo = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                for f in listos:
+                    yield f.result()
+        for f in as_completed(en_vuelo):
+            yield f.result()
+
+
+class _SalidaZip:
+    """
+    Destino no buscable para ZipFile: acumula solo lo escrito desde el último
+    `vaciar()`, así cada PDF se entrega y se libera apenas entra al ZIP.
+    """
+    def __init__(self):
+        self._partes = []
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self) -> bytes:
+        datos = b"".join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def zip_estados_cuenta(contextos, procesos: int = 2, stats: dict = None):
+    """
+    Generador de bytes del ZIP con un PDF por contexto. Sirve tanto para
+    StreamingHttpResponse como para escribir a un archivo por partes.
+    Los renders que fallan se listan en errores.txt dentro del ZIP.
+    """
+    stats = stats if stats is not None else {}
+    stats.update({'generados': 0, 'errores': []})
+    salida = _SalidaZip()
+    # ZIP_STORED: el contenido de los PDFs ya viene comprimido
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for archivo, pdf_bytes, error in _renders(contextos, procesos):
+            if error:
+                stats['errores'].append(f"{archivo}: {error}")
+                continue
+            zf.writestr(archivo, pdf_bytes)
+            stats['generados'] += 1
+            yield salida.vaciar()
+        if stats['errores']:
+            zf.writestr("errores.txt", "\n".join(stats['errores']))
+    yield salida.vaciar()
+
+
+MAX_INTENTOS = 3
+# Un trabajo 'En proceso' más viejo que esto se considera abandonado (worker caído)
+TIMEOUT_PROCESO = timedelta(minutes=30)
+
+
+def tomar_trabajo_estado_cuenta():
+    """
+    Reclama el siguiente trabajo pendiente (o abandonado) y lo marca en proceso
+    en una transacción corta; el render y la subida ocurren fuera de ella.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        trabajo = (
+            trabajo_estado_cuenta.objects
+            .select_for_update(skip_locked=True)
+            .filter(Q(estado='P') | Q(estado='R', fecha_inicio__lt=ahora - TIMEOUT_PROCESO))
+            .order_by('id')
+            .first()
+        )
+        if trabajo is None:
+            return None
+        trabajo.estado = 'R'
+        trabajo.fecha_inicio = ahora
+        trabajo.intentos += 1
+        trabajo.save(update_fields=['estado', 'fecha_inicio', 'intentos'])
+    return trabajo
+
+
+def procesar_trabajo_estado_cuenta(trabajo, procesos: int = 2) -> bool:
+    """
+    Genera el ZIP de un trabajo ya reclamado en un archivo temporal y lo sube
+    a Cloudinary con un public_id no adivinable. Devuelve True si terminó bien.
+    """
+    stats = {}
+    try:
+        unidades = unidades_de_usuario(trabajo.usuario)
+        contextos = contextos_estados_cuenta(trabajo.periodo, trabajo.bloque_id, trabajo.unidad_id, unidades)
+        if not contextos:
+            raise ValueError("No hay movimientos en el periodo")
+        with tempfile.TemporaryFile() as f:
+            for parte in zip_estados_cuenta(contextos, procesos=procesos, stats=stats):
+                f.write(parte)
+            f.seek(0)
+            resultado = cloudinary.uploader.upload(
+                file=f,
+                resource_type="raw",
+                public_id=f"estados-cuenta/{trabajo.periodo:%Y-%m}-{trabajo.id}-{secrets.token_urlsafe(12)}.zip",
+                overwrite=True,
+            )
+    except Exception as e:
+        trabajo.error = str(e)[:1000]
+        # Se reintenta volviendo a pendiente hasta MAX_INTENTOS
+        trabajo.estado = 'E' if trabajo.intentos >= MAX_INTENTOS else 'P'
+        trabajo.fecha_fin = timezone.now() if trabajo.estado == 'E' else None
+        trabajo.save(update_fields=['estado', 'error', 'fecha_fin'])
+        return False
+
+    trabajo.estado = 'C'
+    trabajo.zip_url = resultado.get("secure_url")
+    trabajo.generados = stats['generados']
+    trabajo.error = "\n".join(stats['errores'])[:1000]
+    trabajo.fecha_fin = timezone.now()
+    trabajo.save(update_fields=['estado', 'zip_url', 'generados', 'error', 'fecha_fin'])
+    return True
+
+
+def procesar_estados_cuenta_pendientes(procesos: int = 2) -> dict:
+    """Vacía la cola de ZIPs de estados de cuenta, un trabajo a la vez."""
+    stats = {'completados': 0, 'errores': 0}
+    while True:
+        trabajo = tomar_trabajo_estado_cuenta()
+        if trabajo is None:
+            return stats
+        stats['completados' if procesar_trabajo_estado_cuenta(trabajo, procesos) else 'errores'] += 1
@@ -0,0 +1,357 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from fcm_django.models import FCMDevice
+from firebase_admin import messaging
+
+from ..models import expensa, contrato, notificacion_saliente, suscripcion_topic
+
+# Helper simple para meses en español (para evitar problemas de configuración de servidor)
+MESES = {
+    1: "Enero", 2: "Febrero", 3: "Marzo", 4: "Abril", 5: "Mayo", 6: "Junio",
+    7: "Julio", 8: "Agosto", 9: "Septiembre", 10: "Octubre", 11: "Noviembre", 12: "Diciembre"
+}
+
+# Límite de mensajes por llamada a send_each de FCM
+FCM_LOTE = 500
+# Límite de tokens por llamada a subscribe_to_topic / unsubscribe_from_topic
+FCM_LOTE_TOPIC = 1000
+MAX_INTENTOS = 5
+# Motivos de error de topic management que no se arreglan reintentando (token inválido o dado de baja)
+ERRORES_TOKEN_DEFINITIVOS = {'NOT_FOUND', 'INVALID_ARGUMENT'}
+# Si el worker muere a mitad del envío, otro retoma el lote pasado este tiempo
+TIMEOUT_PROCESO = timedelta(minutes=5)
+
+
+def contenido_expensa(exp, propietario) -> dict:
+    """
+    Título, cuerpo y data del mensaje de nueva expensa para el propietario.
+    """
+    nombre_persona = propietario.nombre.split()[0]  # Tomamos solo el primer nombre
+    nombre_unidad = str(exp.unidad)
+    mes_actual = MESES[(exp.periodo or exp.fecha_emision).month]
+
+    return {
+        'titulo': f"Expensa de {mes_actual} 📅",
+        'cuerpo': f"Hola {nombre_persona}, se ha generado la cuota de tu unidad {nombre_unidad} por {exp.monto} {exp.currency}.",
+        'data': {
+            "tipo": "nueva_expensa",
+            "expensa_id": str(exp.id),
+            "click_action": "FLUTTER_NOTIFICATION_CLICK"
+        },
+    }
+
+
+def encolar_expensas(expensa_ids):
+    """
+    Agrega al outbox una notificación por expensa. Llamar dentro de la misma
+    transacción que crea las expensas.
+    """
+    notificacion_saliente.objects.bulk_create([
+        notificacion_saliente(tipo='nueva_expensa', expensa_id=exp_id)
+        for exp_id in expensa_ids
+    ])
+
+
+def encolar_difusion(titulo: str, cuerpo: str, data: dict, tipo: str, topic: str = None):
+    """
+    Agrega al outbox un mensaje para todos los dispositivos suscritos al topic.
+    """
+    return notificacion_saliente.objects.create(
+        tipo=tipo,
+        topic=topic or settings.FCM_TOPIC_CONDOMINIO,
+        titulo=titulo,
+        cuerpo=cuerpo,
+        data=data,
+    )
+
+
+def marcar_para_suscripcion(dispositivo):
+    """
+    El dispositivo (nuevo o con token rotado) debe (re)suscribirse al topic.
+    """
+    suscripcion_topic.objects.update_or_create(
+        dispositivo=dispositivo,
+        defaults={'topic': settings.FCM_TOPIC_CONDOMINIO, 'suscrito': False,
+                  'intentos': 0, 'proximo_intento': timezone.now(), 'error': ""},
+    )
+
+
+def _proximo_intento(intentos: int, ahora):
+    """Backoff exponencial (30s, 1m, 2m, 4m...); None tras MAX_INTENTOS."""
+    if intentos >= MAX_INTENTOS:
+        return None
+    return ahora + timedelta(seconds=30 * 2 ** (intentos - 1))
+
+
+def sincronizar_suscripciones(topic: str = None) -> dict:
+    """
+    Suscribe en bloque al topic los dispositivos activos que aún no lo están y
+    desuscribe los inactivos, en llamadas de hasta 1000 tokens.
+    Los tokens inválidos o dados de baja desactivan el dispositivo; los errores
+    transitorios se reintentan con backoff hasta MAX_INTENTOS.
+    """
+    topic = topic or settings.FCM_TOPIC_CONDOMINIO
+    ahora = timezone.now()
+    stats = {'suscritos': 0, 'desuscritos': 0, 'errores': 0}
+
+    pendientes = list(
+        FCMDevice.objects.filter(active=True)
+        .filter(Q(suscripcion_topic__isnull=True) | Q(suscripcion_topic__proximo_intento__lte=ahora))
+        .exclude(suscripcion_topic__suscrito=True, suscripcion_topic__topic=topic)
+        .values_list('id', 'registration_id', 'suscripcion_topic__intentos')
+    )
+    for i in range(0, len(pendientes), FCM_LOTE_TOPIC):
+        bloque = pendientes[i:i + FCM_LOTE_TOPIC]
+        try:
+            respuesta = messaging.subscribe_to_topic([token for _, token, _ in bloque], topic)
+            fallidos = {err.index: err.reason for err in respuesta.errors}
+        except Exception as e:
+            print(f"Error suscribiendo dispositivos al topic {topic}: {e}")
+            fallidos = {idx: str(e) for idx in range(len(bloque))}
+
+        filas, invalidos = [], []
+        for idx, (device_id, _, intentos) in enumerate(bloque):
+            fila = suscripcion_topic(dispositivo_id=device_id, topic=topic, suscrito=idx not in fallidos,
+                                     intentos=0, proximo_intento=ahora, error="")
+            if idx in fallidos:
+                fila.error = str(fallidos[idx])[:1000]
+                if fallidos[idx] in ERRORES_TOKEN_DEFINITIVOS:
+                    invalidos.append(device_id)
+                    fila.proximo_intento = None
+                else:
+                    fila.intentos = (intentos or 0) + 1
+                    fila.proximo_intento = _proximo_intento(fila.intentos, ahora)
+            filas.append(fila)
+
+        with transaction.atomic():
+            if invalidos:
+                FCMDevice.objects.filter(id__in=invalidos).update(active=False)
+            suscripcion_topic.objects.bulk_create(
+                filas,
+                update_conflicts=True,
+                unique_fields=['dispositivo'],
+                update_fields=['topic', 'suscrito', 'intentos', 'proximo_intento', 'error'],
+            )
+        stats['suscritos'] += len(bloque) - len(fallidos)
+        stats['errores'] += len(fallidos)
+
+    inactivos = list(
+        suscripcion_topic.objects.filter(suscrito=True, dispositivo__active=False, proximo_intento__lte=ahora)
+        .values_list('id', 'topic', 'dispositivo__registration_id', 'intentos')
+    )
+    for i in range(0, len(inactivos), FCM_LOTE_TOPIC):
+        bloque = inactivos[i:i + FCM_LOTE_TOPIC]
+        por_topic = defaultdict(list)
+        for sus_id, sus_topic, token, intentos in bloque:
+            por_topic[sus_topic].append((sus_id, token, intentos))
+        for sus_topic, filas in por_topic.items():
+            try:
+                messaging.unsubscribe_from_topic([token for _, token, _ in filas], sus_topic)
+            except Exception as e:
+                print(f"Error desuscribiendo dispositivos del topic {sus_topic}: {e}")
+                stats['errores'] += len(filas)
+                reintentos = [
+                    suscripcion_topic(id=sus_id, intentos=intentos + 1, error=str(e)[:1000],
+                                      proximo_intento=_proximo_intento(intentos + 1, ahora))
+                    for sus_id, _, intentos in filas
+                ]
+                suscripcion_topic.objects.bulk_update(reintentos, ['intentos', 'proximo_intento', 'error'])
+                continue
+            suscripcion_topic.objects.filter(id__in=[sus_id for sus_id, _, _ in filas]).update(
+                suscrito=False, intentos=0, error=""
+            )
+            stats['desuscritos'] += len(filas)
+    return stats
+
+
+def _resolver_expensas(pendientes):
+    """
+    Completa destinatario y contenido de las notificaciones de expensa
+    con un número fijo de consultas para todo el lote.
+    """
+    sin_resolver = [n for n in pendientes if n.expensa_id and not n.user_id]
+    if not sin_resolver:
+        return
+
+    expensas = {
+        e.id: e for e in expensa.objects.filter(id__in={n.expensa_id for n in sin_resolver}).select_related('unidad')
+    }
+    propietarios = {}
+    for c in (contrato.objects
+              .filter(estado='A', unidad_id__in={e.unidad_id for e in expensas.values()}, propietario__user__isnull=False)
+              .select_related('propietario')
+              .order_by('id')):
+        propietarios.setdefault(c.unidad_id, c.propietario)
+
+    for n in sin_resolver:
+        exp = expensas.get(n.expensa_id)
+        propietario = propietarios.get(exp.unidad_id) if exp else None
+        if not propietario:
+            n.estado = 'D'
+            n.error = "Sin propietario con usuario"
+            continue
+        contenido = contenido_expensa(exp, propietario)
+        n.user_id = propietario.user_id
+        n.titulo = contenido['titulo']
+        n.cuerpo = contenido['cuerpo']
+        n.data = contenido['data']
+
+
+def _mensaje_usuario(notificaciones) -> dict:
+    """
+    Un solo mensaje por usuario: si tiene varias pendientes se agrupan.
+    """
+    if len(notificaciones) == 1:
+        n = notificaciones[0]
+        return {'titulo': n.titulo, 'cuerpo': n.cuerpo, 'data': {k: str(v) for k, v in n.data.items()}}
+
+    tipos = {n.tipo for n in notificaciones}
+    if tipos == {'nueva_expensa'}:
+        cuerpo = f"Se generaron {len(notificaciones)} expensas nuevas para tus unidades."
+    else:
+        cuerpo = f"Tienes {len(notificaciones)} notificaciones nuevas."
+    return {
+        'titulo': "Notificaciones del condominio",
+        'cuerpo': cuerpo,
+        'data': {
+            "tipo": tipos.pop() if len(tipos) == 1 else "multiples",
+            "ids": ",".join(str(n.data.get('expensa_id', n.id)) for n in notificaciones),
+            "click_action": "FLUTTER_NOTIFICATION_CLICK"
+        },
+    }
+
+
+def _reintentar(n, error, ahora):
+    n.intentos += 1
+    n.error = str(error)[:1000]
+    if n.intentos >= MAX_INTENTOS:
+        n.estado = 'F'
+    else:
+        # Backoff exponencial: 30s, 1m, 2m, 4m...
+        n.estado = 'P'
+        n.proximo_intento = ahora + timedelta(seconds=30 * 2 ** (n.intentos - 1))
+
+
+def _tomar(lote: int, ahora) -> list:
+    """
+    Reclama hasta `lote` notificaciones pendientes (o 'R' abandonadas) pasándolas
+    a 'R' en una transacción corta: el envío a FCM ocurre fuera, sin locks.
+    """
+    with transaction.atomic():
+        pendientes = list(
+            notificacion_saliente.objects
+            .select_for_update(skip_locked=True)
+            .filter(estado__in=['P', 'R'], proximo_intento__lte=ahora)
+            .order_by('id')[:lote]
+        )
+        notificacion_saliente.objects.filter(pk__in=[n.pk for n in pendientes]).update(
+            estado='R', proximo_intento=ahora + TIMEOUT_PROCESO
+        )
+    for n in pendientes:
+        n.estado = 'R'
+    return pendientes
+
+
+def despachar_pendientes(lote: int = 1000) -> dict:
+    """
+    Toma un lote del outbox, agrupa por usuario y envía con send_each de FCM
+    en llamadas de hasta 500 mensajes. Las difusiones a un topic son un solo
+    mensaje cada una. Devuelve contadores del lote.
+    """
+    ahora = timezone.now()
+    stats = {'enviadas': 0, 'descartadas': 0, 'reintentos': 0, 'fallidas': 0}
+
+    pendientes = _tomar(lote, ahora)
+    if not pendientes:
+        return stats
+
+    _resolver_expensas(pendientes)
+
+    por_usuario = defaultdict(list)
+    difusiones = []
+    for n in pendientes:
+        if n.estado != 'R':
+            continue
+        if n.topic:
+            difusiones.append(n)
+        else:
+            por_usuario[n.user_id].append(n)
+
+    tokens = defaultdict(list)
+    for user_id, token in FCMDevice.objects.filter(user_id__in=por_usuario.keys(), active=True).values_list('user_id', 'registration_id'):
+        tokens[user_id].append(token)
+
+    # (mensaje FCM, destino) por cada dispositivo o topic; destino = ('user', id) | ('topic', id)
+    envios = []
+    for user_id, notificaciones in por_usuario.items():
+        if not tokens.get(user_id):
+            for n in notificaciones:
+                n.estado = 'D'
+                n.error = "Usuario sin dispositivos activos"
+            continue
+        contenido = _mensaje_usuario(notificaciones)
+        for token in tokens[user_id]:
+            envios.append((messaging.Message(
+                notification=messaging.Notification(title=contenido['titulo'], body=contenido['cuerpo']),
+                data=contenido['data'],
+                token=token,
+            ), ('user', user_id)))
+    for n in difusiones:
+        envios.append((messaging.Message(
+            notification=messaging.Notification(title=n.titulo, body=n.cuerpo),
+            data={k: str(v) for k, v in n.data.items()},
+            topic=n.topic,
+        ), ('topic', n.id)))
+
+    exitos = set()
+    errores = {}
+    invalidos = []
+    for i in range(0, len(envios), FCM_LOTE):
+        bloque = envios[i:i + FCM_LOTE]
+        try:
+            respuesta = messaging.send_each([m for m, _ in bloque])
+        except Exception as e:
+            for _, destino in bloque:
+                errores.setdefault(destino, e)
+            continue
+        for (mensaje, destino), r in zip(bloque, respuesta.responses):
+            if r.success:
+                exitos.add(destino)
+            elif isinstance(r.exception, messaging.UnregisteredError) and mensaje.token:
+                invalidos.append(mensaje.token)
+            else:
+                errores.setdefault(destino, r.exception)
+
+    for n in pendientes:
+        if n.estado != 'R':
+            continue
+        destino = ('topic', n.id) if n.topic else ('user', n.user_id)
+        if destino in exitos:
+            n.estado = 'E'
+            n.fecha_envio = ahora
+        else:
+            _reintentar(n, errores.get(destino, "Todos los tokens inválidos"), ahora)
+
+    for n in pendientes:
+        if n.estado == 'E':
+            stats['enviadas'] += 1
+        elif n.estado == 'D':
+            stats['descartadas'] += 1
+        elif n.estado == 'F':
+            stats['fallidas'] += 1
+        else:
+            stats['reintentos'] += 1
+
+    with transaction.atomic():
+        if invalidos:
+            FCMDevice.objects.filter(registration_id__in=invalidos).update(active=False)
+        notificacion_saliente.objects.bulk_update(
+            pendientes,
+            ['user', 'titulo', 'cuerpo', 'data', 'estado', 'intentos', 'proximo_intento', 'error', 'fecha_envio'],
+            batch_size=500,
+        )
+    return stats
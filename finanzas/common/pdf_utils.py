@@ -9,3 +9,14 @@ def render_pdf_from_template(template_name: str, context: dict) -> bytes:
     if result.err:
         raise ValueError("Error al generar el PDF con xhtml2pdf.")
     return out.getvalue()
+
+
+def inicializar_proceso_django():
+    """
+    Initializer para pools de procesos que renderizan PDFs: con el método
+    'spawn' (macOS/Windows) el proceso hijo arranca sin Django configurado.
+    """
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
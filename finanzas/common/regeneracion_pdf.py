@@ -0,0 +1,104 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from django.db import connection, connections
+
+from ..models import contrato
+from .cache_pdf import PLANTILLA_CONTRATO, hash_contrato
+from .pdf_utils import render_pdf_from_template, inicializar_proceso_django
+from .trabajos_pdf import subir_pdf_bytes
+
+
+def _render(obj):
+    """
+    Corre en el proceso hijo: solo renderiza, no toca la BD (el contrato llega
+    con unidad y propietario ya cargados).
+    """
+    try:
+        return obj.id, render_pdf_from_template(PLANTILLA_CONTRATO, {"contrato": obj}), None
+    except Exception as e:
+        return obj.id, None, str(e)
+
+
+def _subir(obj, pdf_bytes):
+    try:
+        return obj.id, subir_pdf_bytes(obj, pdf_bytes), None
+    except Exception as e:
+        return obj.id, None, str(e)
+
+
+def _procesar_lote(lote, pool_render, pool_subida) -> dict:
+    """
+    Renderiza el lote (en procesos si hay pool) y va subiendo cada PDF apenas
+    está listo, con a lo sumo `subidas` subidas simultáneas.
+    """
+    por_id = {obj.id: obj for obj in lote}
+    subidas = []
+    errores = {}
+
+    if pool_render is None:
+        renders = (_render(obj) for obj in lote)
+    else:
+        renders = (f.result() for f in as_completed([pool_render.submit(_render, obj) for obj in lote]))
+
+    for contrato_id, pdf_bytes, error in renders:
+        if error:
+            errores[contrato_id] = f"render: {error}"
+            continue
+        subidas.append(pool_subida.submit(_subir, por_id[contrato_id], pdf_bytes))
+
+    actualizados = []
+    for f in as_completed(subidas):
+        contrato_id, resultado, error = f.result()
+        if error:
+            errores[contrato_id] = f"subida: {error}"
+            continue
+        obj = por_id[contrato_id]
+        obj.contrato_PDF = resultado.get("secure_url")
+        obj.contrato_PDF_hash = obj._huella_pdf
+        actualizados.append(obj)
+
+    contrato.objects.bulk_update(actualizados, ["contrato_PDF", "contrato_PDF_hash"], batch_size=500)
+    return {'actualizados': len(actualizados), 'errores': errores}
+
+
+def regenerar_pdfs(queryset=None, procesos: int = 4, subidas: int = 8, lote: int = 200, forzar: bool = False, progreso=None) -> dict:
+    """
+    Regenera los PDFs de los contratos del queryset (todos por defecto).
+    El render (CPU) se reparte en `procesos` procesos; la subida a Cloudinary
+    (I/O) en `subidas` hilos. Los resultados se guardan con bulk_update por
+    lote, así que si la corrida se corta, al repetirla se saltan los contratos
+    ya al día (salvo `forzar`).
+    """
+    inicio = time.monotonic()
+    queryset = (queryset if queryset is not None else contrato.objects.all())
+    contratos = list(queryset.select_related('unidad', 'propietario').order_by('id'))
+
+    pendientes = []
+    for obj in contratos:
+        obj._huella_pdf = hash_contrato(obj)
+        if forzar or not obj.contrato_PDF or obj.contrato_PDF_hash != obj._huella_pdf:
+            pendientes.append(obj)
+
+    stats = {'total': len(contratos), 'omitidos': len(contratos) - len(pendientes), 'actualizados': 0, 'errores': {}}
+
+    pool_render = None
+    if procesos > 1 and pendientes:
+        # Los procesos hijos no deben heredar conexiones abiertas a la BD
+        if not connection.in_atomic_block:
+            connections.close_all()
+        pool_render = ProcessPoolExecutor(max_workers=procesos, initializer=inicializar_proceso_django)
+    try:
+        with ThreadPoolExecutor(max_workers=max(subidas, 1)) as pool_subida:
+            for i in range(0, len(pendientes), lote):
+                resultado = _procesar_lote(pendientes[i:i + lote], pool_render, pool_subida)
+                stats['actualizados'] += resultado['actualizados']
+                stats['errores'].update(resultado['errores'])
+                if progreso:
+                    progreso(min(i + lote, len(pendientes)), len(pendientes))
+    finally:
+        if pool_render is not None:
+            pool_render.shutdown()
+
+    stats['segundos'] = round(time.monotonic() - inicio, 2)
+    stats['por_segundo'] = round(stats['actualizados'] / stats['segundos'], 2) if stats['segundos'] else 0
+    return stats
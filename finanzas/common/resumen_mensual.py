@@ -0,0 +1,108 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Sum, Count, Q
+from django.db.models.functions import ExtractYear, ExtractMonth
+
+from ..models import expensa, resumen_mensual
+from .cache_dashboard import incrementar_version
+
+
+def _agregados():
+    return dict(
+        monto_pagado=Sum('monto', filter=Q(pagada=True)),
+        monto_pendiente=Sum('monto', filter=Q(pagada=False)),
+        cantidad_pagadas=Count('id', filter=Q(pagada=True)),
+        cantidad_pendientes=Count('id', filter=Q(pagada=False)),
+    )
+
+
+def recalcular_celda(anio: int, mes: int, bloque_id: int):
+    """
+    Recalcula una sola fila (año, mes, bloque) del resumen a partir de expensa.
+    Solo lee las expensas de ese mes y bloque, no toda la tabla.
+    La fila se bloquea (select_for_update) antes de agregar: dos recálculos
+    concurrentes de la misma celda se serializan y el segundo agrega ya con
+    lo que confirmó el primero, en vez de pisarlo con un total viejo.
+    """
+    with transaction.atomic():
+        celda, _ = resumen_mensual.objects.select_for_update().get_or_create(
+            anio=anio, mes=mes, bloque_id=bloque_id
+        )
+        agg = expensa.objects.filter(
+            fecha_emision__year=anio,
+            fecha_emision__month=mes,
+            unidad__bloque_id=bloque_id,
+        ).aggregate(**_agregados())
+
+        if not agg['cantidad_pagadas'] and not agg['cantidad_pendientes']:
+            celda.delete()
+            return
+
+        celda.monto_pagado = agg['monto_pagado'] or Decimal('0')
+        celda.monto_pendiente = agg['monto_pendiente'] or Decimal('0')
+        celda.cantidad_pagadas = agg['cantidad_pagadas']
+        celda.cantidad_pendientes = agg['cantidad_pendientes']
+        celda.save(update_fields=['monto_pagado', 'monto_pendiente', 'cantidad_pagadas', 'cantidad_pendientes'])
+
+
+def celdas_de_expensas(queryset):
+    """
+    Conjunto de (año, mes, bloque_id) afectados por un queryset de expensas.
+    """
+    return set(
+        queryset.annotate(
+            anio=ExtractYear('fecha_emision'),
+            mes=ExtractMonth('fecha_emision'),
+        ).values_list('anio', 'mes', 'unidad__bloque_id').distinct()
+    )
+
+
+def recalcular_celdas(celdas):
+    # Siempre en el mismo orden: dos transacciones que bloquean varias celdas no se cruzan
+    for anio, mes, bloque_id in sorted(c for c in celdas if all(c)):
+        recalcular_celda(anio, mes, bloque_id)
+
+
+def actualizar_pagadas(queryset):
+    """
+    Reemplazo de `queryset.update(pagada=True)` que mantiene el resumen mensual
+    e invalida el cache del dashboard (update() no dispara signals).
+    Devuelve la cantidad de filas actualizadas.
+    """
+    with transaction.atomic():
+        celdas = celdas_de_expensas(queryset)
+        filas = queryset.update(pagada=True)
+        recalcular_celdas(celdas)
+    if filas:
+        transaction.on_commit(incrementar_version)
+    return filas
+
+
+@transaction.atomic
+def reconstruir_resumen() -> int:
+    """
+    Reconstruye toda la tabla resumen_mensual con un único GROUP BY sobre expensa.
+    """
+    filas = (
+        expensa.objects
+        .annotate(anio=ExtractYear('fecha_emision'), mes=ExtractMonth('fecha_emision'))
+        .values('anio', 'mes', 'unidad__bloque_id')
+        .annotate(**_agregados())
+        .order_by()
+    )
+    resumen_mensual.objects.all().delete()
+    nuevos = [
+        resumen_mensual(
+            anio=f['anio'],
+            mes=f['mes'],
+            bloque_id=f['unidad__bloque_id'],
+            monto_pagado=f['monto_pagado'] or Decimal('0'),
+            monto_pendiente=f['monto_pendiente'] or Decimal('0'),
+            cantidad_pagadas=f['cantidad_pagadas'],
+            cantidad_pendientes=f['cantidad_pendientes'],
+        )
+        for f in filas
+    ]
+    resumen_mensual.objects.bulk_create(nuevos, batch_size=1000)
+    transaction.on_commit(incrementar_version)
+    return len(nuevos)
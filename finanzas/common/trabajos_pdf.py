@@ -0,0 +1,144 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+import cloudinary.uploader
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+
+from ..models import contrato, trabajo_pdf
+from .pdf_utils import render_pdf_from_template
+from .cache_pdf import PLANTILLA_CONTRATO, hash_contrato, pdf_vigente
+
+MAX_INTENTOS = 3
+# Un trabajo 'En proceso' más viejo que esto se considera abandonado (worker caído)
+TIMEOUT_PROCESO = timedelta(minutes=10)
+
+
+def encolar_pdf_contrato(contrato_id: int):
+    """
+    Devuelve (trabajo, creado). Si el contrato ya tiene un trabajo pendiente o
+    en proceso se reutiliza ese, así pedidos concurrentes generan un solo PDF.
+    """
+    activo = trabajo_pdf.objects.filter(contrato_id=contrato_id, estado__in=['P', 'R']).first()
+    if activo:
+        return activo, False
+    try:
+        with transaction.atomic():
+            return trabajo_pdf.objects.create(contrato_id=contrato_id), True
+    except IntegrityError:
+        # Otro pedido lo creó entre la consulta y el insert
+        return trabajo_pdf.objects.get(contrato_id=contrato_id, estado__in=['P', 'R']), False
+
+
+def public_id_contrato(obj) -> str:
+    return f"contratos/contrato-{obj.id}-{slugify(str(obj.unidad))}"
+
+
+def subir_pdf_bytes(obj, pdf_bytes: bytes) -> dict:
+    """
+    Sube el PDF ya renderizado a Cloudinary (mismo public_id de siempre, se
+    sobrescribe). Devuelve el resultado de Cloudinary.
+    """
+    return cloudinary.uploader.upload(
+        file=BytesIO(pdf_bytes),
+        resource_type="raw",
+        public_id=public_id_contrato(obj),
+        overwrite=True,
+        use_filename=True,
+        unique_filename=False,
+    )
+
+
+def subir_pdf_contrato(obj) -> dict:
+    """
+    Renderiza el PDF del contrato y lo sube a Cloudinary.
+    """
+    pdf_bytes = render_pdf_from_template(PLANTILLA_CONTRATO, {"contrato": obj})
+    return subir_pdf_bytes(obj, pdf_bytes)
+
+
+def tomar_trabajo():
+    """
+    Reclama el siguiente trabajo pendiente (o abandonado) y lo marca en proceso.
+    Con skip_locked varios workers pueden tomar trabajos en paralelo.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        trabajo = (
+            trabajo_pdf.objects
+            .select_for_update(skip_locked=True)
+            .filter(Q(estado='P') | Q(estado='R', fecha_inicio__lt=ahora - TIMEOUT_PROCESO))
+            .order_by('id')
+            .first()
+        )
+        if trabajo is None:
+            return None
+        trabajo.estado = 'R'
+        trabajo.fecha_inicio = ahora
+        trabajo.intentos += 1
+        trabajo.save(update_fields=['estado', 'fecha_inicio', 'intentos'])
+    return trabajo
+
+
+def procesar_trabajo(trabajo) -> bool:
+    """
+    Genera y sube el PDF de un trabajo ya reclamado. Devuelve True si terminó bien.
+    """
+    try:
+        obj = contrato.objects.select_related('unidad', 'propietario').get(pk=trabajo.contrato_id)
+        huella = hash_contrato(obj)
+        # Otro trabajo pudo dejar el PDF al día mientras este esperaba en la cola
+        url_vigente = pdf_vigente(obj, contar=False)
+        upload_result = {'secure_url': url_vigente} if url_vigente else subir_pdf_contrato(obj)
+    except Exception as e:
+        trabajo.error = str(e)[:1000]
+        # Se reintenta volviendo a pendiente hasta MAX_INTENTOS
+        trabajo.estado = 'E' if trabajo.intentos >= MAX_INTENTOS else 'P'
+        trabajo.fecha_fin = timezone.now() if trabajo.estado == 'E' else None
+        trabajo.save(update_fields=['estado', 'error', 'fecha_fin'])
+        return False
+
+    obj.contrato_PDF = upload_result.get("secure_url")
+    obj.contrato_PDF_hash = huella
+    obj.save(update_fields=["contrato_PDF", "contrato_PDF_hash"])
+
+    trabajo.estado = 'C'
+    trabajo.pdf_url = obj.contrato_PDF
+    trabajo.public_id = upload_result.get("public_id") or ""
+    trabajo.error = ""
+    trabajo.fecha_fin = timezone.now()
+    trabajo.save(update_fields=['estado', 'pdf_url', 'public_id', 'error', 'fecha_fin'])
+    return True
+
+
+def _worker(cerrar_conexion: bool = False) -> dict:
+    stats = {'completados': 0, 'errores': 0}
+    try:
+        while True:
+            trabajo = tomar_trabajo()
+            if trabajo is None:
+                break
+            stats['completados' if procesar_trabajo(trabajo) else 'errores'] += 1
+    finally:
+        # Cada hilo abre su propia conexión a la BD: cerrarla al terminar
+        if cerrar_conexion:
+            connection.close()
+    return stats
+
+
+def procesar_pendientes(workers: int = 4) -> dict:
+    """
+    Vacía la cola con un pool de `workers` hilos (la subida a Cloudinary es I/O).
+    Para repartir también el render entre CPUs, correr varias instancias del comando.
+    """
+    if workers <= 1:
+        return _worker()
+
+    total = {'completados': 0, 'errores': 0}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for stats in pool.map(lambda _: _worker(cerrar_conexion=True), range(workers)):
+            for clave, valor in stats.items():
+                total[clave] += valor
+    return total
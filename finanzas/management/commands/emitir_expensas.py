@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+
+from finanzas.common.emision import emitir_expensas, parsear_periodo
+
+
+class Command(BaseCommand):
+    help = "Emite las expensas de un periodo (YYYY-MM) para todos los contratos activos. Es idempotente."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--periodo", required=True, help="Periodo a facturar, formato YYYY-MM")
+        parser.add_argument("--chunk", type=int, default=500, help="Filas por bulk_create/transacción")
+        parser.add_argument("--sin-notificar", action="store_true", help="No encolar notificaciones push")
+
+    def handle(self, *args, **options):
+        try:
+            periodo = parsear_periodo(options["periodo"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        inicio = time.monotonic()
+        ids = emitir_expensas(periodo, chunk=options["chunk"], notificar=not options["sin_notificar"])
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {len(ids)} expensas emitidas para {periodo:%Y-%m} en {time.monotonic() - inicio:.2f}s"
+        ))
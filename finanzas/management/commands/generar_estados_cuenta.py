@@ -0,0 +1,41 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+
+from finanzas.common.emision import parsear_periodo
+from finanzas.common.estados_cuenta import contextos_estados_cuenta, zip_estados_cuenta
+
+
+class Command(BaseCommand):
+    help = "Genera los estados de cuenta (PDF por unidad) de un periodo y los escribe en un ZIP."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--periodo", required=True, help="Periodo, formato YYYY-MM")
+        parser.add_argument("--salida", help="Archivo ZIP destino (por defecto estados-cuenta-YYYY-MM.zip)")
+        parser.add_argument("--procesos", type=int, default=4, help="Procesos que renderizan PDFs")
+        parser.add_argument("--bloque", type=int, help="Solo unidades de este bloque")
+
+    def handle(self, *args, **options):
+        try:
+            periodo = parsear_periodo(options["periodo"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        inicio = time.monotonic()
+        contextos = contextos_estados_cuenta(periodo, bloque_id=options["bloque"])
+        if not contextos:
+            raise CommandError(f"No hay movimientos en {periodo:%Y-%m}")
+
+        salida = options["salida"] or f"estados-cuenta-{periodo:%Y-%m}.zip"
+        stats = {}
+        with open(salida, "wb") as f:
+            for parte in zip_estados_cuenta(contextos, procesos=options["procesos"], stats=stats):
+                f.write(parte)
+
+        for error in stats["errores"]:
+            self.stderr.write(f"✗ {error}")
+        segundos = time.monotonic() - inicio
+        estilo = self.style.WARNING if stats["errores"] else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f"✓ {stats['generados']} estados de cuenta en {salida} "
+            f"({len(stats['errores'])} fallidos) en {segundos:.2f}s"
+        ))
@@ -0,0 +1,25 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from finanzas.common.estados_cuenta import procesar_estados_cuenta_pendientes
+
+
+class Command(BaseCommand):
+    help = "Procesa la cola de ZIPs de estados de cuenta (render de PDFs + subida a Cloudinary)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--procesos", type=int, default=None,
+                            help="Procesos que renderizan PDFs (default: settings.ESTADOS_CUENTA_PROCESOS)")
+        parser.add_argument("--loop", action="store_true", help="Seguir corriendo y revisar la cola periódicamente")
+        parser.add_argument("--intervalo", type=float, default=5.0, help="Segundos de espera cuando la cola está vacía")
+
+    def handle(self, *args, **options):
+        procesos = options["procesos"] or settings.ESTADOS_CUENTA_PROCESOS
+        while True:
+            stats = procesar_estados_cuenta_pendientes(procesos=procesos)
+            if stats['completados'] or stats['errores']:
+                self.stdout.write(f"✓ completados={stats['completados']} errores={stats['errores']}")
+            if not options["loop"]:
+                break
+            time.sleep(options["intervalo"])
@@ -0,0 +1,34 @@
+import time
+from django.core.management.base import BaseCommand
+
+from finanzas.common.notificaciones import despachar_pendientes, sincronizar_suscripciones
+
+
+class Command(BaseCommand):
+    help = "Despacha el outbox de notificaciones push (FCM send_each, hasta 500 mensajes por llamada)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=1000, help="Notificaciones tomadas por iteración")
+        parser.add_argument("--loop", action="store_true", help="Seguir corriendo y revisar el outbox periódicamente")
+        parser.add_argument("--intervalo", type=float, default=5.0, help="Segundos de espera cuando el outbox está vacío")
+
+    def handle(self, *args, **options):
+        while True:
+            # Dispositivos nuevos o con token rotado se suscriben al topic antes de enviar
+            sus = sincronizar_suscripciones()
+            if sus['suscritos'] or sus['desuscritos'] or sus['errores']:
+                self.stdout.write(
+                    f"✓ topic: suscritos={sus['suscritos']} desuscritos={sus['desuscritos']} errores={sus['errores']}"
+                )
+            stats = despachar_pendientes(lote=options["lote"])
+            procesadas = sum(stats.values())
+            if procesadas:
+                self.stdout.write(
+                    f"✓ enviadas={stats['enviadas']} reintentos={stats['reintentos']} "
+                    f"fallidas={stats['fallidas']} descartadas={stats['descartadas']}"
+                )
+            if not options["loop"]:
+                break
+            # Si el lote vino lleno puede haber más pendientes: seguir sin esperar
+            if procesadas < options["lote"]:
+                time.sleep(options["intervalo"])
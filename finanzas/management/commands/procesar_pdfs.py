@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+
+from finanzas.common.trabajos_pdf import procesar_pendientes
+
+
+class Command(BaseCommand):
+    help = "Procesa la cola de PDFs de contratos (render + subida a Cloudinary) con un pool de workers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Hilos que procesan trabajos en paralelo")
+        parser.add_argument("--loop", action="store_true", help="Seguir corriendo y revisar la cola periódicamente")
+        parser.add_argument("--intervalo", type=float, default=2.0, help="Segundos de espera cuando la cola está vacía")
+
+    def handle(self, *args, **options):
+        while True:
+            stats = procesar_pendientes(workers=options["workers"])
+            if stats['completados'] or stats['errores']:
+                self.stdout.write(f"✓ completados={stats['completados']} errores={stats['errores']}")
+            if not options["loop"]:
+                break
+            time.sleep(options["intervalo"])
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from finanzas.common.resumen_mensual import reconstruir_resumen
+
+
+class Command(BaseCommand):
+    help = "Reconstruye la tabla resumen_mensual (año, mes, bloque) a partir de expensa."
+
+    def handle(self, *args, **options):
+        filas = reconstruir_resumen()
+        self.stdout.write(self.style.SUCCESS(f"✓ resumen_mensual reconstruido: {filas} filas"))
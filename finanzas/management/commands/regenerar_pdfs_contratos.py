@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from finanzas.models import contrato
+from finanzas.common.regeneracion_pdf import regenerar_pdfs
+
+
+class Command(BaseCommand):
+    help = "Regenera en bloque los PDFs de contratos (render en procesos, subidas concurrentes a Cloudinary)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ids", nargs="+", type=int, help="Solo estos contratos")
+        parser.add_argument("--estado", choices=[c[0] for c in contrato.ESTADO_CHOICES], help="Solo contratos en este estado")
+        parser.add_argument("--procesos", type=int, default=4, help="Procesos que renderizan PDFs")
+        parser.add_argument("--subidas", type=int, default=8, help="Subidas simultáneas a Cloudinary")
+        parser.add_argument("--lote", type=int, default=200, help="Contratos por lote (bulk_update)")
+        parser.add_argument("--forzar", action="store_true", help="Regenerar aunque el PDF esté al día")
+
+    def handle(self, *args, **options):
+        queryset = contrato.objects.all()
+        if options["ids"]:
+            queryset = queryset.filter(id__in=options["ids"])
+        if options["estado"]:
+            queryset = queryset.filter(estado=options["estado"])
+
+        stats = regenerar_pdfs(
+            queryset,
+            procesos=options["procesos"],
+            subidas=options["subidas"],
+            lote=options["lote"],
+            forzar=options["forzar"],
+            progreso=lambda hechos, total: self.stdout.write(f"  {hechos}/{total} procesados"),
+        )
+
+        for contrato_id, error in sorted(stats["errores"].items()):
+            self.stderr.write(f"✗ Contrato {contrato_id}: {error}")
+        estilo = self.style.WARNING if stats["errores"] else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f"✓ {stats['actualizados']} PDFs regenerados, {stats['omitidos']} al día, "
+            f"{len(stats['errores'])} fallidos de {stats['total']} contratos "
+            f"en {stats['segundos']:.2f}s ({stats['por_segundo']} contratos/s)"
+        ))
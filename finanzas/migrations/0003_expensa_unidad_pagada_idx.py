@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas', '0002_initial'),
+        ('residencial', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expensa',
+            index=models.Index(fields=['unidad', 'pagada'], name='expensa_unidad_pagada_idx'),
+        ),
+    ]
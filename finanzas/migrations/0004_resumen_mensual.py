@@ -0,0 +1,66 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def poblar_resumen_mensual(apps, schema_editor):
+    expensa = apps.get_model('finanzas', 'expensa')
+    resumen_mensual = apps.get_model('finanzas', 'resumen_mensual')
+    filas = (
+        expensa.objects
+        .annotate(anio=ExtractYear('fecha_emision'), mes=ExtractMonth('fecha_emision'))
+        .values('anio', 'mes', 'unidad__bloque_id')
+        .annotate(
+            monto_pagado=Sum('monto', filter=Q(pagada=True)),
+            monto_pendiente=Sum('monto', filter=Q(pagada=False)),
+            cantidad_pagadas=Count('id', filter=Q(pagada=True)),
+            cantidad_pendientes=Count('id', filter=Q(pagada=False)),
+        )
+        .order_by()
+    )
+    resumen_mensual.objects.bulk_create([
+        resumen_mensual(
+            anio=f['anio'],
+            mes=f['mes'],
+            bloque_id=f['unidad__bloque_id'],
+            monto_pagado=f['monto_pagado'] or 0,
+            monto_pendiente=f['monto_pendiente'] or 0,
+            cantidad_pagadas=f['cantidad_pagadas'],
+            cantidad_pendientes=f['cantidad_pendientes'],
+        )
+        for f in filas
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas', '0003_expensa_unidad_pagada_idx'),
+        ('residencial', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='resumen_mensual',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('anio', models.PositiveIntegerField()),
+                ('mes', models.PositiveSmallIntegerField()),
+                ('monto_pagado', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('monto_pendiente', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cantidad_pagadas', models.PositiveIntegerField(default=0)),
+                ('cantidad_pendientes', models.PositiveIntegerField(default=0)),
+                ('bloque', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_mensuales', to='residencial.bloque')),
+            ],
+            options={
+                'verbose_name': 'Resumen Mensual',
+                'verbose_name_plural': 'Resúmenes Mensuales',
+                'db_table': 'resumen_mensual',
+                'unique_together': {('anio', 'mes', 'bloque')},
+            },
+        ),
+        migrations.RunPython(poblar_resumen_mensual, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas', '0005_expensa_pagada_venc_idx'),
+        ('residencial', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expensa',
+            name='periodo',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='expensa',
+            constraint=models.UniqueConstraint(fields=('unidad', 'periodo'), name='expensa_unidad_periodo_uniq'),
+        ),
+    ]
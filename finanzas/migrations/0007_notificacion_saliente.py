@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas', '0006_expensa_periodo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='notificacion_saliente',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(max_length=30)),
+                ('titulo', models.CharField(blank=True, default='', max_length=200)),
+                ('cuerpo', models.TextField(blank=True, default='')),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('estado', models.CharField(choices=[('P', 'Pendiente'), ('E', 'Enviada'), ('F', 'Fallida'), ('D', 'Descartada')], default='P', max_length=1)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('error', models.TextField(blank=True, default='')),
+                ('fecha_registro', models.DateTimeField(auto_now_add=True)),
+                ('fecha_envio', models.DateTimeField(blank=True, null=True)),
+                ('expensa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notificaciones_expensa', to='finanzas.expensa')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notificaciones_salientes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Notificación Saliente',
+                'verbose_name_plural': 'Notificaciones Salientes',
+                'db_table': 'notificacion_saliente',
+                'indexes': [models.Index(fields=['estado', 'proximo_intento'], name='notif_estado_proximo_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas', '0007_notificacion_saliente'),
+        migrations.swappable_dependency(settings.FCM_DJANGO_FCMDEVICE_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacion_saliente',
+            name='topic',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.CreateModel(
+            name='suscripcion_topic',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('topic', models.CharField(max_length=100)),
+                ('suscrito', models.BooleanField(default=False)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+                ('dispositivo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='suscripcion_topic', to=settings.FCM_DJANGO_FCMDEVICE_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Suscripción a Topic',
+                'verbose_name_plural': 'Suscripciones a Topics',
+                'db_table': 'suscripcion_topic',
+            },
+        ),
+    ]
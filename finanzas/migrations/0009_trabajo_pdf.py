@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas', '0008_suscripcion_topic'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='trabajo_pdf',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('estado', models.CharField(choices=[('P', 'Pendiente'), ('R', 'En proceso'), ('C', 'Completado'), ('E', 'Error')], default='P', max_length=1)),
+                ('pdf_url', models.URLField(blank=True, null=True)),
+                ('public_id', models.CharField(blank=True, default='', max_length=200)),
+                ('error', models.TextField(blank=True, default='')),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('fecha_registro', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('contrato', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos_pdf', to='finanzas.contrato')),
+            ],
+            options={
+                'verbose_name': 'Trabajo PDF',
+                'verbose_name_plural': 'Trabajos PDF',
+                'db_table': 'trabajo_pdf',
+                'indexes': [models.Index(fields=['estado', 'fecha_registro'], name='trabajo_pdf_estado_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('estado__in', ['P', 'R'])), fields=('contrato',), name='trabajo_pdf_activo_uniq')],
+            },
+        ),
+    ]
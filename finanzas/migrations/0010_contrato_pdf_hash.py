@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas', '0009_trabajo_pdf'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contrato',
+            name='contrato_PDF_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas', '0010_contrato_pdf_hash'),
+        ('residencial', '0002_objetoperdido_foto_opcional'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='trabajo_estado_cuenta',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('periodo', models.DateField()),
+                ('estado', models.CharField(choices=[('P', 'Pendiente'), ('R', 'En proceso'), ('C', 'Completado'), ('E', 'Error')], default='P', max_length=1)),
+                ('zip_url', models.URLField(blank=True, max_length=300, null=True)),
+                ('generados', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('fecha_registro', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('bloque', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='residencial.bloque')),
+                ('unidad', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='residencial.unidad')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos_estado_cuenta', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trabajo Estado de Cuenta',
+                'verbose_name_plural': 'Trabajos Estados de Cuenta',
+                'db_table': 'trabajo_estado_cuenta',
+                'indexes': [models.Index(fields=['estado', 'fecha_registro'], name='trabajo_ec_estado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas', '0011_trabajo_estado_cuenta'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificacion_saliente',
+            name='estado',
+            field=models.CharField(choices=[('P', 'Pendiente'), ('R', 'En proceso'), ('E', 'Enviada'), ('F', 'Fallida'), ('D', 'Descartada')], default='P', max_length=1),
+        ),
+    ]
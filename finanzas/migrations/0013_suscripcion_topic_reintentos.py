@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas', '0012_notificacion_en_proceso'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='suscripcion_topic',
+            name='error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='suscripcion_topic',
+            name='intentos',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='suscripcion_topic',
+            name='proximo_intento',
+            field=models.DateTimeField(blank=True, default=django.utils.timezone.now, null=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:02
+
+from django.db import migrations
+
+
+def completar_periodo(apps, schema_editor):
+    # Las expensas anteriores a `periodo` toman el mes de fecha_emision. Si una
+    # unidad tiene varias en el mismo mes, solo la más antigua queda como la
+    # expensa del periodo (las demás son cargos adicionales y quedan en NULL)
+    expensa = apps.get_model('finanzas', 'expensa')
+    ocupados = set(
+        expensa.objects.filter(periodo__isnull=False).values_list('unidad_id', 'periodo')
+    )
+    lote = []
+    for exp in (expensa.objects.filter(periodo__isnull=True, fecha_emision__isnull=False)
+                .only('id', 'unidad_id', 'fecha_emision').order_by('id').iterator(chunk_size=2000)):
+        clave = (exp.unidad_id, exp.fecha_emision.replace(day=1))
+        if clave in ocupados:
+            continue
+        ocupados.add(clave)
+        exp.periodo = clave[1]
+        lote.append(exp)
+        if len(lote) >= 1000:
+            expensa.objects.bulk_update(lote, ['periodo'])
+            lote = []
+    expensa.objects.bulk_update(lote, ['periodo'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas', '0013_suscripcion_topic_reintentos'),
+    ]
+
+    operations = [
+        migrations.RunPython(completar_periodo, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
+from django.contrib.auth.models import User
+from fcm_django.models import FCMDevice
 from administracion.models import Persona
-from residencial.modelsVehiculo import Unidad
+from residencial.modelsVehiculo import Unidad, Bloque
 from django.utils import timezone
 from datetime import timedelta
 
@@ -22,6 +24,8 @@ class contrato(models.Model):
     costo_compra = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     fecha_registro = models.DateTimeField(auto_now_add=True)
     contrato_PDF = models.URLField(max_length=200, blank=True, null=True)
+    # Hash (plantilla + campos usados) del contenido con que se generó contrato_PDF
+    contrato_PDF_hash = models.CharField(max_length=64, blank=True, default="")
     
     class Meta:
         db_table = 'contrato'
@@ -42,11 +46,19 @@ class expensa(models.Model):
     stripe_payment_intent_id = models.CharField(max_length=255, blank=True, null=True)
     currency = models.CharField(max_length=10, default="usd")
     descripcion = models.CharField(max_length=255, default="Expensa de condominio")
+    periodo = models.DateField(blank=True, null=True)  # primer día del mes facturado
 
     class Meta:
         db_table = 'expensa'
         verbose_name = "Expensa"
         verbose_name_plural = "Expensas"
+        constraints = [
+            models.UniqueConstraint(fields=['unidad', 'periodo'], name='expensa_unidad_periodo_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['unidad', 'pagada'], name='expensa_unidad_pagada_idx'),
+            models.Index(fields=['pagada', 'fecha_vencimiento'], name='expensa_pagada_venc_idx'),
+        ]
 
     def __str__(self):
         return f"Expensa {self.id} - Unidad: {self.unidad_id} - Monto: {self.monto}"
@@ -59,6 +71,14 @@ class expensa(models.Model):
         if not self.fecha_vencimiento:
             fecha_base = self.fecha_emision or timezone.now().date()
             self.fecha_vencimiento = fecha_base + timedelta(days=30)
+        if self.periodo:
+            self.periodo = self.periodo.replace(day=1)
+        elif self._state.adding:
+            # La primera expensa del mes de la unidad es la del periodo (así emitir_expensas
+            # no vuelve a facturarlo); las siguientes son cargos adicionales sin periodo
+            mes = (self.fecha_emision or timezone.now().date()).replace(day=1)
+            if not expensa.objects.filter(unidad_id=self.unidad_id, periodo=mes).exists():
+                self.periodo = mes
         super().save(*args, **kwargs)
 
 class multa(models.Model):
@@ -81,3 +101,170 @@ class multa(models.Model):
     def __str__(self):
         return f"Multa {self.id} - Expensa: {self.expensa.id} - Monto: {self.monto}"
 
+
+
+class resumen_mensual(models.Model):
+    """
+    Acumulado mensual de expensas por bloque (año, mes, bloque).
+    Se mantiene desde los signals de expensa y se reconstruye con
+    `python manage.py reconstruir_resumen_mensual`.
+    """
+    id = models.AutoField(primary_key=True)
+    anio = models.PositiveIntegerField()
+    mes = models.PositiveSmallIntegerField()
+    bloque = models.ForeignKey(Bloque, on_delete=models.CASCADE, related_name='resumenes_mensuales')
+    monto_pagado = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    monto_pendiente = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cantidad_pagadas = models.PositiveIntegerField(default=0)
+    cantidad_pendientes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'resumen_mensual'
+        verbose_name = "Resumen Mensual"
+        verbose_name_plural = "Resúmenes Mensuales"
+        unique_together = ['anio', 'mes', 'bloque']
+
+    def __str__(self):
+        return f"Resumen {self.mes}/{self.anio} - Bloque: {self.bloque_id}"
+
+
+class notificacion_saliente(models.Model):
+    """
+    Outbox de notificaciones push. Se escribe en la misma transacción que el
+    cambio que la origina y la despacha `python manage.py procesar_notificaciones`.
+    """
+    ESTADO_CHOICES = [
+        ('P', 'Pendiente'),
+        ('R', 'En proceso'),  # tomada por un worker hasta `proximo_intento`
+        ('E', 'Enviada'),
+        ('F', 'Fallida'),
+        ('D', 'Descartada'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    tipo = models.CharField(max_length=30)
+    expensa = models.ForeignKey(expensa, on_delete=models.CASCADE, null=True, blank=True, related_name='notificaciones_expensa')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='notificaciones_salientes')
+    topic = models.CharField(max_length=100, blank=True, default="")  # difusión a un topic de FCM en vez de a un usuario
+    titulo = models.CharField(max_length=200, blank=True, default="")
+    cuerpo = models.TextField(blank=True, default="")
+    data = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=1, choices=ESTADO_CHOICES, default='P')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    error = models.TextField(blank=True, default="")
+    fecha_registro = models.DateTimeField(auto_now_add=True)
+    fecha_envio = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'notificacion_saliente'
+        verbose_name = "Notificación Saliente"
+        verbose_name_plural = "Notificaciones Salientes"
+        indexes = [
+            models.Index(fields=['estado', 'proximo_intento'], name='notif_estado_proximo_idx'),
+        ]
+
+    def __str__(self):
+        return f"Notificación {self.id} - {self.tipo} ({self.get_estado_display()})"
+
+
+class suscripcion_topic(models.Model):
+    """
+    Estado de la suscripción de cada dispositivo al topic del condominio.
+    La sincroniza en bloque `python manage.py procesar_notificaciones`.
+    """
+    id = models.AutoField(primary_key=True)
+    dispositivo = models.OneToOneField(FCMDevice, on_delete=models.CASCADE, related_name='suscripcion_topic')
+    topic = models.CharField(max_length=100)
+    suscrito = models.BooleanField(default=False)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    # null = no se reintenta más (token inválido o MAX_INTENTOS agotados)
+    proximo_intento = models.DateTimeField(default=timezone.now, null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'suscripcion_topic'
+        verbose_name = "Suscripción a Topic"
+        verbose_name_plural = "Suscripciones a Topics"
+
+    def __str__(self):
+        return f"Dispositivo {self.dispositivo_id} - {self.topic} ({'suscrito' if self.suscrito else 'pendiente'})"
+
+
+class trabajo_pdf(models.Model):
+    """
+    Generación asíncrona del PDF de un contrato. La vista solo encola; el
+    render y la subida a Cloudinary los hace `python manage.py procesar_pdfs`.
+    """
+    ESTADO_CHOICES = [
+        ('P', 'Pendiente'),
+        ('R', 'En proceso'),
+        ('C', 'Completado'),
+        ('E', 'Error'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    contrato = models.ForeignKey(contrato, on_delete=models.CASCADE, related_name='trabajos_pdf')
+    estado = models.CharField(max_length=1, choices=ESTADO_CHOICES, default='P')
+    pdf_url = models.URLField(max_length=200, blank=True, null=True)
+    public_id = models.CharField(max_length=200, blank=True, default="")
+    error = models.TextField(blank=True, default="")
+    intentos = models.PositiveSmallIntegerField(default=0)
+    fecha_registro = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'trabajo_pdf'
+        verbose_name = "Trabajo PDF"
+        verbose_name_plural = "Trabajos PDF"
+        constraints = [
+            # Un solo trabajo activo por contrato: los pedidos concurrentes se unen a él
+            models.UniqueConstraint(
+                fields=['contrato'],
+                condition=models.Q(estado__in=['P', 'R']),
+                name='trabajo_pdf_activo_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['estado', 'fecha_registro'], name='trabajo_pdf_estado_idx'),
+        ]
+
+    def __str__(self):
+        return f"Trabajo PDF {self.id} - Contrato {self.contrato_id} ({self.get_estado_display()})"
+
+
+class trabajo_estado_cuenta(models.Model):
+    """
+    Generación asíncrona del ZIP de estados de cuenta de un periodo. La vista
+    solo encola; el render y la subida a Cloudinary los hace
+    `python manage.py procesar_estados_cuenta`.
+    """
+    ESTADO_CHOICES = trabajo_pdf.ESTADO_CHOICES
+
+    id = models.BigAutoField(primary_key=True)
+    periodo = models.DateField()
+    bloque = models.ForeignKey(Bloque, on_delete=models.CASCADE, null=True, blank=True)
+    unidad = models.ForeignKey(Unidad, on_delete=models.CASCADE, null=True, blank=True)
+    # Quien lo pidió: si no es administrador solo se incluyen sus unidades
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='trabajos_estado_cuenta')
+    estado = models.CharField(max_length=1, choices=ESTADO_CHOICES, default='P')
+    zip_url = models.URLField(max_length=300, blank=True, null=True)
+    generados = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    intentos = models.PositiveSmallIntegerField(default=0)
+    fecha_registro = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'trabajo_estado_cuenta'
+        verbose_name = "Trabajo Estado de Cuenta"
+        verbose_name_plural = "Trabajos Estados de Cuenta"
+        indexes = [
+            models.Index(fields=['estado', 'fecha_registro'], name='trabajo_ec_estado_idx'),
+        ]
+
+    def __str__(self):
+        return f"Estados de cuenta {self.periodo:%Y-%m} ({self.get_estado_display()})"
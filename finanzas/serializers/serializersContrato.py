@@ -4,6 +4,7 @@ from ..models import contrato
 
 class ContratoSerializer(serializers.ModelSerializer):
     contrato_PDF = serializers.CharField(read_only=True)
+    contrato_PDF_hash = serializers.CharField(read_only=True)
     estado_display = serializers.CharField(source='get_estado_display', read_only=True)
     propietario_nombre = serializers.CharField(source='propietario.nombre', read_only=True)
     propietario_apellido = serializers.CharField(source='propietario.apellido', read_only=True)
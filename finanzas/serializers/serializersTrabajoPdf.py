@@ -0,0 +1,10 @@
+from rest_framework import serializers
+from ..models import trabajo_pdf
+
+class TrabajoPdfSerializer(serializers.ModelSerializer):
+    estado_display = serializers.CharField(source='get_estado_display', read_only=True)
+
+    class Meta:
+        model = trabajo_pdf
+        fields = '__all__'
+        read_only_fields = [f.name for f in trabajo_pdf._meta.fields]
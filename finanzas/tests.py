@@ -1,3 +1,672 @@
+from datetime import date, timedelta
+from importlib import import_module
+from decimal import Decimal
+import os
+import tempfile
+import zipfile
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from administracion.models import Persona
+from residencial.models import ObjetoPerdido
+from residencial.modelsVehiculo import Bloque, Unidad
+from .models import contrato, expensa, multa, resumen_mensual, notificacion_saliente, suscripcion_topic, trabajo_pdf
+from .common.cache_dashboard import incrementar_version, version_datos
+from .common.dashboard import resumen_financiero
+from .common.resumen_mensual import actualizar_pagadas, reconstruir_resumen
+from .common.antiguedad import antiguedad_saldos
+from .common.notificaciones import despachar_pendientes, marcar_para_suscripcion, sincronizar_suscripciones
+from .common.trabajos_pdf import procesar_pendientes
+from .common.emision import emitir_expensas, parsear_periodo
+from .common.estados_cuenta import contextos_estados_cuenta
+from fcm_django.models import FCMDevice
+
+
+def crear_datos_finanzas():
+    cache.clear()
+    bloque = Bloque.objects.create(nombre="A", direccion="Calle 1")
+    u1 = Unidad.objects.create(numero="101", codigo="A-101", bloque=bloque, estado='O')
+    u2 = Unidad.objects.create(numero="102", codigo="A-102", bloque=bloque, estado='D')
+    prop = Persona.objects.create(
+        nombre="Juan", apellido="Perez", sexo='M', tipo='P',
+        CI="100", fecha_nacimiento=date(1990, 1, 1),
+    )
+    contrato.objects.create(propietario=prop, unidad=u1, fecha_contrato=date(2024, 1, 1), estado='A')
+    expensa.objects.create(unidad=u1, monto=Decimal('100.00'), pagada=True)
+    expensa.objects.create(unidad=u1, monto=Decimal('50.00'), pagada=False)
+    expensa.objects.create(unidad=u2, monto=Decimal('25.00'), pagada=False)
+    return bloque, u1, u2, prop
+
+
+class DashboardResumenTests(TestCase):
+    def setUp(self):
+        crear_datos_finanzas()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("admin", password="x"))
+
+    def test_resumen_financiero_una_consulta_por_tabla(self):
+        # expensa + contrato + unidad
+        with self.assertNumQueries(3):
+            data = resumen_financiero()
+
+        self.assertEqual(data['total_expensas'], 3)
+        self.assertEqual(data['expensas_pagadas'], 1)
+        self.assertEqual(data['expensas_pendientes'], 2)
+        self.assertEqual(data['monto_total_recaudado'], 100.0)
+        self.assertEqual(data['monto_pendiente'], 75.0)
+        self.assertEqual(data['contratos_activos'], 1)
+        self.assertEqual(data['unidades_ocupadas'], 1)
+        self.assertEqual(data['unidades_disponibles'], 1)
+
+    def test_endpoints_resumen_y_estado(self):
+        with self.assertNumQueries(3):
+            r = self.client.get('/api/resumen/')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data['resumen']['porcentaje_pagado'], 33.33)
+
+        with self.assertNumQueries(1):
+            r = self.client.get('/api/grafico-expensas/')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data['datasets'][0]['data'], [1, 2])
+        self.assertEqual(r.data['montos']['total'], 175.0)
+
+
+class RankingMorososTests(TestCase):
+    def setUp(self):
+        bloque, u1, u2, prop = crear_datos_finanzas()
+        prop2 = Persona.objects.create(
+            nombre="Ana", apellido="Lopez", sexo='F', tipo='P',
+            CI="200", fecha_nacimiento=date(1991, 1, 1),
+        )
+        contrato.objects.create(propietario=prop2, unidad=u2, fecha_contrato=date(2024, 1, 1), estado='A')
+        expensa.objects.create(unidad=u2, monto=Decimal('80.00'), pagada=False)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("admin", password="x"))
+
+    def test_ranking_en_dos_consultas_y_paginado(self):
+        with self.assertNumQueries(2):
+            r = self.client.get('/api/grafico-morosos/', {'limite': 1})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data['labels'], ['Ana Lopez'])
+        self.assertEqual(r.data['detalles'][0]['monto_pendiente'], 105.0)
+        self.assertEqual(r.data['detalles'][0]['cantidad_pendiente'], 2)
+        self.assertEqual(r.data['estadisticas']['total_morosos'], 2)
+        self.assertEqual(r.data['estadisticas']['deuda_total'], 155.0)
+        self.assertEqual(r.data['paginacion']['siguiente_offset'], 1)
+
+        r = self.client.get('/api/grafico-morosos/', {'limite': 1, 'offset': 1})
+        self.assertEqual(r.data['labels'], ['Juan Perez'])
+        self.assertEqual(r.data['detalles'][0]['posicion'], 2)
+        self.assertIsNone(r.data['paginacion']['siguiente_offset'])
+
+    def test_ranking_por_cursor_keyset(self):
+        r = self.client.get('/api/grafico-morosos/', {'limite': 1})
+        cursor = r.data['paginacion']['siguiente']
+        self.assertEqual(Decimal(cursor['after_monto']), Decimal('105'))
+
+        with self.assertNumQueries(2):
+            r = self.client.get('/api/grafico-morosos/', {'limite': 1, **cursor})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data['labels'], ['Juan Perez'])
+        self.assertEqual(r.data['detalles'][0]['posicion'], 2)
+        self.assertEqual(r.data['estadisticas']['total_morosos'], 2)
+        self.assertIsNone(r.data['paginacion']['siguiente'])
+
+        r = self.client.get('/api/grafico-morosos/', {'after_monto': '10'})
+        self.assertEqual(r.status_code, 400)
+        r = self.client.get('/api/grafico-morosos/', {'after_monto': 'x', 'after_id': '1'})
+        self.assertEqual(r.status_code, 400)
+
+
+class ResumenMensualTests(TestCase):
+    def setUp(self):
+        self.bloque, self.u1, self.u2, self.prop = crear_datos_finanzas()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("admin", password="x"))
+
+    def test_resumen_se_mantiene_en_save_delete_y_pago(self):
+        hoy = date.today()
+        celda = resumen_mensual.objects.get(anio=hoy.year, mes=hoy.month, bloque=self.bloque)
+        self.assertEqual(celda.monto_pagado, Decimal('100.00'))
+        self.assertEqual(celda.cantidad_pendientes, 2)
+
+        pendiente = expensa.objects.filter(pagada=False, unidad=self.u1).first()
+        actualizar_pagadas(expensa.objects.filter(pk=pendiente.pk))
+        celda.refresh_from_db()
+        self.assertEqual(celda.monto_pagado, Decimal('150.00'))
+        self.assertEqual(celda.cantidad_pendientes, 1)
+
+        expensa.objects.filter(pagada=False).get().delete()
+        celda.refresh_from_db()
+        self.assertEqual(celda.cantidad_pendientes, 0)
+
+        resumen_mensual.objects.all().delete()
+        self.assertEqual(reconstruir_resumen(), 1)
+
+    def test_update_fields_sin_unidad_ni_fecha_no_consulta_la_celda_anterior(self):
+        hoy = date.today()
+        pendiente = expensa.objects.filter(pagada=False, unidad=self.u1).first()
+        pendiente.pagada = True
+        with mock.patch('finanzas.signals.celdas_de_expensas') as anteriores:
+            pendiente.save(update_fields=['pagada'])
+        anteriores.assert_not_called()
+        self.assertEqual(resumen_mensual.objects.get(anio=hoy.year, mes=hoy.month).monto_pagado, Decimal('150.00'))
+
+        # Mover la expensa a otro bloque sí recalcula la celda anterior
+        otro = Bloque.objects.create(nombre="B", direccion="Calle 2")
+        pendiente.unidad = Unidad.objects.create(numero="201", codigo="B-201", bloque=otro)
+        pendiente.save(update_fields=['unidad'])
+        self.assertEqual(resumen_mensual.objects.get(bloque=self.bloque).monto_pagado, Decimal('100.00'))
+        self.assertEqual(resumen_mensual.objects.get(bloque=otro).monto_pagado, Decimal('50.00'))
+
+    def test_graficos_leen_del_resumen(self):
+        hoy = date.today()
+        with self.assertNumQueries(1):
+            r = self.client.get('/api/grafico-ingresos/', {'año': hoy.year})
+        self.assertEqual(r.data['datasets'][0]['data'][hoy.month - 1], 100.0)
+
+        with self.assertNumQueries(1):
+            r = self.client.get('/api/grafico-comparativo/')
+        self.assertEqual(r.data['datasets'][-1]['data'][hoy.month - 1], 100.0)
+
+
+class CacheDashboardTests(TestCase):
+    def setUp(self):
+        self.bloque, self.u1, self.u2, self.prop = crear_datos_finanzas()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("admin", password="x"))
+
+    def test_lecturas_sin_escrituras_no_tocan_la_base(self):
+        self.client.get('/api/resumen/')
+        with self.assertNumQueries(0):
+            r = self.client.get('/api/resumen/')
+        self.assertEqual(r.data['resumen']['total_expensas'], 3)
+
+    def test_escrituras_invalidan_incluso_update(self):
+        self.client.get('/api/grafico-expensas/')
+        with self.captureOnCommitCallbacks(execute=True):
+            expensa.objects.create(unidad=self.u2, monto=Decimal('10.00'))
+        r = self.client.get('/api/grafico-expensas/')
+        self.assertEqual(r.data['datasets'][0]['data'], [1, 3])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            actualizar_pagadas(expensa.objects.filter(pagada=False))
+        r = self.client.get('/api/grafico-expensas/')
+        self.assertEqual(r.data['datasets'][0]['data'], [4, 0])
+
+    def test_version_cambia_recien_al_confirmar(self):
+        version = version_datos()
+        with self.captureOnCommitCallbacks(execute=True):
+            expensa.objects.create(unidad=self.u2, monto=Decimal('10.00'))
+            # Dentro de la transacción nadie debe ver la versión nueva
+            self.assertEqual(version_datos(), version)
+        self.assertEqual(version_datos(), version + 1)
+
+    def test_parametros_forman_parte_de_la_clave(self):
+        r1 = self.client.get('/api/grafico-morosos/', {'limite': 1})
+        r2 = self.client.get('/api/grafico-morosos/', {'limite': 5})
+        self.assertEqual(r1.data['paginacion']['limite'], 1)
+        self.assertEqual(r2.data['paginacion']['limite'], 5)
+
+
+class DashboardTodoTests(TestCase):
+    def setUp(self):
+        crear_datos_finanzas()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("admin", password="x"))
+
+    def test_bundle_con_consultas_compartidas_y_etag(self):
+        # expensa + contrato + unidad + resumen_mensual + morosos (2)
+        with self.assertNumQueries(6):
+            r = self.client.get('/api/dashboard/')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data['resumen']['resumen']['total_expensas'], 3)
+        self.assertEqual(r.data['grafico_expensas']['datasets'][0]['data'], [1, 2])
+        self.assertEqual(len(r.data['grafico_comparativo']['datasets']), 4)
+        etag = r['ETag']
+
+        with self.assertNumQueries(0):
+            r = self.client.get('/api/dashboard/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+
+        # Lista separada por comas, prefijo W/ y comodín
+        for valor in (f'"otro", {etag}', f'W/{etag}', '*'):
+            r = self.client.get('/api/dashboard/', HTTP_IF_NONE_MATCH=valor)
+            self.assertEqual(r.status_code, 304, valor)
+        r = self.client.get('/api/dashboard/', HTTP_IF_NONE_MATCH=etag[:-2] + '"')
+        self.assertEqual(r.status_code, 200)
+
+        # Otro proceso (cache vacío, otra versión) calcula el mismo ETag
+        cache.clear()
+        incrementar_version()
+        r = self.client.get('/api/dashboard/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            expensa.objects.create(unidad=Unidad.objects.first(), monto=Decimal('5.00'))
+        r = self.client.get('/api/dashboard/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r['ETag'], etag)
+
+
+class AntiguedadSaldosTests(TestCase):
+    def setUp(self):
+        self.bloque, self.u1, self.u2, self.prop = crear_datos_finanzas()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("admin", password="x"))
+
+    def test_tramos_en_una_consulta(self):
+        hoy = date.today()
+        expensa.objects.filter(unidad=self.u1, pagada=False).update(fecha_vencimiento=hoy - timedelta(days=45))
+        expensa.objects.create(unidad=self.u1, monto=Decimal('10.00'), fecha_vencimiento=hoy - timedelta(days=120))
+
+        with self.assertNumQueries(1):
+            filas = antiguedad_saldos('bloque', hoy=hoy)
+        self.assertEqual(len(filas), 1)
+        self.assertEqual(filas[0]['corriente'], 25.0)
+        self.assertEqual(filas[0]['d31_60'], 50.0)
+        self.assertEqual(filas[0]['d90_mas'], 10.0)
+        self.assertEqual(filas[0]['total'], 85.0)
+
+        # u2 no tiene contrato activo: solo aparece el propietario de u1
+        filas = antiguedad_saldos('propietario', hoy=hoy)
+        self.assertEqual([f['nombre'] for f in filas], ['Juan Perez'])
+        self.assertEqual(filas[0]['total'], 60.0)
+
+    def test_unidad_con_dos_contratos_activos_no_se_duplica(self):
+        otro = Persona.objects.create(
+            nombre="Ana", apellido="Lopez", sexo='F', tipo='P',
+            CI="200", fecha_nacimiento=date(1991, 1, 1),
+        )
+        contrato.objects.create(propietario=otro, unidad=self.u1, fecha_contrato=date(2025, 1, 1), estado='A')
+
+        with self.assertNumQueries(2):
+            filas = antiguedad_saldos('propietario')
+        # Las expensas de u1 se cuentan una vez, para el contrato activo más antiguo
+        self.assertEqual([(f['nombre'], f['total']) for f in filas], [('Juan Perez', 50.0)])
+
+    def test_endpoint_valida_agrupacion(self):
+        r = self.client.get('/api/reporte-antiguedad/', {'agrupar': 'x'})
+        self.assertEqual(r.status_code, 400)
+        r = self.client.get('/api/reporte-antiguedad/')
+        self.assertEqual(r.data['totales']['total'], 75.0)
+
+
+class EmitirExpensasTests(TestCase):
+    def setUp(self):
+        self.bloque, self.u1, self.u2, self.prop = crear_datos_finanzas()
+        contrato.objects.filter(unidad=self.u1).update(cuota_mensual=Decimal('300.00'))
+
+    def test_emision_idempotente_y_mantiene_resumen(self):
+        call_command('emitir_expensas', periodo='2030-01', sin_notificar=True, stdout=StringIO())
+        call_command('emitir_expensas', periodo='2030-01', sin_notificar=True, stdout=StringIO())
+
+        emitidas = expensa.objects.filter(periodo=date(2030, 1, 1))
+        self.assertEqual(emitidas.count(), 1)
+        self.assertEqual(emitidas.get().monto, Decimal('300.00'))
+
+        hoy = date.today()
+        celda = resumen_mensual.objects.get(anio=hoy.year, mes=hoy.month, bloque=self.bloque)
+        self.assertEqual(celda.cantidad_pendientes, 3)
+
+    def test_periodo_invalido(self):
+        with self.assertRaises(CommandError):
+            call_command('emitir_expensas', periodo='2030/01', stdout=StringIO())
+
+    def test_mes_ya_facturado_por_la_api_no_se_factura_de_nuevo(self):
+        # Las expensas de crear_datos_finanzas son del mes actual: la primera de cada unidad tiene periodo
+        mes = date.today().replace(day=1)
+        self.assertEqual(expensa.objects.filter(periodo=mes).count(), 2)
+        self.assertEqual(emitir_expensas(mes, notificar=False), [])
+
+    def test_backfill_de_periodo_desde_fecha_emision(self):
+        expensa.objects.update(periodo=None)
+        migracion = import_module('finanzas.migrations.0014_expensa_periodo_desde_fecha_emision')
+        migracion.completar_periodo(django_apps, None)
+        mes = date.today().replace(day=1)
+        # Una por unidad y mes; el segundo cargo del mes de u1 queda sin periodo
+        self.assertEqual(
+            list(expensa.objects.values_list('unidad_id', 'periodo').order_by('id')),
+            [(self.u1.id, mes), (self.u1.id, None), (self.u2.id, mes)],
+        )
+
+    def test_solo_encola_y_cuenta_lo_insertado_por_esta_corrida(self):
+        periodo = date(2030, 2, 1)
+        otra_unidad = Unidad.objects.create(numero="103", codigo="A-103", bloque=self.bloque)
+        contrato.objects.create(propietario=self.prop, unidad=otra_unidad, fecha_contrato=date(2024, 1, 1), estado='A')
+        concurrente = []
+
+        def monto(cont):
+            # Otra corrida factura u1 después de la lectura inicial de ya emitidas
+            if cont.unidad_id == self.u1.id and not concurrente:
+                concurrente.append(expensa.objects.create(unidad=self.u1, monto=Decimal('1.00'), periodo=periodo))
+            return Decimal('10.00')
+
+        notificacion_saliente.objects.all().delete()
+        with mock.patch('finanzas.common.emision.monto_expensa', side_effect=monto):
+            ids = emitir_expensas(periodo)
+        self.assertEqual(list(expensa.objects.filter(id__in=ids).values_list('unidad_id', flat=True)), [otra_unidad.id])
+        self.assertEqual(
+            list(notificacion_saliente.objects.filter(expensa__periodo=periodo).values_list('expensa_id', flat=True)),
+            [concurrente[0].id] + ids,  # la de la otra corrida la encoló su propio signal
+        )
+
+
+class OutboxNotificacionesTests(TestCase):
+    def setUp(self):
+        self.bloque, self.u1, self.u2, self.prop = crear_datos_finanzas()
+        self.user = User.objects.create_user("juan", password="x")
+        self.prop.user = self.user
+        self.prop.save()
+        FCMDevice.objects.create(user=self.user, registration_id="tok-1", type="android")
+        FCMDevice.objects.create(user=self.user, registration_id="tok-2", type="android")
+
+    def _respuesta(self, *exitos):
+        return SimpleNamespace(responses=[SimpleNamespace(success=e, exception=None if e else Exception("x")) for e in exitos])
+
+    def test_expensa_nueva_solo_escribe_en_outbox(self):
+        with mock.patch('finanzas.common.notificaciones.messaging.send_each') as send_each:
+            expensa.objects.create(unidad=self.u1, monto=Decimal('10.00'))
+        send_each.assert_not_called()
+        # 3 de crear_datos_finanzas + la nueva
+        self.assertEqual(notificacion_saliente.objects.filter(estado='P').count(), 4)
+
+    def test_despacho_agrupa_por_usuario_y_descarta_sin_destinatario(self):
+        with mock.patch('finanzas.common.notificaciones.messaging.send_each', return_value=self._respuesta(True, True)) as send_each:
+            stats = despachar_pendientes()
+        # un solo mensaje agrupado para las 2 expensas de u1, uno por token
+        self.assertEqual(send_each.call_count, 1)
+        self.assertEqual(len(send_each.call_args[0][0]), 2)
+        self.assertEqual(stats['enviadas'], 2)
+        # u2 no tiene contrato activo
+        self.assertEqual(stats['descartadas'], 1)
+
+    def test_fallo_se_reintenta_con_backoff(self):
+        with mock.patch('finanzas.common.notificaciones.messaging.send_each', side_effect=Exception("sin red")):
+            stats = despachar_pendientes()
+        self.assertEqual(stats['reintentos'], 2)
+        n = notificacion_saliente.objects.filter(estado='P').first()
+        self.assertEqual(n.intentos, 1)
+        self.assertGreater(n.proximo_intento, n.fecha_registro)
+        # no vuelve a tomarse hasta que pase el backoff
+        self.assertEqual(sum(despachar_pendientes().values()), 0)
+
+    def test_envio_fuera_de_la_transaccion_con_lease(self):
+        def enviar(mensajes):
+            # Las filas ya están tomadas ('R'): otro worker no las reenvía
+            self.assertEqual(notificacion_saliente.objects.filter(estado='R').count(), 3)
+            self.assertEqual(sum(despachar_pendientes().values()), 0)
+            return self._respuesta(*[True] * len(mensajes))
+
+        with mock.patch('finanzas.common.notificaciones.messaging.send_each', side_effect=enviar):
+            stats = despachar_pendientes()
+        self.assertEqual((stats['enviadas'], stats['descartadas']), (2, 1))
+        self.assertFalse(notificacion_saliente.objects.filter(estado='R').exists())
+
+    def test_lote_abandonado_se_retoma_tras_el_timeout(self):
+        notificacion_saliente.objects.update(estado='R', proximo_intento=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(sum(despachar_pendientes().values()), 0)
+        notificacion_saliente.objects.update(proximo_intento=timezone.now() - timedelta(seconds=1))
+        with mock.patch('finanzas.common.notificaciones.messaging.send_each', return_value=self._respuesta(True, True)):
+            self.assertEqual(despachar_pendientes()['enviadas'], 2)
+
+
+class DifusionTopicTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("ana", password="x")
+        self.d1 = FCMDevice.objects.create(user=self.user, registration_id="tok-a", type="android")
+        self.d2 = FCMDevice.objects.create(user=self.user, registration_id="tok-b", type="android")
+
+    def test_objeto_perdido_encola_un_solo_mensaje_al_topic(self):
+        with mock.patch('finanzas.common.notificaciones.messaging.send_each') as send_each:
+            obj = ObjetoPerdido.objects.create(titulo="Llaves", foto="https://x/y.jpg")
+        send_each.assert_not_called()
+        n = notificacion_saliente.objects.get(tipo='objeto_perdido')
+        self.assertEqual(n.topic, 'condominio')
+        self.assertEqual(n.data['objeto_id'], str(obj.id))
+
+        respuesta = SimpleNamespace(responses=[SimpleNamespace(success=True, exception=None)])
+        with mock.patch('finanzas.common.notificaciones.messaging.send_each', return_value=respuesta) as send_each:
+            stats = despachar_pendientes()
+        mensajes = send_each.call_args[0][0]
+        self.assertEqual(len(mensajes), 1)
+        self.assertEqual(mensajes[0].topic, 'condominio')
+        self.assertEqual(stats['enviadas'], 1)
+
+    def test_sincronizar_suscribe_en_bloque_y_respeta_errores(self):
+        respuesta = SimpleNamespace(errors=[SimpleNamespace(index=1, reason='INTERNAL')])
+        with mock.patch('finanzas.common.notificaciones.messaging.subscribe_to_topic', return_value=respuesta) as sub:
+            stats = sincronizar_suscripciones()
+        sub.assert_called_once_with(["tok-a", "tok-b"], 'condominio')
+        self.assertEqual(stats['suscritos'], 1)
+        self.assertTrue(suscripcion_topic.objects.get(dispositivo=self.d1).suscrito)
+        fallida = suscripcion_topic.objects.get(dispositivo=self.d2)
+        self.assertEqual((fallida.suscrito, fallida.intentos, fallida.error), (False, 1, 'INTERNAL'))
+        self.assertGreater(fallida.proximo_intento, timezone.now())
+
+        # el ya suscrito no se vuelve a enviar, el fallido espera el backoff y el inactivo se desuscribe
+        self.d1.active = False
+        self.d1.save()
+        with mock.patch('finanzas.common.notificaciones.messaging.subscribe_to_topic') as sub, \
+                mock.patch('finanzas.common.notificaciones.messaging.unsubscribe_from_topic') as unsub:
+            stats = sincronizar_suscripciones()
+        sub.assert_not_called()
+        unsub.assert_called_once_with(["tok-a"], 'condominio')
+        self.assertEqual(stats['desuscritos'], 1)
+        self.assertFalse(suscripcion_topic.objects.get(dispositivo=self.d1).suscrito)
+
+        suscripcion_topic.objects.filter(dispositivo=self.d2).update(proximo_intento=timezone.now())
+        with mock.patch('finanzas.common.notificaciones.messaging.subscribe_to_topic', return_value=SimpleNamespace(errors=[])) as sub:
+            sincronizar_suscripciones()
+        sub.assert_called_once_with(["tok-b"], 'condominio')
+        self.assertEqual(suscripcion_topic.objects.get(dispositivo=self.d2).intentos, 0)
+
+    def test_token_invalido_desactiva_y_transitorio_se_agota(self):
+        respuesta = SimpleNamespace(errors=[SimpleNamespace(index=0, reason='NOT_FOUND'),
+                                            SimpleNamespace(index=1, reason='INTERNAL')])
+        with mock.patch('finanzas.common.notificaciones.messaging.subscribe_to_topic', return_value=respuesta):
+            sincronizar_suscripciones()
+        self.d1.refresh_from_db()
+        self.assertFalse(self.d1.active)
+        self.assertIsNone(suscripcion_topic.objects.get(dispositivo=self.d1).proximo_intento)
+
+        with mock.patch('finanzas.common.notificaciones.messaging.subscribe_to_topic',
+                        side_effect=Exception("sin red")) as sub:
+            for _ in range(10):
+                suscripcion_topic.objects.filter(proximo_intento__isnull=False).update(proximo_intento=timezone.now())
+                sincronizar_suscripciones()
+        # 4 reintentos más y deja de intentar; nunca vuelve a tocar el token inválido
+        self.assertEqual(sub.call_count, 4)
+        self.assertTrue(all(c.args[0] == ["tok-b"] for c in sub.call_args_list))
+        fallida = suscripcion_topic.objects.get(dispositivo=self.d2)
+        self.assertEqual((fallida.intentos, fallida.proximo_intento), (5, None))
+
+        # Al volver a registrar el token se reintenta desde cero
+        marcar_para_suscripcion(self.d2)
+        with mock.patch('finanzas.common.notificaciones.messaging.subscribe_to_topic', return_value=SimpleNamespace(errors=[])) as sub:
+            sincronizar_suscripciones()
+        sub.assert_called_once_with(["tok-b"], 'condominio')
+
+
+class TrabajosPdfTests(TestCase):
+    def setUp(self):
+        crear_datos_finanzas()
+        self.contrato = contrato.objects.get()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("admin", password="x"))
+
+    def test_post_encola_y_coalesce_pedidos_concurrentes(self):
+        with mock.patch('finanzas.common.trabajos_pdf.cloudinary.uploader.upload') as upload:
+            r1 = self.client.post(f'/api/contratos/{self.contrato.id}/generar_pdf/')
+            r2 = self.client.post(f'/api/contratos/{self.contrato.id}/generar_pdf/')
+        upload.assert_not_called()
+        self.assertEqual(r1.status_code, 202)
+        self.assertTrue(r1.data['nuevo'])
+        self.assertFalse(r2.data['nuevo'])
+        self.assertEqual(r1.data['trabajo_id'], r2.data['trabajo_id'])
+        self.assertEqual(trabajo_pdf.objects.count(), 1)
+
+    def test_worker_genera_sube_y_get_devuelve_url(self):
+        r = self.client.post(f'/api/contratos/{self.contrato.id}/generar_pdf/')
+        resultado = {'secure_url': 'https://res.cloudinary.com/x/contrato.pdf', 'public_id': 'contratos/contrato-1'}
+        with mock.patch('finanzas.common.trabajos_pdf.render_pdf_from_template', return_value=b'%PDF') as render, \
+                mock.patch('finanzas.common.trabajos_pdf.cloudinary.uploader.upload', return_value=resultado):
+            stats = procesar_pendientes(workers=1)
+        render.assert_called_once()
+        self.assertEqual(stats, {'completados': 1, 'errores': 0})
+
+        r = self.client.get(f"/api/trabajos-pdf/{r.data['trabajo_id']}/")
+        self.assertEqual(r.data['estado'], 'C')
+        self.assertEqual(r.data['pdf_url'], resultado['secure_url'])
+        self.contrato.refresh_from_db()
+        self.assertEqual(self.contrato.contrato_PDF, resultado['secure_url'])
+
+        # sin cambios en el contrato: se devuelve el PDF subido sin render ni Cloudinary
+        with mock.patch('finanzas.common.trabajos_pdf.render_pdf_from_template') as render, \
+                mock.patch('finanzas.common.trabajos_pdf.cloudinary.uploader.upload') as upload:
+            r = self.client.post(f'/api/contratos/{self.contrato.id}/generar_pdf/')
+        render.assert_not_called()
+        upload.assert_not_called()
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data['pdf_url'], resultado['secure_url'])
+
+        # un cambio en un campo del PDF invalida el hash y crea otro trabajo
+        self.contrato.cuota_mensual = Decimal('999.00')
+        self.contrato.save()
+        r = self.client.post(f'/api/contratos/{self.contrato.id}/generar_pdf/')
+        self.assertEqual(r.status_code, 202)
+        self.assertTrue(r.data['nuevo'])
+
+        r = self.client.get('/api/trabajos-pdf/estadisticas-cache/')
+        self.assertEqual(r.data, {'hits': 1, 'misses': 2, 'hit_rate': 33.33})
+
+    def test_error_se_reintenta_y_luego_queda_en_error(self):
+        self.client.post(f'/api/contratos/{self.contrato.id}/generar_pdf/')
+        with mock.patch('finanzas.common.trabajos_pdf.render_pdf_from_template', side_effect=ValueError("xhtml2pdf")):
+            stats = procesar_pendientes(workers=1)
+        self.assertEqual(stats['errores'], 3)
+        trabajo = trabajo_pdf.objects.get()
+        self.assertEqual(trabajo.estado, 'E')
+        self.assertEqual(trabajo.intentos, 3)
+
+
+class RegenerarPdfsTests(TestCase):
+    def setUp(self):
+        crear_datos_finanzas()
+        self.contrato = contrato.objects.get()
+
+    def _upload(self, file, public_id, **kwargs):
+        return {'secure_url': f'https://res.cloudinary.com/x/{public_id}.pdf', 'public_id': public_id}
+
+    def test_render_en_procesos_y_bulk_update(self):
+        out = StringIO()
+        with mock.patch('finanzas.common.trabajos_pdf.cloudinary.uploader.upload', side_effect=self._upload) as upload:
+            call_command('regenerar_pdfs_contratos', '--procesos', '2', stdout=out)
+        self.assertEqual(upload.call_count, 1)
+        self.assertTrue(upload.call_args.kwargs['file'].getvalue().startswith(b'%PDF'))
+        self.contrato.refresh_from_db()
+        self.assertIn('contrato-', self.contrato.contrato_PDF)
+        self.assertTrue(self.contrato.contrato_PDF_hash)
+        self.assertIn('1 PDFs regenerados', out.getvalue())
+
+        # segunda corrida: ya al día, no se sube nada
+        out = StringIO()
+        with mock.patch('finanzas.common.trabajos_pdf.cloudinary.uploader.upload') as upload:
+            call_command('regenerar_pdfs_contratos', '--procesos', '1', stdout=out)
+        upload.assert_not_called()
+        self.assertIn('1 al día', out.getvalue())
+
+    def test_fallos_se_reportan_sin_cortar_la_corrida(self):
+        out, err = StringIO(), StringIO()
+        with mock.patch('finanzas.common.trabajos_pdf.cloudinary.uploader.upload', side_effect=Exception("timeout")):
+            call_command('regenerar_pdfs_contratos', '--procesos', '1', stdout=out, stderr=err)
+        self.assertIn(f'Contrato {self.contrato.id}: subida: timeout', err.getvalue())
+        self.assertIn('1 fallidos', out.getvalue())
+        self.contrato.refresh_from_db()
+        self.assertIsNone(self.contrato.contrato_PDF)
+
+
+class EstadosCuentaTests(TestCase):
+    def setUp(self):
+        self.bloque, self.u1, self.u2, self.prop = crear_datos_finanzas()
+        pendiente = expensa.objects.get(unidad=self.u1, pagada=False)
+        multa.objects.create(expensa=pendiente, monto=Decimal('10.00'), tipo='F')
+        self.periodo = timezone.now().date().strftime('%Y-%m')
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("admin", password="x"))
+
+    def _subir(self, file, public_id, **kwargs):
+        self.subidos[public_id] = file.read()
+        return {'secure_url': f'https://res.cloudinary.com/x/raw/upload/{public_id}', 'public_id': public_id}
+
+    def test_endpoint_encola_y_el_worker_sube_el_zip(self):
+        self.client.force_authenticate(User.objects.create_user("staff", password="x", is_staff=True))
+        r = self.client.post('/api/estados-cuenta/', {'periodo': self.periodo}, format='json')
+        self.assertEqual(r.status_code, 202, r.data)
+        self.assertEqual(r.data['estado'], 'P')
+
+        self.subidos = {}
+        with mock.patch('finanzas.common.estados_cuenta.cloudinary.uploader.upload', side_effect=self._subir):
+            call_command('procesar_estados_cuenta', '--procesos', '1', stdout=StringIO())
+        estado = self.client.get(f"/api/estados-cuenta/{r.data['trabajo_id']}/").data
+        self.assertEqual((estado['estado'], estado['generados']), ('C', 2))
+        (public_id, contenido), = self.subidos.items()
+        self.assertTrue(estado['zip_url'].endswith(public_id))
+        with zipfile.ZipFile(BytesIO(contenido)) as zf:
+            nombres = sorted(zf.namelist())
+            self.assertEqual(len(nombres), 2)
+            self.assertTrue(zf.read(nombres[0]).startswith(b'%PDF'))
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self.client.post('/api/estados-cuenta/', {'periodo': 'marzo'}).status_code, 400)
+        self.assertEqual(self.client.post('/api/estados-cuenta/', {'periodo': '1999-01'}).status_code, 404)
+        for params in ({'bloque': 'x'}, {'unidad': '1; DROP'}, {'unidad': '-3'}):
+            r = self.client.post('/api/estados-cuenta/', {'periodo': self.periodo, **params})
+            self.assertEqual(r.status_code, 400, params)
+
+    def test_residente_solo_obtiene_sus_unidades(self):
+        residente = User.objects.create_user("residente", password="x")
+        self.prop.user = residente
+        self.prop.save()
+        self.client.force_authenticate(residente)
+        r = self.client.post('/api/estados-cuenta/', {'periodo': self.periodo, 'unidad': self.u2.id})
+        self.assertEqual(r.status_code, 403)
+        r = self.client.post('/api/estados-cuenta/', {'periodo': self.periodo})
+        self.assertEqual(r.status_code, 202)
+
+        self.subidos = {}
+        with mock.patch('finanzas.common.estados_cuenta.cloudinary.uploader.upload', side_effect=self._subir):
+            call_command('procesar_estados_cuenta', '--procesos', '1', stdout=StringIO())
+        with zipfile.ZipFile(BytesIO(next(iter(self.subidos.values())))) as zf:
+            self.assertEqual(len(zf.namelist()), 1)
+            self.assertIn(str(self.u1.id), zf.namelist()[0])
+        # El trabajo de otro usuario no es visible
+        self.client.force_authenticate(User.objects.create_user("otro", password="x"))
+        self.assertEqual(self.client.get(f"/api/estados-cuenta/{r.data['trabajo_id']}/").status_code, 404)
+
+    def test_comando_con_pool_de_procesos(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            salida = os.path.join(tmp, 'estados.zip')
+            out = StringIO()
+            call_command('generar_estados_cuenta', '--periodo', self.periodo, '--salida', salida, '--procesos', '2', stdout=out)
+            with zipfile.ZipFile(salida) as zf:
+                self.assertEqual(len(zf.namelist()), 2)
+        self.assertIn('2 estados de cuenta', out.getvalue())
+
+    def test_contexto_incluye_multas_y_pendiente(self):
+        ctx = {c['unidad']: c for c in contextos_estados_cuenta(parsear_periodo(self.periodo))}
+        u1 = ctx[str(self.u1)]
+        self.assertEqual(u1['propietario'], 'Juan Perez')
+        self.assertEqual(u1['total_expensas'], Decimal('150.00'))
+        self.assertEqual(u1['total_multas'], Decimal('10.00'))
+        self.assertEqual(u1['total_pendiente'], Decimal('60.00'))
 
-# Create your tests here.
@@ -1,15 +1,17 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ContratoViewSet, ExpensaViewSet, MultaViewSet
+from .views import ContratoViewSet, ExpensaViewSet, MultaViewSet, DispositivoViewSet, TrabajoPdfViewSet
 from .views_payments import CreatePaymentIntentExpensa, VerifyPaymentIntentExpensa
 from .viewsDashboard import (
     dashboard_resumen_financiero,
     grafico_expensas_estado,
     grafico_ingresos_mensuales,
     grafico_morosos_ranking,
-    grafico_comparativo_anual
+    grafico_comparativo_anual,
+    dashboard_todo,
+    reporte_antiguedad_saldos
 )
-from fcm_django.api.rest_framework import FCMDeviceAuthorizedViewSet
+from .viewsEstadoCuenta import estados_cuenta_zip, estado_trabajo_estados_cuenta
 
 
 # Router
@@ -17,7 +19,8 @@ router = DefaultRouter()
 router.register(r'contratos', ContratoViewSet, basename='contratos')
 router.register(r'expensas', ExpensaViewSet, basename='expensas')
 router.register(r'multas', MultaViewSet, basename='multas')
-router.register(r'devices', FCMDeviceAuthorizedViewSet, basename='devices')
+router.register(r'trabajos-pdf', TrabajoPdfViewSet, basename='trabajos-pdf')
+router.register(r'devices', DispositivoViewSet, basename='devices')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -30,4 +33,8 @@ urlpatterns = [
     path('grafico-ingresos/', grafico_ingresos_mensuales, name='grafico-ingresos'),
     path('grafico-morosos/', grafico_morosos_ranking, name='grafico-morosos'),
     path('grafico-comparativo/', grafico_comparativo_anual, name='grafico-comparativo'),
+    path('dashboard/', dashboard_todo, name='dashboard-todo'),
+    path('reporte-antiguedad/', reporte_antiguedad_saldos, name='reporte-antiguedad'),
+    path('estados-cuenta/', estados_cuenta_zip, name='estados-cuenta'),
+    path('estados-cuenta/<int:pk>/', estado_trabajo_estados_cuenta, name='estados-cuenta-trabajo'),
 ]
\ No newline at end of file
@@ -1,16 +1,17 @@
 # apps/administracion/views.py
-from io import BytesIO
-from django.utils.text import slugify
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-import cloudinary.uploader
-from .models import contrato, expensa, multa
+from .models import contrato, expensa, multa, trabajo_pdf
 from .serializers.serializersContrato import ContratoSerializer
 from .serializers.serializersExpensa import ExpensaSerializer
 from .serializers.serializersMulta import MultaSerializer
-from .common.pdf_utils import render_pdf_from_template
+from .serializers.serializersTrabajoPdf import TrabajoPdfSerializer
+from .common.trabajos_pdf import encolar_pdf_contrato
+from .common.cache_pdf import pdf_vigente, estadisticas_cache_pdf
+from .common.notificaciones import marcar_para_suscripcion
+from fcm_django.api.rest_framework import FCMDeviceAuthorizedViewSet
 from rest_framework.permissions import IsAuthenticated
 
 class ContratoViewSet(viewsets.ModelViewSet):
@@ -19,38 +20,42 @@ class ContratoViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=["post"], url_path="generar_pdf")
     def generar_pdf(self, request, pk=None):
-        obj = get_object_or_404(contrato, pk=pk)
+        obj = get_object_or_404(contrato.objects.select_related('unidad', 'propietario'), pk=pk)
 
-        # 1) PDF
-        try:
-            pdf_bytes = render_pdf_from_template("pdf/contrato.html", {"contrato": obj})
-        except Exception as e:
-            return Response({"detail": f"Error al generar PDF: {e}"}, status=500)
+        # Si el contenido no cambió desde el último render, el PDF subido sigue valiendo
+        pdf_url = pdf_vigente(obj)
+        if pdf_url:
+            return Response({"id": obj.id, "pdf_url": pdf_url, "cache": True}, status=status.HTTP_200_OK)
 
-        # 2) Cloudinary
-        try:
-            public_id = f"contratos/contrato-{obj.id}-{slugify(str(obj.unidad))}"
-            upload_result = cloudinary.uploader.upload(
-                file=BytesIO(pdf_bytes),
-                resource_type="raw",
-                public_id=public_id,
-                overwrite=True,
-                use_filename=True,
-                unique_filename=False,
-            )
-        except Exception as e:
-            return Response({"detail": f"Error al subir a Cloudinary: {e}"}, status=502)
-
-        # 3) Guardar
-        obj.contrato_PDF = upload_result.get("secure_url")
-        obj.save(update_fields=["contrato_PDF"])
-
-        # 4) Respuesta
+        # El render y la subida los hace el worker (manage.py procesar_pdfs);
+        # si ya hay un trabajo activo para el contrato se devuelve ese mismo
+        trabajo, creado = encolar_pdf_contrato(obj.id)
         return Response(
-            {"id": obj.id, "pdf_url": obj.contrato_PDF, "public_id": upload_result.get("public_id")},
-            status=status.HTTP_200_OK
+            {"trabajo_id": trabajo.id, "estado": trabajo.estado, "nuevo": creado},
+            status=status.HTTP_202_ACCEPTED
         )
 
+class TrabajoPdfViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Estado de los trabajos de PDF: al completarse `pdf_url` tiene el contrato_PDF.
+    """
+    queryset = trabajo_pdf.objects.all().order_by('-id')
+    serializer_class = TrabajoPdfSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        contrato_id = self.request.query_params.get('contrato')
+        if contrato_id:
+            queryset = queryset.filter(contrato_id=contrato_id)
+        estado = self.request.query_params.get('estado')
+        if estado:
+            queryset = queryset.filter(estado=estado)
+        return queryset
+
+    @action(detail=False, methods=["get"], url_path="estadisticas-cache")
+    def estadisticas_cache(self, request):
+        return Response(estadisticas_cache_pdf(), status=status.HTTP_200_OK)
+
 class MultaViewSet(viewsets.ModelViewSet):
     queryset = multa.objects.all()
     serializer_class = MultaSerializer
@@ -72,4 +77,17 @@ class ExpensaViewSet(viewsets.ModelViewSet):
         ).distinct()
 
 
+class DispositivoViewSet(FCMDeviceAuthorizedViewSet):
+    """
+    Registro de dispositivos FCM. Al crear o actualizar (token rotado) el
+    dispositivo queda pendiente de suscripción al topic del condominio.
+    """
+    def perform_create(self, serializer):
+        dispositivo = super().perform_create(serializer)
+        marcar_para_suscripcion(dispositivo)
+        return dispositivo
 
+    def perform_update(self, serializer):
+        dispositivo = super().perform_update(serializer)
+        marcar_para_suscripcion(dispositivo)
+        return dispositivo
@@ -0,0 +1,76 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import status
+from django.shortcuts import get_object_or_404
+
+from .models import trabajo_estado_cuenta
+from .common.emision import parsear_periodo
+from .common.estados_cuenta import es_administrador, movimientos_periodo, unidades_de_usuario
+
+
+def _id_opcional(valor):
+    """Parámetro de id opcional: None si no viene, ValueError si no es entero positivo."""
+    if valor in (None, ""):
+        return None
+    id_ = int(valor)
+    if id_ <= 0:
+        raise ValueError
+    return id_
+
+
+def _trabajo_a_dict(trabajo):
+    return {
+        'trabajo_id': trabajo.id,
+        'periodo': f"{trabajo.periodo:%Y-%m}",
+        'estado': trabajo.estado,
+        'estado_display': trabajo.get_estado_display(),
+        'zip_url': trabajo.zip_url,
+        'generados': trabajo.generados,
+        'error': trabajo.error,
+    }
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def estados_cuenta_zip(request):
+    """
+    Encola el ZIP de estados de cuenta mensuales (un PDF por unidad con sus
+    expensas y multas). El render y la subida los hace el worker
+    (manage.py procesar_estados_cuenta); el estado se consulta en
+    estados-cuenta/<id>/. Los residentes solo obtienen sus propias unidades.
+    Parámetros: periodo (YYYY-MM, requerido), bloque y unidad (ids, opcionales).
+    """
+    datos = request.data if request.data else request.query_params
+    try:
+        periodo = parsear_periodo(datos.get('periodo'))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        bloque_id = _id_opcional(datos.get('bloque'))
+        unidad_id = _id_opcional(datos.get('unidad'))
+    except (TypeError, ValueError):
+        return Response({'error': 'bloque y unidad deben ser ids numéricos'}, status=status.HTTP_400_BAD_REQUEST)
+
+    unidades = unidades_de_usuario(request.user)
+    if unidades is not None and unidad_id and unidad_id not in set(unidades):
+        return Response({'error': 'No tiene acceso a esa unidad'}, status=status.HTTP_403_FORBIDDEN)
+
+    expensas, multas = movimientos_periodo(periodo, bloque_id, unidad_id, unidades)
+    if not expensas.exists() and not multas.exists():
+        return Response({'error': 'No hay movimientos en el periodo'}, status=status.HTTP_404_NOT_FOUND)
+
+    trabajo = trabajo_estado_cuenta.objects.create(
+        periodo=periodo, bloque_id=bloque_id, unidad_id=unidad_id, usuario=request.user
+    )
+    return Response(_trabajo_a_dict(trabajo), status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def estado_trabajo_estados_cuenta(request, pk):
+    """Estado del trabajo: al completarse `zip_url` tiene el ZIP."""
+    trabajos = trabajo_estado_cuenta.objects.all()
+    if not es_administrador(request.user):
+        trabajos = trabajos.filter(usuario=request.user)
+    return Response(_trabajo_a_dict(get_object_or_404(trabajos, pk=pk)))
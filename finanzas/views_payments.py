@@ -7,6 +7,7 @@ from django.shortcuts import get_object_or_404
 from decimal import Decimal
 import stripe
 from .models import expensa as Expensa
+from .common.resumen_mensual import actualizar_pagadas
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
@@ -60,6 +61,6 @@ class VerifyPaymentIntentExpensa(APIView):
         expensa_id = (pi.get("metadata") or {}).get("expensa_id")
 
         if status_pi == "succeeded" and expensa_id:
-            Expensa.objects.filter(id=expensa_id).update(pagada=True)
+            actualizar_pagadas(Expensa.objects.filter(id=expensa_id, pagada=False))
 
         return Response({"status": status_pi, "expensa_id": expensa_id})
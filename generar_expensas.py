@@ -112,6 +112,7 @@ def generar_expensas():
                     unidad=cont.unidad,
                     monto=monto_final,
                     fecha_emision=fecha_expensa,
+                    periodo=fecha_expensa.replace(day=1),
                     fecha_vencimiento=fecha_venc,
                     pagada=pagada,
                     descripcion=f"Expensa mensual - {fecha_expensa.strftime('%B %Y')}"
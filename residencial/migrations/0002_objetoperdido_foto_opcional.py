@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('residencial', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='objetoperdido',
+            name='foto',
+            field=models.URLField(blank=True, null=True, verbose_name='Foto del objeto'),
+        ),
+    ]
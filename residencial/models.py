@@ -252,7 +252,7 @@ class ObjetoPerdido(models.Model):
 
     titulo = models.CharField(max_length=100, verbose_name="Qué es")
     descripcion = models.TextField(blank=True, null=True, verbose_name="Detalles")
-    foto = models.URLField(verbose_name="Foto del objeto") # Usas la URL de Cloudinary
+    foto = models.URLField(blank=True, null=True, verbose_name="Foto del objeto") # URL de ImgBB (vacía mientras se sube)
     lugar_encontrado = models.CharField(max_length=100, default="Áreas Comunes")
     fecha_encontrado = models.DateTimeField(default=timezone.now)
     
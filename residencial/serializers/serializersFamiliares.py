@@ -14,19 +14,20 @@ class FamiliaresSerializer(serializers.ModelSerializer):
     persona_relacionada_ci = serializers.CharField(source='persona_relacionada.CI', read_only=True)
     nombre_completo = serializers.ReadOnlyField()
     luxand_uuid = serializers.ReadOnlyField()
+    luxand_estado = serializers.ReadOnlyField()
     
     class Meta:
         model = Familiares
         fields = [
             # Atributos heredados de Persona
             'id', 'nombre', 'apellido', 'telefono', 'imagen', 'estado', 'sexo', 
-            'tipo', 'fecha_registro', 'CI', 'fecha_nacimiento', 'nombre_completo', 'luxand_uuid',
+            'tipo', 'fecha_registro', 'CI', 'fecha_nacimiento', 'nombre_completo', 'luxand_uuid', 'luxand_estado',
             # Atributos específicos de Familiares
             'persona_relacionada', 'parentesco',
             # Campos calculados
             'persona_relacionada_nombre', 'persona_relacionada_ci'
         ]
-        read_only_fields = ['id', 'fecha_registro', 'tipo', 'nombre_completo', 'luxand_uuid']
+        read_only_fields = ['id', 'fecha_registro', 'tipo', 'nombre_completo', 'luxand_uuid', 'luxand_estado']
     
     def validate(self, data):
         """
@@ -63,13 +64,14 @@ class FamiliaresListSerializer(serializers.ModelSerializer):
     persona_relacionada_ci = serializers.CharField(source='persona_relacionada.CI', read_only=True)
     nombre_completo = serializers.ReadOnlyField()
     luxand_uuid = serializers.ReadOnlyField()
+    luxand_estado = serializers.ReadOnlyField()
     
     class Meta:
         model = Familiares
         fields = [
             # Atributos heredados de Persona
             'id', 'nombre', 'apellido', 'telefono', 'imagen', 'estado', 'sexo', 
-            'tipo', 'fecha_registro', 'CI', 'fecha_nacimiento', 'nombre_completo', 'luxand_uuid',
+            'tipo', 'fecha_registro', 'CI', 'fecha_nacimiento', 'nombre_completo', 'luxand_uuid', 'luxand_estado',
             # Atributos específicos de Familiares
             'persona_relacionada', 'parentesco',
             # Campos calculados
@@ -17,19 +17,20 @@ class InquilinoSerializer(serializers.ModelSerializer):
     propietario_ci = serializers.CharField(source='propietario.CI', read_only=True)
     nombre_completo = serializers.ReadOnlyField()
     luxand_uuid = serializers.ReadOnlyField()
+    luxand_estado = serializers.ReadOnlyField()
     
     class Meta:
         model = Inquilino
         fields = [
             # Atributos heredados de Persona
             'id', 'nombre', 'apellido', 'telefono', 'imagen', 'estado', 'sexo', 
-            'tipo', 'fecha_registro', 'CI', 'fecha_nacimiento', 'nombre_completo', 'luxand_uuid',
+            'tipo', 'fecha_registro', 'CI', 'fecha_nacimiento', 'nombre_completo', 'luxand_uuid', 'luxand_estado',
             # Atributos específicos de Inquilino
             'propietario', 'fecha_inicio', 'fecha_fin', 'estado_inquilino',
             # Campos calculados
             'propietario_nombre', 'propietario_ci'
         ]
-        read_only_fields = ['id', 'fecha_registro', 'tipo', 'nombre_completo', 'luxand_uuid']
+        read_only_fields = ['id', 'fecha_registro', 'tipo', 'nombre_completo', 'luxand_uuid', 'luxand_estado']
     
     def validate_fecha_fin(self, value):
         """
@@ -75,13 +76,14 @@ class InquilinoListSerializer(serializers.ModelSerializer):
     propietario_ci = serializers.CharField(source='propietario.CI', read_only=True)
     nombre_completo = serializers.ReadOnlyField()
     luxand_uuid = serializers.ReadOnlyField()
+    luxand_estado = serializers.ReadOnlyField()
     
     class Meta:
         model = Inquilino
         fields = [
             # Atributos heredados de Persona
             'id', 'nombre', 'apellido', 'telefono', 'imagen', 'estado', 'sexo', 
-            'tipo', 'fecha_registro', 'CI', 'fecha_nacimiento', 'nombre_completo', 'luxand_uuid',
+            'tipo', 'fecha_registro', 'CI', 'fecha_nacimiento', 'nombre_completo', 'luxand_uuid', 'luxand_estado',
             # Atributos específicos de Inquilino
             'propietario', 'fecha_inicio', 'fecha_fin', 'estado_inquilino',
             # Campos calculados
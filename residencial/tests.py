@@ -1,3 +1,218 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import BytesIO
+from types import SimpleNamespace
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from administracion.models import SubidaImagen, HuellaImagen
+from core.imagenes import preparar_imagen, parsear_recorte, ImagenInvalida
+import core.subidas
+from core.subidas import procesar_subidas
+from .models import ObjetoPerdido
+
+
+def foto_jpeg(ancho=4000, alto=3000):
+    """JPEG grande con EXIF (orientación + datos de cámara), como los de un celular."""
+    img = Image.new("RGB", (ancho, alto), (120, 80, 40))
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotar 90°
+    exif[0x010F] = "Camara"  # Make
+    out = BytesIO()
+    img.save(out, "JPEG", quality=95, exif=exif.tobytes())
+    return out.getvalue()
+
+
+@override_settings(IMAGEN_MAX_LADO=1600, IMAGEN_FORMATO="WEBP", IMAGEN_CALIDAD=80)
+class PrepararImagenTests(TestCase):
+    def test_reduce_rota_y_quita_exif(self):
+        contenido, extension, content_type = preparar_imagen(BytesIO(foto_jpeg()))
+        self.assertEqual((extension, content_type), ("webp", "image/webp"))
+        img = Image.open(BytesIO(contenido))
+        # orientación aplicada (vertical) y lado mayor limitado
+        self.assertEqual(img.size, (1200, 1600))
+        self.assertFalse(img.getexif())
+
+    def test_jpeg_para_luxand(self):
+        contenido, extension, _ = preparar_imagen(BytesIO(foto_jpeg(800, 600)), formato="JPEG")
+        self.assertEqual(extension, "jpg")
+        self.assertEqual(Image.open(BytesIO(contenido)).size, (600, 800))
+
+    def test_recorte_al_rostro_en_la_foto_orientada(self):
+        # Foto 4000x3000 girada por EXIF: el recuadro viene en la foto vertical (3000x4000)
+        contenido, _, _ = preparar_imagen(BytesIO(foto_jpeg()), max_lado=400, formato="JPEG",
+                                          recorte=parsear_recorte("1000,1000,500,1000"))
+        # 500x1000 + 40% de margen por lado = 900x1800, reducido a lado mayor 400
+        self.assertEqual(Image.open(BytesIO(contenido)).size, (200, 400))
+
+    def test_recorte_invalido_se_ignora(self):
+        self.assertIsNone(parsear_recorte("1,2,0,5"))
+        self.assertIsNone(parsear_recorte("a,b,c,d"))
+        self.assertEqual(parsear_recorte([1, 2, 3, 4]), (1.0, 2.0, 3.0, 4.0))
+        contenido, _, _ = preparar_imagen(BytesIO(foto_jpeg(800, 600)), formato="JPEG",
+                                          recorte=(5000, 5000, 10, 10))
+        self.assertEqual(Image.open(BytesIO(contenido)).size, (600, 800))
+
+    def test_archivo_que_no_es_imagen(self):
+        with self.assertRaises(ImagenInvalida):
+            preparar_imagen(BytesIO(b"no es una imagen"))
+
+
+@override_settings(IMAGEN_MAX_LADO=1600, IMAGEN_FORMATO="WEBP", IMAGEN_CALIDAD=80, IMAGEN_SUBIDA_DIFERIDA=False)
+class ImagenImgBBMixinTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def _imgbb(self, url, data, files, timeout):
+        self.subido = files["image"]
+        return SimpleNamespace(status_code=200, json=lambda: {"data": {"url": "https://i.ibb.co/x/foto.webp"}})
+
+    def test_objeto_perdido_sube_la_foto_procesada(self):
+        original = foto_jpeg()
+        archivo = SimpleUploadedFile("foto.jpg", original, content_type="image/jpeg")
+        with mock.patch("core.imagenes.http_cliente.post", side_effect=self._imgbb):
+            r = self.client.post("/api/objetosPerdidos/", {"titulo": "Llaves", "foto": archivo}, format="multipart")
+        self.assertEqual(r.status_code, 201, r.data)
+        self.assertEqual(r.data["foto"], "https://i.ibb.co/x/foto.webp")
+        nombre, contenido, content_type = self.subido
+        self.assertEqual(content_type, "image/webp")
+        self.assertLess(len(contenido), len(original))
+
+        # PATCH sin foto conserva la existente
+        r = self.client.patch(f"/api/objetosPerdidos/{r.data['id']}/", {"titulo": "Llavero"}, format="multipart")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(ObjetoPerdido.objects.get().foto, "https://i.ibb.co/x/foto.webp")
+
+    def test_misma_foto_reutiliza_la_url_sin_subir(self):
+        original = foto_jpeg()
+        with mock.patch("core.imagenes.http_cliente.post", side_effect=self._imgbb) as post:
+            for titulo in ("Llaves", "Llaves otra vez"):
+                archivo = SimpleUploadedFile("foto.jpg", original, content_type="image/jpeg")
+                r = self.client.post("/api/objetosPerdidos/", {"titulo": titulo, "foto": archivo}, format="multipart")
+                self.assertEqual(r.status_code, 201, r.data)
+                self.assertEqual(r.data["foto"], "https://i.ibb.co/x/foto.webp")
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(HuellaImagen.objects.get().usos, 2)
+
+    def test_imagen_invalida_devuelve_400_sin_llamar_a_imgbb(self):
+        archivo = SimpleUploadedFile("foto.jpg", b"texto", content_type="image/jpeg")
+        with mock.patch("core.imagenes.http_cliente.post") as post:
+            r = self.client.post("/api/objetosPerdidos/", {"titulo": "Llaves", "foto": archivo}, format="multipart")
+        post.assert_not_called()
+        self.assertEqual(r.status_code, 400)
+
+
+@override_settings(IMAGEN_MAX_LADO=1600, IMAGEN_FORMATO="WEBP", IMAGEN_CALIDAD=80, IMAGEN_SUBIDA_DIFERIDA=True)
+class SubidaDiferidaTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def _crear(self):
+        archivo = SimpleUploadedFile("foto.jpg", foto_jpeg(), content_type="image/jpeg")
+        with mock.patch("core.imagenes.http_cliente.post") as post:
+            r = self.client.post("/api/objetosPerdidos/", {"titulo": "Llaves", "foto": archivo}, format="multipart")
+        post.assert_not_called()
+        return r
+
+    def test_crud_responde_sin_esperar_a_imgbb(self):
+        r = self._crear()
+        self.assertEqual(r.status_code, 201, r.data)
+        self.assertTrue(r.data["foto_pendiente"])
+        self.assertIsNone(ObjetoPerdido.objects.get().foto)
+        subida = SubidaImagen.objects.get()
+        self.assertEqual((subida.estado, subida.campo, subida.mime), ("P", "foto", "image/webp"))
+
+        ok = SimpleNamespace(status_code=200, json=lambda: {"data": {"url": "https://i.ibb.co/x/foto.webp"}})
+        with mock.patch("core.imagenes.http_cliente.post", return_value=ok):
+            stats = procesar_subidas()
+        self.assertEqual(stats["subidas"], 1)
+        self.assertEqual(ObjetoPerdido.objects.get().foto, "https://i.ibb.co/x/foto.webp")
+        subida.refresh_from_db()
+        self.assertEqual(subida.estado, "S")
+        self.assertEqual(bytes(subida.contenido), b"")
+
+    def test_fallo_de_imgbb_se_reintenta_con_backoff(self):
+        self._crear()
+        error = SimpleNamespace(status_code=503, text="no disponible")
+        with mock.patch("core.imagenes.http_cliente.post", return_value=error):
+            stats = procesar_subidas()
+            self.assertEqual(stats["reintentos"], 1)
+            # No vuelve a intentarse hasta que pase el backoff
+            self.assertEqual(sum(procesar_subidas().values()), 0)
+        subida = SubidaImagen.objects.get()
+        self.assertEqual((subida.estado, subida.intentos), ("P", 1))
+        self.assertIn("no disponible", subida.error)
+
+    def test_nueva_foto_descarta_la_subida_pendiente(self):
+        r = self._crear()
+        archivo = SimpleUploadedFile("otra.jpg", foto_jpeg(800, 600), content_type="image/jpeg")
+        r = self.client.patch(f"/api/objetosPerdidos/{r.data['id']}/", {"foto": archivo}, format="multipart")
+        self.assertEqual(r.status_code, 200, r.data)
+        self.assertEqual(
+            list(SubidaImagen.objects.order_by("id").values_list("estado", flat=True)), ["D", "P"]
+        )
+
+    def test_foto_ya_subida_descarta_la_subida_pendiente(self):
+        ok = SimpleNamespace(status_code=200, json=lambda: {"data": {"url": "https://i.ibb.co/x/foto.webp"}})
+        with mock.patch("core.imagenes.http_cliente.post", return_value=ok):
+            self._crear()
+            procesar_subidas()
+        # Objeto con una foto nueva aún en cola...
+        r = self.client.post("/api/objetosPerdidos/", {"titulo": "Gorra"}, format="multipart")
+        archivo = SimpleUploadedFile("otra.jpg", foto_jpeg(800, 600), content_type="image/jpeg")
+        self.client.patch(f"/api/objetosPerdidos/{r.data['id']}/", {"foto": archivo}, format="multipart")
+        # ...y enseguida una foto que ya está en ImgBB: la pendiente no debe pisarla
+        archivo = SimpleUploadedFile("foto.jpg", foto_jpeg(), content_type="image/jpeg")
+        r = self.client.patch(f"/api/objetosPerdidos/{r.data['id']}/", {"foto": archivo}, format="multipart")
+        self.assertEqual(r.status_code, 200, r.data)
+        self.assertEqual(SubidaImagen.objects.filter(estado="P").count(), 0)
+        self.assertEqual(sum(procesar_subidas().values()), 0)
+        self.assertEqual(ObjetoPerdido.objects.get(pk=r.data["id"]).foto, "https://i.ibb.co/x/foto.webp")
+
+    def test_sube_fuera_de_la_transaccion_y_respeta_descartes(self):
+        r = self._crear()
+        registrar = core.subidas.registrar_huella
+
+        def entre_subida_y_escritura(*args):
+            # Terminada la subida la fila sigue tomada ('R') y sin locks retenidos...
+            self.assertEqual(SubidaImagen.objects.get().estado, "R")
+            # ...así que una foto nueva puede reemplazarla mientras tanto
+            archivo = SimpleUploadedFile("otra.jpg", foto_jpeg(800, 600), content_type="image/jpeg")
+            self.client.patch(f"/api/objetosPerdidos/{r.data['id']}/", {"foto": archivo}, format="multipart")
+            registrar(*args)
+
+        ok = SimpleNamespace(status_code=200, json=lambda: {"data": {"url": "https://i.ibb.co/x/vieja.webp"}})
+        with mock.patch("core.imagenes.http_cliente.post", return_value=ok), \
+                mock.patch("core.subidas.registrar_huella", side_effect=entre_subida_y_escritura):
+            stats = procesar_subidas()
+        self.assertEqual(stats["subidas"], 0)
+        self.assertIsNone(ObjetoPerdido.objects.get().foto)
+        self.assertEqual(
+            list(SubidaImagen.objects.order_by("id").values_list("estado", flat=True)), ["D", "P"]
+        )
+
+    def test_subida_abandonada_se_retoma_tras_el_timeout(self):
+        self._crear()
+        SubidaImagen.objects.update(estado="R", proximo_intento=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(sum(procesar_subidas().values()), 0)
+
+        SubidaImagen.objects.update(proximo_intento=timezone.now() - timedelta(seconds=1))
+        ok = SimpleNamespace(status_code=200, json=lambda: {"data": {"url": "https://i.ibb.co/x/foto.webp"}})
+        with mock.patch("core.imagenes.http_cliente.post", return_value=ok):
+            self.assertEqual(procesar_subidas()["subidas"], 1)
+
+    def test_subidas_con_el_mismo_contenido_suben_una_vez(self):
+        r1 = self._crear()
+        ok = SimpleNamespace(status_code=200, json=lambda: {"data": {"url": "https://i.ibb.co/x/foto.webp"}})
+        with mock.patch("core.imagenes.http_cliente.post", return_value=ok) as post:
+            procesar_subidas()
+            # La misma foto otra vez: el CRUD ya resuelve la URL sin encolar
+            r2 = self._crear()
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(r2.data["foto"], "https://i.ibb.co/x/foto.webp")
+        self.assertNotIn("foto_pendiente", r2.data)
+        self.assertEqual(SubidaImagen.objects.count(), 1)
+        self.assertEqual(ObjetoPerdido.objects.get(pk=r1.data["id"]).foto, "https://i.ibb.co/x/foto.webp")
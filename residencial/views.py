@@ -12,8 +12,7 @@ from .models import Inquilino, Familiares, Visitante, Mascota, AreasComunes, Res
 from .serializers.serializersInquilino import InquilinoSerializer, InquilinoListSerializer
 from .serializers.serializersFamiliares import FamiliaresSerializer, FamiliaresListSerializer
 from .serializers.serializersMascota import MascotaSerializer, MascotaListSerializer
-import requests
-from django.conf import settings
+from core.imagenes import ImagenImgBBMixin
 from residencial.serializers.serializersArea import AreaSerializer
 from residencial.serializers.serializersReserva import ReservaAreaComunSerializer
 from rest_framework.exceptions import PermissionDenied, ValidationError
@@ -22,10 +21,12 @@ from rest_framework.exceptions import PermissionDenied, ValidationError
 
 # ==================== VISTAS ESPECÍFICAS POR TIPO DE PERSONA ====================
 
-class PropietarioViewSet(viewsets.ModelViewSet):
+class PropietarioViewSet(ImagenImgBBMixin, viewsets.ModelViewSet):
     """
     ViewSet para CRUD completo de propietarios con subida de imágenes a ImgBB
     """
+    # Luxand enrola desde esta URL: se sube en JPEG
+    formato_imagen = "JPEG"
     serializer_class = PropietarioSerializer
     queryset = Persona.objects.filter(tipo='P')
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -40,62 +41,14 @@ class PropietarioViewSet(viewsets.ModelViewSet):
     def perform_update(self, serializer):
         # Mantener el tipo como 'P' al actualizar
         serializer.save(tipo='P')
-    
-    def create(self, request, *args, **kwargs):
-        """
-        Crear propietario con subida de imagen a ImgBB
-        """
-        return self.handle_image_upload(request, super().create, *args, **kwargs)
-    
-    def update(self, request, *args, **kwargs):
-        """
-        Actualizar propietario con subida de imagen a ImgBB
-        """
-        return self.handle_image_upload(request, super().update, *args, **kwargs)
-    
-    def handle_image_upload(self, request, action, *args, **kwargs):
-        """
-        Maneja la subida de imágenes a ImgBB API
-        """
-        imagen_file = request.FILES.get('imagen')
-        
-        if imagen_file:
-            # Subir imagen a ImgBB
-            url = "https://api.imgbb.com/1/upload"
-            payload = {"key": settings.IMGBB_API_KEY}
-            files = {"image": imagen_file.read()}
-            
-            response = requests.post(url, payload, files=files)
-            
-            if response.status_code == 200:
-                # Extraer URL de la imagen subida
-                image_url = response.json()["data"]["url"]
-                
-                # Actualizar los datos de la request con la URL de la imagen
-                data = request.data.copy()
-                data["imagen"] = image_url
-                request._full_data = data
-            else:
-                return Response(
-                    {"error": "Error al subir imagen a ImgBB"}, 
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-        else:
-            # Si no se sube nueva imagen en PUT/PATCH, mantener la existente
-            if request.method in ["PUT", "PATCH"]:
-                instance = self.get_object()
-                data = request.data.copy()
-                if not data.get("imagen"):
-                    data["imagen"] = instance.imagen
-                request._full_data = data
-        
-        return action(request, *args, **kwargs)
 
 
-class InquilinoViewSet(viewsets.ModelViewSet):
+class InquilinoViewSet(ImagenImgBBMixin, viewsets.ModelViewSet):
     """
     ViewSet para CRUD completo de inquilinos que hereda de Persona
     """
+    # Luxand enrola desde esta URL: se sube en JPEG
+    formato_imagen = "JPEG"
     queryset = Inquilino.objects.select_related('propietario').all()
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = [
@@ -135,62 +88,14 @@ class InquilinoViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(propietario_id=propietario)
         
         return queryset
-    
-    def create(self, request, *args, **kwargs):
-        """
-        Crear inquilino con subida de imagen a ImgBB
-        """
-        return self.handle_image_upload(request, super().create, *args, **kwargs)
-    
-    def update(self, request, *args, **kwargs):
-        """
-        Actualizar inquilino con subida de imagen a ImgBB
-        """
-        return self.handle_image_upload(request, super().update, *args, **kwargs)
-    
-    def handle_image_upload(self, request, action, *args, **kwargs):
-        """
-        Maneja la subida de imágenes a ImgBB API
-        """
-        imagen_file = request.FILES.get('imagen')
-        
-        if imagen_file:
-            # Subir imagen a ImgBB
-            url = "https://api.imgbb.com/1/upload"
-            payload = {"key": settings.IMGBB_API_KEY}
-            files = {"image": imagen_file.read()}
-            
-            response = requests.post(url, payload, files=files)
-            
-            if response.status_code == 200:
-                # Extraer URL de la imagen subida
-                image_url = response.json()["data"]["url"]
-                
-                # Actualizar los datos de la request con la URL de la imagen
-                data = request.data.copy()
-                data["imagen"] = image_url
-                request._full_data = data
-            else:
-                return Response(
-                    {"error": "Error al subir imagen a ImgBB"}, 
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-        else:
-            # Si no se sube nueva imagen en PUT/PATCH, mantener la existente
-            if request.method in ["PUT", "PATCH"]:
-                instance = self.get_object()
-                data = request.data.copy()
-                if not data.get("imagen"):
-                    data["imagen"] = instance.imagen
-                request._full_data = data
-        
-        return action(request, *args, **kwargs)
 
 
-class FamiliaresViewSet(viewsets.ModelViewSet):
+class FamiliaresViewSet(ImagenImgBBMixin, viewsets.ModelViewSet):
     """
     ViewSet para CRUD completo de familiares que hereda de Persona
     """
+    # Luxand enrola desde esta URL: se sube en JPEG
+    formato_imagen = "JPEG"
     queryset = Familiares.objects.select_related('persona_relacionada').all()
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = [
@@ -230,56 +135,6 @@ class FamiliaresViewSet(viewsets.ModelViewSet):
         
         return queryset
     
-    def create(self, request, *args, **kwargs):
-        """
-        Crear familiar con subida de imagen a ImgBB
-        """
-        return self.handle_image_upload(request, super().create, *args, **kwargs)
-    
-    def update(self, request, *args, **kwargs):
-        """
-        Actualizar familiar con subida de imagen a ImgBB
-        """
-        return self.handle_image_upload(request, super().update, *args, **kwargs)
-    
-    def handle_image_upload(self, request, action, *args, **kwargs):
-        """
-        Maneja la subida de imágenes a ImgBB API
-        """
-        imagen_file = request.FILES.get('imagen')
-        
-        if imagen_file:
-            # Subir imagen a ImgBB
-            url = "https://api.imgbb.com/1/upload"
-            payload = {"key": settings.IMGBB_API_KEY}
-            files = {"image": imagen_file.read()}
-            
-            response = requests.post(url, payload, files=files)
-            
-            if response.status_code == 200:
-                # Extraer URL de la imagen subida
-                image_url = response.json()["data"]["url"]
-                
-                # Actualizar los datos de la request con la URL de la imagen
-                data = request.data.copy()
-                data["imagen"] = image_url
-                request._full_data = data
-            else:
-                return Response(
-                    {"error": "Error al subir imagen a ImgBB"}, 
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-        else:
-            # Si no se sube nueva imagen en PUT/PATCH, mantener la existente
-            if request.method in ["PUT", "PATCH"]:
-                instance = self.get_object()
-                data = request.data.copy()
-                if not data.get("imagen"):
-                    data["imagen"] = instance.imagen
-                request._full_data = data
-        
-        return action(request, *args, **kwargs)
-
     @action(detail=False, methods=['get'])
     def personas_disponibles(self, request):
         """
@@ -299,10 +154,12 @@ class FamiliaresViewSet(viewsets.ModelViewSet):
         return Response(personas_data)
 
 
-class VisitanteViewSet(viewsets.ModelViewSet):
+class VisitanteViewSet(ImagenImgBBMixin, viewsets.ModelViewSet):
     """
     ViewSet para CRUD completo de visitantes con subida de imágenes a ImgBB
     """
+    # Luxand enrola desde esta URL: se sube en JPEG
+    formato_imagen = "JPEG"
     serializer_class = VisitanteSerializer
     queryset = Persona.objects.filter(tipo='V')
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -316,56 +173,6 @@ class VisitanteViewSet(viewsets.ModelViewSet):
     def perform_update(self, serializer):
         # Mantener el tipo como 'V' al actualizar
         serializer.save(tipo='V')
-    
-    def create(self, request, *args, **kwargs):
-        """
-        Crear visitante con subida de imagen a ImgBB
-        """
-        return self.handle_image_upload(request, super().create, *args, **kwargs)
-    
-    def update(self, request, *args, **kwargs):
-        """
-        Actualizar visitante con subida de imagen a ImgBB
-        """
-        return self.handle_image_upload(request, super().update, *args, **kwargs)
-    
-    def handle_image_upload(self, request, action, *args, **kwargs):
-        """
-        Maneja la subida de imágenes a ImgBB API
-        """
-        imagen_file = request.FILES.get('imagen')
-        
-        if imagen_file:
-            # Subir imagen a ImgBB
-            url = "https://api.imgbb.com/1/upload"
-            payload = {"key": settings.IMGBB_API_KEY}
-            files = {"image": imagen_file.read()}
-            
-            response = requests.post(url, payload, files=files)
-            
-            if response.status_code == 200:
-                # Extraer URL de la imagen subida
-                image_url = response.json()["data"]["url"]
-                
-                # Actualizar los datos de la request con la URL de la imagen
-                data = request.data.copy()
-                data["imagen"] = image_url
-                request._full_data = data
-            else:
-                return Response(
-                    {"error": "Error al subir imagen a ImgBB"}, 
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-        else:
-            # Si no se sube nueva imagen en PUT/PATCH, mantener la existente
-            if request.method in ["PUT", "PATCH"]:
-                instance = self.get_object()
-                data = request.data.copy()
-                if not data.get("imagen"):
-                    data["imagen"] = instance.imagen
-                request._full_data = data
-        
-        return action(request, *args, **kwargs)
 
 class AreaViewSet(viewsets.ModelViewSet):
     serializer_class = AreaSerializer
@@ -1,3 +1,389 @@
-from django.test import TestCase
+import datetime
+import time
+from io import BytesIO
+from unittest import mock
+import numpy as np
+import requests
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image, ImageDraw
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from administracion.models import Persona, EmbeddingRostro
+from core import http_cliente, luxand, reconocedores
+from core.reconocedores import IndiceEmbeddings
+from core.limitador import CircuitBreaker
+from core.reconocimiento_cache import buscar, dhash, guardar, recognize_cacheado
+
+
+def respuesta(status_code, contenido=b"{}", headers=None):
+    r = requests.Response()
+    r.status_code = status_code
+    r._content = contenido
+    r.headers.update(headers or {})
+    r.request = requests.Request("POST", "https://api.luxand.cloud/photo/search/v2", data={"a": "1"}).prepare()
+    return r
+
+
+@override_settings(HTTP_REINTENTOS=2, HTTP_BACKOFF_BASE=0.01, HTTP_BACKOFF_MAX=0.02)
+class HttpClienteTests(TestCase):
+    URL = "https://api.luxand.cloud/photo/search/v2"
+
+    def setUp(self):
+        http_cliente.volcar_metricas(forzar=True)  # lo acumulado por otros tests
+        cache.clear()
+
+    def test_reutiliza_la_session_por_host(self):
+        self.assertIs(http_cliente.sesion(self.URL), http_cliente.sesion("https://api.luxand.cloud/v2/person"))
+        self.assertIsNot(http_cliente.sesion(self.URL), http_cliente.sesion("https://api.imgbb.com/1/upload"))
+
+    def test_reintenta_503_y_rebobina_el_archivo(self):
+        archivo = BytesIO(b"foto")
+        leidos = []
+
+        def request(metodo, url, files=None, **kwargs):
+            leidos.append(files["photo"].read())
+            return respuesta(503) if len(leidos) < 3 else respuesta(200, b'{"ok": true}')
+
+        with mock.patch.object(requests.Session, "request", side_effect=request):
+            r = http_cliente.post(self.URL, files={"photo": archivo})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(leidos, [b"foto"] * 3)
+
+        m = http_cliente.metricas()["luxand"]
+        self.assertEqual((m["llamadas"], m["reintentos"], m["503"], m["2xx"]), (3, 2, 2, 1))
+        self.assertGreater(m["bytes_recibidos"], 0)
+
+    def test_devuelve_la_ultima_respuesta_al_agotar_reintentos(self):
+        with mock.patch.object(requests.Session, "request", return_value=respuesta(429)) as request:
+            r = http_cliente.post(self.URL, reintentos=1)
+        self.assertEqual(r.status_code, 429)
+        self.assertEqual(request.call_count, 2)
+
+    def test_no_reintenta_otros_errores_y_aplica_timeout(self):
+        with mock.patch.object(requests.Session, "request", return_value=respuesta(400)) as request:
+            http_cliente.post(self.URL)
+        self.assertEqual(request.call_count, 1)
+        self.assertIn("timeout", request.call_args.kwargs)
+
+    @override_settings(HTTP_METRICAS_INTERVALO=60)
+    def test_metricas_se_vuelcan_en_lote(self):
+        with mock.patch.object(requests.Session, "request", return_value=respuesta(200)):
+            http_cliente.post(self.URL)
+            http_cliente.metricas()  # crea las claves
+            with mock.patch.object(cache, "incr", wraps=cache.incr) as incr:
+                for _ in range(5):
+                    http_cliente.post(self.URL)
+                incr.assert_not_called()
+                m = http_cliente.metricas()["luxand"]
+        # Un incr por métrica con cambios, no ~6 por llamada
+        self.assertLessEqual(incr.call_count, 5)
+        self.assertEqual((m["llamadas"], m["2xx"]), (6, 6))
+
+    def test_error_de_red_se_cuenta_y_se_propaga(self):
+        with mock.patch.object(requests.Session, "request", side_effect=requests.ConnectionError("caído")):
+            with self.assertRaises(requests.RequestException):
+                http_cliente.get(self.URL)
+        self.assertEqual(http_cliente.metricas()["luxand"]["errores"], 1)
+
+
+def cuadro(x=100, ruido=0, fondo=(90, 90, 90), semilla=0):
+    """Cuadro de cámara sintético: una 'cara' clara en la posición x, con ruido de sensor de desvío `ruido`."""
+    img = Image.new("RGB", (640, 480), fondo)
+    d = ImageDraw.Draw(img)
+    d.ellipse((x, 120, x + 200, 380), fill=(220, 180, 150))
+    d.rectangle((0, 0, 40, 40), fill=(10, 10, 10))
+    if ruido:
+        pixeles = np.asarray(img, dtype=float) + np.random.default_rng(semilla).normal(0, ruido, (480, 640, 3))
+        img = Image.fromarray(pixeles.clip(0, 255).astype(np.uint8))
+    out = BytesIO()
+    img.save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+ROSTRO = (100, 120, 200, 260)
+
+
+@override_settings(LUXAND_CACHE_TTL=5)
+class ReconocimientoCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_mismo_rostro_reutiliza_el_resultado(self):
+        resultado = [{"uuid": "u-1", "probability": 0.97}]
+        with mock.patch("core.reconocimiento_cache.recognize", return_value=resultado) as rec:
+            self.assertEqual(recognize_cacheado(BytesIO(cuadro()), "g", ROSTRO), resultado)
+            # El mismo rostro con ruido de la cámara: huella cercana, sale del cache
+            self.assertEqual(recognize_cacheado(BytesIO(cuadro(ruido=4)), "g", ROSTRO), resultado)
+            self.assertEqual(recognize_cacheado(BytesIO(cuadro(ruido=8, semilla=1)), "g", ROSTRO), resultado)
+            # Otra persona / otra posición: se consulta a Luxand
+            recognize_cacheado(BytesIO(cuadro(x=380, fondo=(30, 60, 30))), "g", (380, 120, 200, 260))
+            # Otra galería no comparte resultados
+            recognize_cacheado(BytesIO(cuadro()), "otra", ROSTRO)
+        self.assertEqual(rec.call_count, 3)
+
+    def test_sin_recorte_o_huella_distinta_no_hay_cache(self):
+        with mock.patch("core.reconocimiento_cache.recognize", return_value=[]) as rec:
+            # Cuadro completo: no identifica a nadie, siempre se pregunta a Luxand
+            recognize_cacheado(BytesIO(cuadro()), "g")
+            recognize_cacheado(BytesIO(cuadro()), "g")
+        self.assertEqual(rec.call_count, 2)
+
+    @override_settings(LUXAND_CACHE_DISTANCIA=6)
+    def test_tolerancia_de_hamming(self):
+        huella = (1 << 255) | 0b1011
+        guardar(huella, "g", ["ana"])
+        self.assertEqual(buscar(huella, "g"), ["ana"])
+        # Bits repartidos en distintas bandas: dentro de la tolerancia
+        self.assertEqual(buscar(huella ^ 0b1 ^ (1 << 100) ^ (1 << 200) ^ (1 << 254), "g"), ["ana"])
+        self.assertIsNone(buscar(huella ^ 0b1111111, "g"))
+        # Se prefiere la huella más parecida
+        guardar(huella ^ 0b110, "g", ["luis"])
+        self.assertEqual(buscar(huella ^ 0b111, "g"), ["luis"])
+        with override_settings(LUXAND_CACHE_DISTANCIA=0):
+            self.assertIsNone(buscar(huella ^ 0b1, "g"))
+
+    def test_errores_y_urls_no_se_cachean(self):
+        with mock.patch("core.reconocimiento_cache.recognize", return_value={"error": "x"}) as rec:
+            recognize_cacheado(BytesIO(cuadro()), "g", ROSTRO)
+            recognize_cacheado(BytesIO(cuadro()), "g", ROSTRO)
+            recognize_cacheado("https://i.ibb.co/x.jpg", "g")
+            recognize_cacheado("https://i.ibb.co/x.jpg", "g")
+        self.assertEqual(rec.call_count, 4)
+
+    @override_settings(LUXAND_CACHE_TTL=0)
+    def test_ttl_cero_desactiva_el_cache(self):
+        with mock.patch("core.reconocimiento_cache.recognize", return_value=[]) as rec:
+            recognize_cacheado(BytesIO(cuadro()), "g", ROSTRO)
+            recognize_cacheado(BytesIO(cuadro()), "g", ROSTRO)
+        self.assertEqual(rec.call_count, 2)
+
+    def test_otro_rostro_del_mismo_cuadro_no_reutiliza_el_resultado(self):
+        img = Image.open(BytesIO(cuadro(x=60)))
+        d = ImageDraw.Draw(img)
+        d.ellipse((380, 100, 600, 400), fill=(140, 100, 80))
+        d.rectangle((440, 200, 520, 230), fill=(20, 20, 20))
+        out = BytesIO()
+        img.save(out, "JPEG", quality=90)
+        foto = out.getvalue()
+        with mock.patch("core.reconocimiento_cache.recognize", side_effect=[["ana"], ["luis"]]) as rec:
+            self.assertEqual(recognize_cacheado(BytesIO(foto), "g", recorte=(60, 120, 200, 260)), ["ana"])
+            self.assertEqual(recognize_cacheado(BytesIO(foto), "g", recorte=(380, 100, 220, 300)), ["luis"])
+            # El mismo rostro sí sale del cache
+            self.assertEqual(recognize_cacheado(BytesIO(foto), "g", recorte=(60, 120, 200, 260)), ["ana"])
+        self.assertEqual(rec.call_count, 2)
+
+    def test_dhash_deja_el_archivo_rebobinado(self):
+        archivo = BytesIO(cuadro())
+        dhash(archivo)
+        self.assertEqual(archivo.tell(), 0)
+
+    def test_vista_global_responde_desde_el_cache(self):
+        client = APIClient()
+        with mock.patch("core.reconocimiento_cache.recognize", return_value=[]) as rec:
+            for _ in range(3):
+                archivo = SimpleUploadedFile("f.jpg", cuadro(), content_type="image/jpeg")
+                r = client.post("/api/reconocimiento/", {"image_file": archivo, "rostro": "100,120,200,260"},
+                                format="multipart")
+                self.assertEqual(r.data["reason"], "sin_coincidencias")
+        self.assertEqual(rec.call_count, 1)
+
+
+class CircuitBreakerTests(TestCase):
+    def test_abre_semiabre_y_cierra(self):
+        breaker = CircuitBreaker(umbral=2, espera=0.05)
+        breaker.falla()
+        self.assertTrue(breaker.permitir())
+        breaker.falla()
+        self.assertEqual(breaker.estado, CircuitBreaker.ABIERTO)
+        self.assertFalse(breaker.permitir())
+
+        time.sleep(0.06)
+        # Una sola llamada de prueba
+        self.assertTrue(breaker.permitir())
+        self.assertFalse(breaker.permitir())
+        breaker.exito()
+        self.assertEqual(breaker.estado, CircuitBreaker.CERRADO)
+        self.assertEqual(breaker.aperturas, 1)
+
+    def test_prueba_fallida_vuelve_a_abrir(self):
+        breaker = CircuitBreaker(umbral=1, espera=0)
+        breaker.falla()
+        self.assertTrue(breaker.permitir())
+        breaker.falla()
+        self.assertEqual((breaker.estado, breaker.aperturas), (CircuitBreaker.ABIERTO, 2))
+
+
+@override_settings(LUXAND_TASA=1000, LUXAND_RAFAGA=100, LUXAND_BREAKER_FALLAS=2, LUXAND_BREAKER_ESPERA=60,
+                   LUXAND_CACHE_TTL=0)
+class ProteccionLuxandTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        luxand._breaker = None  # protección nueva con los settings del test
+
+    def tearDown(self):
+        luxand._breaker = None
+
+    def test_luxand_caido_falla_rapido_sin_salir_a_la_red(self):
+        with mock.patch.object(requests.Session, "request", return_value=respuesta(503)) as request:
+            for _ in range(2):
+                with self.assertRaises(luxand.LuxandError):
+                    luxand.recognize("https://i.ibb.co/x.jpg")
+            # Sin reintentos con sleep en el request: una llamada por intento
+            self.assertEqual(request.call_count, 2)
+
+            with self.assertRaises(luxand.LuxandNoDisponible):
+                luxand.recognize("https://i.ibb.co/x.jpg")
+            r = APIClient().post("/api/reconocimiento/", {"image_url": "https://i.ibb.co/x.jpg"}, format="json")
+            self.assertEqual(request.call_count, 2)
+
+        self.assertEqual(r.status_code, 503)
+        self.assertIn("Retry-After", r.headers)
+        estado = APIClient().get("/api/estado-luxand/").data
+        self.assertEqual((estado["circuito"], estado["rechazos_circuito"]), ("abierto", 2))
+
+    @override_settings(LUXAND_TASA=1, LUXAND_RAFAGA=1, LUXAND_ESPERA_CUPO=0, LUXAND_BREAKER_FALLAS=1,
+                       LUXAND_BREAKER_ESPERA=0.05)
+    def test_circuito_abierto_no_consume_cupo(self):
+        with mock.patch.object(requests.Session, "request", return_value=respuesta(503)):
+            with self.assertRaises(luxand.LuxandError):
+                luxand.recognize("https://i.ibb.co/x.jpg")
+        limitador, breaker = luxand._proteccion()
+        limitador._tokens = limitador.capacidad
+        with self.assertRaises(luxand.LuxandNoDisponible) as ctx:
+            luxand.recognize("https://i.ibb.co/x.jpg")
+        self.assertEqual(ctx.exception.status_code, 503)
+        self.assertEqual(limitador.disponibles(), 1)
+
+        # Semiabierto sin cupo: la llamada de prueba se libera para el próximo intento
+        time.sleep(0.06)
+        limitador._tokens = 0
+        with self.assertRaises(luxand.LuxandNoDisponible) as ctx:
+            luxand.recognize("https://i.ibb.co/x.jpg")
+        self.assertEqual(ctx.exception.status_code, 429)
+        self.assertTrue(breaker.permitir())
+
+    @override_settings(LUXAND_TASA=1, LUXAND_RAFAGA=1, LUXAND_ESPERA_CUPO=0)
+    def test_sin_cupo_se_rechaza_localmente(self):
+        with mock.patch.object(requests.Session, "request", return_value=respuesta(200, b"[]")) as request:
+            self.assertEqual(luxand.recognize("https://i.ibb.co/x.jpg"), [])
+            with self.assertRaises(luxand.LuxandNoDisponible) as ctx:
+                luxand.recognize("https://i.ibb.co/x.jpg")
+        self.assertEqual(ctx.exception.status_code, 429)
+        self.assertEqual(request.call_count, 1)
+        self.assertEqual(luxand.estado_luxand()["rechazos_cupo"], 1)
+
+
+@override_settings(LUXAND_TASA=1000, LUXAND_RAFAGA=100, LUXAND_CACHE_TTL=0, LUXAND_MAX_LADO=800)
+class PreprocesamientoLuxandTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        luxand._breaker = None
+
+    def tearDown(self):
+        luxand._breaker = None
+
+    def _foto(self):
+        img = Image.new("RGB", (4000, 3000))
+        ImageDraw.Draw(img).ellipse((1500, 1000, 2300, 2000), fill=(220, 180, 150))
+        out = BytesIO()
+        img.save(out, "JPEG", quality=98)
+        return out.getvalue()
+
+    def test_vista_global_envia_la_foto_reducida_y_recortada(self):
+        original = self._foto()
+        archivo = SimpleUploadedFile("f.jpg", original, content_type="image/jpeg")
+        with mock.patch("core.http_cliente.post", return_value=respuesta(200, b"[]")) as post:
+            r = APIClient().post("/api/reconocimiento/", {"image_file": archivo, "rostro": "1500,1000,800,1000"},
+                                 format="multipart")
+        self.assertEqual(r.data["reason"], "sin_coincidencias")
+        _, contenido, content_type = post.call_args.kwargs["files"]["photo"]
+        self.assertEqual(content_type, "image/jpeg")
+        self.assertLess(len(contenido), len(original) / 10)
+        self.assertEqual(max(Image.open(BytesIO(contenido)).size), 800)
+
+    def test_add_person_y_add_face_tambien_preprocesan(self):
+        with mock.patch("core.http_cliente.post", return_value=respuesta(200, b'{"uuid": "u"}')) as post:
+            luxand.add_person("Ana", BytesIO(self._foto()), "g")
+            luxand.add_face("u", BytesIO(self._foto()))
+            luxand.add_face("u", "https://i.ibb.co/x.jpg")
+        fotos = [c.kwargs["files"] for c in post.call_args_list]
+        self.assertEqual(Image.open(BytesIO(fotos[0]["photos"][1])).size, (800, 600))
+        self.assertEqual(Image.open(BytesIO(fotos[1]["photo"][1])).size, (800, 600))
+        # Las URLs las descarga Luxand tal cual
+        self.assertEqual(fotos[2]["photo"], "https://i.ibb.co/x.jpg")
+
+
+class IndiceEmbeddingsTests(TestCase):
+    def test_top_k_coincide_con_fuerza_bruta(self):
+        rng = np.random.default_rng(0)
+        matriz = rng.standard_normal((500, 64)).astype(np.float32)
+        uuids = [f"u{i}" for i in range(500)]
+        indice = IndiceEmbeddings(uuids, uuids, ["g"] * 500, matriz)
+        consulta = matriz[42] + 0.1 * rng.standard_normal(64).astype(np.float32)
+
+        normalizada = matriz / np.linalg.norm(matriz, axis=1, keepdims=True)
+        esperado = np.argsort(normalizada @ (consulta / np.linalg.norm(consulta)))[::-1][:5]
+        candidatos = indice.buscar(consulta, k=5, gallery="g")
+        self.assertEqual([c["uuid"] for c in candidatos], [f"u{i}" for i in esperado])
+        self.assertEqual(candidatos[0]["uuid"], "u42")
+        self.assertTrue(indice.matriz.flags["C_CONTIGUOUS"])
+
+    def test_galerias_y_varias_fotos_por_persona(self):
+        matriz = np.array([[1, 0], [0.9, 0.1], [1, 0.05], [0, 1]], dtype=np.float32)
+        indice = IndiceEmbeddings(["a", "a", "b", "c"], ["A", "A", "B", "C"], ["g1", "g1", "g1", "g2"], matriz)
+        self.assertEqual([c["uuid"] for c in indice.buscar([1, 0], k=5, gallery="g1")], ["a", "b"])
+        self.assertEqual([c["uuid"] for c in indice.buscar([1, 0], k=5, gallery="g2")], ["c"])
+        self.assertEqual(len(indice.buscar([1, 0], k=5)), 3)
+        self.assertEqual(indice.buscar([1, 0], gallery="otra"), [])
+
+
+@override_settings(RECONOCIMIENTO_BACKEND="local", RECONOCIMIENTO_EXTRACTOR="core.reconocedores.ExtractorDeterminista",
+                   LUXAND_COLLECTION="todos")
+class ReconocedorLocalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reconocedores._reconocedor = None
+        self.ana = Persona.objects.create(nombre="Ana", apellido="Rojas", sexo="F", tipo="P", CI="100",
+                                          fecha_nacimiento=datetime.date(1990, 1, 1))
+        self.luis = Persona.objects.create(nombre="Luis", apellido="Paz", sexo="M", tipo="P", CI="200",
+                                           fecha_nacimiento=datetime.date(1990, 1, 1))
+
+    def tearDown(self):
+        reconocedores._reconocedor = None
+
+    def _enrolar(self, persona, foto):
+        archivo = SimpleUploadedFile("f.jpg", foto, content_type="image/jpeg")
+        return APIClient().post("/api/enrolar/", {"persona_id": persona.id, "image_file": archivo},
+                                format="multipart")
+
+    def test_enrola_y_reconoce_sin_salir_a_la_red(self):
+        with mock.patch.object(requests.Session, "request") as request:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(self._enrolar(self.ana, cuadro()).status_code, 200)
+                self.assertEqual(self._enrolar(self.luis, cuadro(x=380, fondo=(30, 60, 30))).status_code, 200)
+            archivo = SimpleUploadedFile("f.jpg", cuadro(ruido=2), content_type="image/jpeg")
+            r = APIClient().post("/api/reconocimiento/", {"image_file": archivo}, format="multipart")
+        request.assert_not_called()
+        self.assertTrue(r.data["ok"], r.data)
+        self.assertEqual((r.data["tipo"], r.data["id"]), ("persona", self.ana.id))
+        self.ana.refresh_from_db()
+        self.assertEqual(r.data["uuid"], self.ana.luxand_uuid)
+        self.assertEqual(EmbeddingRostro.objects.get(uuid=self.ana.luxand_uuid).coleccion, "todos")
+
+    @override_settings(RECONOCIMIENTO_EXTRACTOR="")
+    def test_sin_extractor_real_no_arranca(self):
+        with self.assertRaises(ImproperlyConfigured):
+            reconocedores.reconocedor()
+
+    def test_baja_borra_los_embeddings(self):
+        self._enrolar(self.ana, cuadro())
+        self.ana.refresh_from_db()
+        motor = reconocedores.reconocedor()
+        self.assertEqual(len(motor.indice()), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ana.delete()
+        self.assertFalse(EmbeddingRostro.objects.exists())
+        self.assertEqual(len(motor.indice()), 0)
@@ -1,6 +1,6 @@
 # seguridad_IA/urls.py
 from django.urls import path
-from .views import AlprScanView, ReconocimientoGlobalView, EnrolarPersonaView, VerificarEnrolamientoView, VerificarLuxandAPIView, ProbarLuxandView
+from .views import AlprScanView, ReconocimientoGlobalView, EnrolarPersonaView, VerificarEnrolamientoView, VerificarLuxandAPIView, ProbarLuxandView, MetricasHttpView, EstadoLuxandView
 
 urlpatterns = [
     path("alpr/", AlprScanView.as_view(), name="alpr-scan"),
@@ -9,4 +9,6 @@ urlpatterns = [
     path("verificar-enrolamiento/", VerificarEnrolamientoView.as_view(), name="verificar-enrolamiento"),
     path("verificar-luxand/", VerificarLuxandAPIView.as_view(), name="verificar-luxand"),
     path("probar-luxand/", ProbarLuxandView.as_view(), name="probar-luxand"),
+    path("metricas-http/", MetricasHttpView.as_view(), name="metricas-http"),
+    path("estado-luxand/", EstadoLuxandView.as_view(), name="estado-luxand"),
 ]
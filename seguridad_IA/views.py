@@ -1,4 +1,4 @@
-import time, requests
+import requests
 from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
@@ -7,7 +7,12 @@ from .models import LecturaPlaca
 from .serializers.serializersPlaca import LecturaPlacaSerializer
 from residencial.modelsVehiculo import Vehiculo
 from administracion.models import Persona, Empleado
-from core.luxand import recognize, add_person
+from core.luxand import estado_luxand, LuxandNoDisponible
+from core import http_cliente
+from core.identidades import resolver_uuid
+from core.reconocimiento_cache import estadisticas_cache_reconocimiento
+from core.reconocedores import reconocedor
+from core.imagenes import ImagenInvalida, parsear_recorte
 
 PLATE_URL = "https://api.platerecognizer.com/v1/plate-reader/"
 
@@ -36,11 +41,8 @@ class AlprScanView(APIView):
         files = {"upload": (getattr(f, "name", "frame.jpg"), f, getattr(f, "content_type", "image/jpeg"))}
         try:
             f.seek(0)
-            r = requests.post(PLATE_URL, headers=headers, data=payload, files=files, timeout=20)
-            if r.status_code == 429:
-                time.sleep(1)
-                f.seek(0)
-                r = requests.post(PLATE_URL, headers=headers, data=payload, files=files, timeout=20)
+            # El cliente compartido reintenta 429/503 con backoff
+            r = http_cliente.post(PLATE_URL, headers=headers, data=payload, files=files, timeout=20)
         except requests.RequestException as e:
             return Response({"error": "No se pudo contactar al ALPR", "detail": str(e)}, status=502)
 
@@ -98,6 +100,7 @@ class ReconocimientoGlobalView(APIView):
     Body:
       - image_url (str)  ó  image_file (multipart)
       - umbral   (float, default=0.80)
+      - rostro   (opcional, "x,y,ancho,alto" del rostro detectado en el dispositivo)
     Respuesta:
       { ok, tipo, id, nombre, similaridad, uuid }
     """
@@ -124,29 +127,9 @@ class ReconocimientoGlobalView(APIView):
 
             fuente = image_url if image_url else image_file
             
-            # Intentar reconocimiento con retry en caso de errores temporales
-            max_retries = 3
-            retry_delay = 2  # segundos
-            
-            for attempt in range(max_retries):
-                try:
-                    print(f"🔄 Reconocimiento intento {attempt + 1}/{max_retries}")
-                    res = recognize(fuente, gallery=gallery)
-                    break  # Si es exitoso, salir del loop
-                except ValueError as e:
-                    error_msg = str(e)
-                    print(f"❌ Error en intento {attempt + 1}: {error_msg}")
-                    
-                    # Si es un error 503 o 429, intentar de nuevo después de un delay
-                    if ("503" in error_msg or "429" in error_msg or "timeout" in error_msg.lower()) and attempt < max_retries - 1:
-                        print(f"⏳ Esperando {retry_delay} segundos antes del siguiente intento...")
-                        import time
-                        time.sleep(retry_delay)
-                        retry_delay *= 2  # Exponential backoff
-                        continue
-                    else:
-                        # Si no es un error temporal o ya se agotaron los intentos, re-lanzar el error
-                        raise e
+            # Motor configurado en settings.RECONOCIMIENTO_BACKEND (Luxand o local).
+            # Los archivos se orientan, recortan al rostro y reducen antes de usarlos
+            res = reconocedor().reconocer(fuente, gallery=gallery, recorte=parsear_recorte(request.data.get("rostro")))
             
             # Debug: Log the response structure and gallery
             print(f"=== RECONOCIMIENTO DEBUG ===")
@@ -226,31 +209,16 @@ class ReconocimientoGlobalView(APIView):
             print(f"   UUID from Luxand: {uuid}")
             print(f"   Similarity: {sim}")
 
-            tipo = None
-            obj = None
-            if uuid:
-                print(f"🔍 DATABASE SEARCH:")
-                obj = Persona.objects.filter(luxand_uuid=uuid).first()
-                if obj:
-                    tipo = "persona"
-                    print(f"   ✅ Found in Persona table: {obj.nombre} {obj.apellido}")
-                else:
-                    obj = Empleado.objects.filter(luxand_uuid=uuid).first()
-                    if obj:
-                        tipo = "empleado"
-                        print(f"   ✅ Found in Empleado table: {obj.nombre} {obj.apellido}")
-                    else:
-                        print(f"   ❌ Not found in database with UUID: {uuid}")
-                        print(f"   📋 Available UUIDs in Persona: {list(Persona.objects.filter(luxand_uuid__isnull=False).values_list('luxand_uuid', flat=True))}")
-                        print(f"   📋 Available UUIDs in Empleado: {list(Empleado.objects.filter(luxand_uuid__isnull=False).values_list('luxand_uuid', flat=True))}")
-            else:
-                print(f"   ❌ No UUID found in Luxand response")
+            # Índice en memoria uuid -> identidad: sin consultas a la BD
+            identidad = resolver_uuid(uuid)
+            if uuid and not identidad:
+                print(f"   ❌ Not found in identity index with UUID: {uuid}")
 
-            ok = bool(obj) and sim >= umbral
-            nombre = f"{getattr(obj, 'nombre', '')} {getattr(obj, 'apellido', '')}".strip() if obj else None
+            ok = bool(identidad) and sim >= umbral
+            nombre = identidad["nombre"] if identidad else None
             
             print(f"🎯 FINAL RESULT:")
-            print(f"   Object found: {bool(obj)}")
+            print(f"   Object found: {bool(identidad)}")
             print(f"   Similarity: {sim}")
             print(f"   Threshold: {umbral}")
             print(f"   OK: {ok}")
@@ -258,15 +226,25 @@ class ReconocimientoGlobalView(APIView):
             
             return Response({
                 "ok": ok,
-                "tipo": tipo,
-                "id": getattr(obj, "id", None),
+                "tipo": identidad["tipo"] if identidad else None,
+                "id": identidad["id"] if identidad else None,
                 "nombre": nombre,
+                "estado": identidad["estado"] if identidad else None,
                 "similaridad": round(sim, 4),
                 "uuid": uuid,
                 "umbral": umbral,
                 "raw": res  # quítalo en producción si no lo necesitas
             })
             
+        except LuxandNoDisponible as e:
+            # Circuito abierto o sin cupo: se responde al instante, sin esperar a Luxand
+            return Response(
+                {"detail": str(e), "reintentar_en": e.reintentar_en},
+                status=e.status_code,
+                headers={"Retry-After": str(max(1, round(e.reintentar_en)))},
+            )
+        except ImagenInvalida as e:
+            return Response({"detail": str(e)}, status=400)
         except ValueError as e:
             # Errores específicos de Luxand API
             return Response({"detail": f"Error de API Luxand: {e}"}, status=400)
@@ -342,7 +320,8 @@ class EnrolarPersonaView(APIView):
                 print(f"Tipo de contenido: {image_file.content_type}")
             print(f"==========================")
             
-            res = add_person(nombre_completo, fuente, collections=gallery)
+            res = reconocedor().enrolar(nombre_completo, fuente, gallery,
+                                        recorte=parsear_recorte(request.data.get("rostro")))
             
             print(f"Luxand add_person response: {res}")
             
@@ -364,6 +343,7 @@ class EnrolarPersonaView(APIView):
             
             # Guardar UUID en la base de datos
             obj.luxand_uuid = uuid
+            obj.luxand_estado = 'E'
             obj.save()
             
             return Response({
@@ -374,6 +354,8 @@ class EnrolarPersonaView(APIView):
                 "mensaje": f"{tipo.capitalize()} enrolado exitosamente"
             })
             
+        except ImagenInvalida as e:
+            return Response({"detail": str(e)}, status=400)
         except Exception as e:
             print(f"Error en enrolamiento: {e}")
             return Response({"detail": f"Error al enrolar: {e}"}, status=500)
@@ -414,7 +396,6 @@ class VerificarLuxandAPIView(APIView):
     """
     def get(self, request, *args, **kwargs):
         try:
-            import requests
             from django.conf import settings
             
             # Verificar configuración
@@ -433,7 +414,7 @@ class VerificarLuxandAPIView(APIView):
             
             try:
                 # Hacer una petición GET para verificar conectividad
-                response = requests.get(url, headers=headers, timeout=10)
+                response = http_cliente.get(url, headers=headers, timeout=10, reintentos=0)
                 
                 return Response({
                     "status": "success" if response.status_code == 200 else "error",
@@ -508,3 +489,25 @@ class ProbarLuxandView(APIView):
                 "detail": f"Error en prueba de Luxand: {e}",
                 "gallery_used": getattr(settings, "LUXAND_COLLECTION", "")
             }, status=500)
+
+
+class MetricasHttpView(APIView):
+    """
+    Métricas del cliente HTTP compartido por upstream (Luxand, ImgBB,
+    PlateRecognizer): llamadas, reintentos, status, latencia y bytes, más los
+    aciertos del cache perceptual de reconocimiento.
+    """
+    def get(self, request, *args, **kwargs):
+        return Response({
+            **http_cliente.metricas(),
+            "cache_reconocimiento": estadisticas_cache_reconocimiento(),
+        })
+
+
+class EstadoLuxandView(APIView):
+    """
+    Estado del circuit breaker y del limitador de llamadas a Luxand (del
+    proceso que atiende) y cantidad de llamadas rechazadas sin salir a la red.
+    """
+    def get(self, request, *args, **kwargs):
+        return Response(estado_luxand())